@@ -1,5 +1,4 @@
 import os
-from sqlalchemy import engine_from_config, pool
 from alembic import context
 
 config = context.config
@@ -10,7 +9,9 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME")
 
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL)
+# DATABASE_URL (e.g. sqlite:///./curanet.db) overrides the DB_* variables, as in backend/database.py
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# ConfigParser interpolation: a literal % in the password must be doubled
+config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL.replace("%", "%%"))
 
 target_metadata = None
@@ -0,0 +1,151 @@
+"""add_archive_tables
+
+Revision ID: a4c7e1f9d2b6
+Revises: f1a6d3e8b2c4
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e1f9d2b6'
+down_revision = 'f1a6d3e8b2c4'
+branch_labels = None
+depends_on = None
+
+SESSION_CHILD_TABLES = ('prescriptions', 'symptoms', 'diagnoses', 'vital_signs', 'treatment_plans')
+
+
+def upgrade() -> None:
+    # Archival looks up sessions by appointment and session rows and reports by session, and
+    # deleting a parent checks its children (MySQL already indexes foreign keys; SQLite does not)
+    op.create_index(op.f('ix_medical_sessions_appointment_id'), 'medical_sessions', ['appointment_id'], unique=False)
+    op.create_index(op.f('ix_medical_reports_session_id'), 'medical_reports', ['session_id'], unique=False)
+    for table in SESSION_CHILD_TABLES:
+        op.create_index(op.f(f'ix_{table}_session_id'), table, ['session_id'], unique=False)
+
+    op.create_table('appointments_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('doctor_id', sa.Integer(), nullable=False),
+    sa.Column('appointment_time', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['doctor_id'], ['doctors.id'], ),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_appointments_archive_doctor_time', 'appointments_archive', ['doctor_id', 'appointment_time'], unique=False)
+    op.create_index('ix_appointments_archive_patient_time', 'appointments_archive', ['patient_id', 'appointment_time'], unique=False)
+
+    op.create_table('medical_sessions_archive',
+    sa.Column('session_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('appointment_id', sa.Integer(), nullable=False),
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('doctor_id', sa.Integer(), nullable=False),
+    sa.Column('session_date', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.Enum('active', 'completed', 'paused', name='sessionstatus'), nullable=True),
+    sa.Column('chief_complaint', sa.Text(), nullable=True),
+    sa.Column('session_notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['appointment_id'], ['appointments_archive.id'], ),
+    sa.ForeignKeyConstraint(['doctor_id'], ['doctors.id'], ),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ),
+    sa.PrimaryKeyConstraint('session_id')
+    )
+    op.create_index(op.f('ix_medical_sessions_archive_appointment_id'), 'medical_sessions_archive', ['appointment_id'], unique=False)
+    op.create_index(op.f('ix_medical_sessions_archive_patient_id'), 'medical_sessions_archive', ['patient_id'], unique=False)
+
+    op.create_table('prescriptions_archive',
+    sa.Column('prescription_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('medication_name', sa.String(length=200), nullable=False),
+    sa.Column('dosage', sa.String(length=100), nullable=False),
+    sa.Column('frequency', sa.String(length=100), nullable=False),
+    sa.Column('duration', sa.String(length=100), nullable=False),
+    sa.Column('instructions', sa.Text(), nullable=True),
+    sa.Column('prescribed_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['medical_sessions_archive.session_id'], ),
+    sa.PrimaryKeyConstraint('prescription_id')
+    )
+    op.create_index(op.f('ix_prescriptions_archive_session_id'), 'prescriptions_archive', ['session_id'], unique=False)
+
+    op.create_table('symptoms_archive',
+    sa.Column('symptom_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('symptom_description', sa.Text(), nullable=False),
+    sa.Column('severity', sa.Enum('mild', 'moderate', 'severe', name='severitylevel'), nullable=False),
+    sa.Column('duration', sa.String(length=100), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('recorded_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['medical_sessions_archive.session_id'], ),
+    sa.PrimaryKeyConstraint('symptom_id')
+    )
+    op.create_index(op.f('ix_symptoms_archive_session_id'), 'symptoms_archive', ['session_id'], unique=False)
+
+    op.create_table('diagnoses_archive',
+    sa.Column('diagnosis_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('diagnosis_code', sa.String(length=20), nullable=True),
+    sa.Column('diagnosis_description', sa.Text(), nullable=False),
+    sa.Column('diagnosis_type', sa.Enum('primary', 'secondary', 'differential', name='diagnosistype'), nullable=True),
+    sa.Column('confidence_level', sa.Enum('confirmed', 'probable', 'possible', name='confidencelevel'), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('diagnosed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['medical_sessions_archive.session_id'], ),
+    sa.PrimaryKeyConstraint('diagnosis_id')
+    )
+    op.create_index(op.f('ix_diagnoses_archive_session_id'), 'diagnoses_archive', ['session_id'], unique=False)
+
+    op.create_table('vital_signs_archive',
+    sa.Column('vital_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('blood_pressure_systolic', sa.Integer(), nullable=True),
+    sa.Column('blood_pressure_diastolic', sa.Integer(), nullable=True),
+    sa.Column('heart_rate', sa.Integer(), nullable=True),
+    sa.Column('temperature', sa.DECIMAL(precision=4, scale=2), nullable=True),
+    sa.Column('respiratory_rate', sa.Integer(), nullable=True),
+    sa.Column('oxygen_saturation', sa.Integer(), nullable=True),
+    sa.Column('weight', sa.DECIMAL(precision=5, scale=2), nullable=True),
+    sa.Column('height', sa.DECIMAL(precision=5, scale=2), nullable=True),
+    sa.Column('recorded_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['medical_sessions_archive.session_id'], ),
+    sa.PrimaryKeyConstraint('vital_id')
+    )
+    op.create_index(op.f('ix_vital_signs_archive_session_id'), 'vital_signs_archive', ['session_id'], unique=False)
+
+    op.create_table('treatment_plans_archive',
+    sa.Column('plan_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('treatment_description', sa.Text(), nullable=False),
+    sa.Column('start_date', sa.DateTime(), nullable=True),
+    sa.Column('end_date', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.Enum('active', 'completed', 'discontinued', name='treatmentstatus'), nullable=True),
+    sa.Column('follow_up_required', sa.Boolean(), nullable=True),
+    sa.Column('follow_up_date', sa.DateTime(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['medical_sessions_archive.session_id'], ),
+    sa.PrimaryKeyConstraint('plan_id')
+    )
+    op.create_index(op.f('ix_treatment_plans_archive_session_id'), 'treatment_plans_archive', ['session_id'], unique=False)
+
+
+def downgrade() -> None:
+    for table in ('treatment_plans_archive', 'vital_signs_archive', 'diagnoses_archive',
+                  'symptoms_archive', 'prescriptions_archive'):
+        op.drop_index(op.f(f'ix_{table}_session_id'), table_name=table)
+        op.drop_table(table)
+    op.drop_index(op.f('ix_medical_sessions_archive_patient_id'), table_name='medical_sessions_archive')
+    op.drop_index(op.f('ix_medical_sessions_archive_appointment_id'), table_name='medical_sessions_archive')
+    op.drop_table('medical_sessions_archive')
+    op.drop_index('ix_appointments_archive_patient_time', table_name='appointments_archive')
+    op.drop_index('ix_appointments_archive_doctor_time', table_name='appointments_archive')
+    op.drop_table('appointments_archive')
+    for table in SESSION_CHILD_TABLES:
+        op.drop_index(op.f(f'ix_{table}_session_id'), table_name=table)
+    op.drop_index(op.f('ix_medical_reports_session_id'), table_name='medical_reports')
+    op.drop_index(op.f('ix_medical_sessions_appointment_id'), table_name='medical_sessions')
@@ -0,0 +1,40 @@
+"""add_patient_purge_jobs
+
+Revision ID: b8d2f4a6c1e3
+Revises: a4c7e1f9d2b6
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b8d2f4a6c1e3'
+down_revision = 'a4c7e1f9d2b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('patient_purge_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('mode', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('step', sa.String(length=50), nullable=True),
+    sa.Column('progress', sa.Text(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_patient_purge_jobs_id'), 'patient_purge_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_patient_purge_jobs_patient_id'), 'patient_purge_jobs', ['patient_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_patient_purge_jobs_patient_id'), table_name='patient_purge_jobs')
+    op.drop_index(op.f('ix_patient_purge_jobs_id'), table_name='patient_purge_jobs')
+    op.drop_table('patient_purge_jobs')
@@ -0,0 +1,42 @@
+"""add_appointment_booked_slot
+
+Revision ID: c3a1f0e2d4b5
+Revises: add_medical_reports, b6c664048e91
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c3a1f0e2d4b5'
+down_revision = ('add_medical_reports', 'b6c664048e91')
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('appointments', sa.Column('booked_slot', sa.DateTime(), nullable=True))
+
+    # Every non-cancelled appointment holds its slot
+    op.execute("UPDATE appointments SET booked_slot = appointment_time WHERE status <> 'cancelled'")
+
+    # Existing double bookings: the oldest appointment keeps the slot, later ones are released
+    # (the extra derived table lets MySQL update a table it also selects from)
+    op.execute(
+        "UPDATE appointments SET booked_slot = NULL WHERE id IN ("
+        " SELECT id FROM ("
+        "  SELECT later.id FROM appointments later"
+        "  JOIN appointments earlier ON earlier.doctor_id = later.doctor_id"
+        "   AND earlier.booked_slot = later.booked_slot AND earlier.id < later.id"
+        " ) AS duplicates)"
+    )
+
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.create_unique_constraint('uq_appointments_doctor_slot', ['doctor_id', 'booked_slot'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.drop_constraint('uq_appointments_doctor_slot', type_='unique')
+        batch_op.drop_column('booked_slot')
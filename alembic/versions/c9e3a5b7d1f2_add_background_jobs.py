@@ -0,0 +1,47 @@
+"""add_background_jobs
+
+Revision ID: c9e3a5b7d1f2
+Revises: b8d2f4a6c1e3
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c9e3a5b7d1f2'
+down_revision = 'b8d2f4a6c1e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('background_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('idempotency_key', sa.String(length=200), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('locked_by', sa.String(length=100), nullable=True),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('idempotency_key')
+    )
+    op.create_index(op.f('ix_background_jobs_id'), 'background_jobs', ['id'], unique=False)
+    op.create_index('ix_background_jobs_status_run_after', 'background_jobs', ['status', 'run_after'], unique=False)
+    op.add_column('medical_reports',
+                  sa.Column('upload_status', sa.String(length=20), nullable=False, server_default='stored'))
+
+
+def downgrade() -> None:
+    op.drop_column('medical_reports', 'upload_status')
+    op.drop_index('ix_background_jobs_status_run_after', table_name='background_jobs')
+    op.drop_index(op.f('ix_background_jobs_id'), table_name='background_jobs')
+    op.drop_table('background_jobs')
@@ -0,0 +1,23 @@
+"""add_medical_report_preview_key
+
+Revision ID: d2f6b8c4e1a7
+Revises: c9e3a5b7d1f2
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd2f6b8c4e1a7'
+down_revision = 'c9e3a5b7d1f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('medical_reports', sa.Column('preview_key', sa.String(length=500), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('medical_reports', 'preview_key')
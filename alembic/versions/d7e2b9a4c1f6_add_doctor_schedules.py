@@ -0,0 +1,51 @@
+"""add_doctor_schedules
+
+Revision ID: d7e2b9a4c1f6
+Revises: c3a1f0e2d4b5
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd7e2b9a4c1f6'
+down_revision = 'c3a1f0e2d4b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('doctor_schedules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('doctor_id', sa.Integer(), nullable=False),
+        sa.Column('weekday', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.String(length=5), nullable=False),
+        sa.Column('end_time', sa.String(length=5), nullable=False),
+        sa.ForeignKeyConstraint(['doctor_id'], ['doctors.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_doctor_schedules_id'), 'doctor_schedules', ['id'], unique=False)
+    op.create_index(op.f('ix_doctor_schedules_doctor_id'), 'doctor_schedules', ['doctor_id'], unique=False)
+
+    op.create_table('doctor_schedule_exceptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('doctor_id', sa.Integer(), nullable=False),
+        sa.Column('exception_date', sa.Date(), nullable=False),
+        sa.Column('start_time', sa.String(length=5), nullable=True),
+        sa.Column('end_time', sa.String(length=5), nullable=True),
+        sa.Column('reason', sa.String(length=200), nullable=True),
+        sa.ForeignKeyConstraint(['doctor_id'], ['doctors.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_doctor_schedule_exceptions_id'), 'doctor_schedule_exceptions', ['id'], unique=False)
+    op.create_index('ix_doctor_schedule_exceptions_doctor_date', 'doctor_schedule_exceptions', ['doctor_id', 'exception_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_doctor_schedule_exceptions_doctor_date', table_name='doctor_schedule_exceptions')
+    op.drop_index(op.f('ix_doctor_schedule_exceptions_id'), table_name='doctor_schedule_exceptions')
+    op.drop_table('doctor_schedule_exceptions')
+    op.drop_index(op.f('ix_doctor_schedules_doctor_id'), table_name='doctor_schedules')
+    op.drop_index(op.f('ix_doctor_schedules_id'), table_name='doctor_schedules')
+    op.drop_table('doctor_schedules')
@@ -0,0 +1,40 @@
+"""add_stored_objects
+
+Revision ID: e4a8c2d6f3b9
+Revises: d2f6b8c4e1a7
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e4a8c2d6f3b9'
+down_revision = 'd2f6b8c4e1a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('stored_objects',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('object_key', sa.String(length=500), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('content_type', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sha256'),
+    sa.UniqueConstraint('object_key')
+    )
+    op.create_index(op.f('ix_stored_objects_id'), 'stored_objects', ['id'], unique=False)
+    # Reports sharing an object are looked up by its key
+    op.create_index(op.f('ix_medical_reports_file_key'), 'medical_reports', ['file_key'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_medical_reports_file_key'), table_name='medical_reports')
+    op.drop_index(op.f('ix_stored_objects_id'), table_name='stored_objects')
+    op.drop_table('stored_objects')
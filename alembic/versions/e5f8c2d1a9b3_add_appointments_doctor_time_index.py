@@ -0,0 +1,22 @@
+"""add_appointments_doctor_time_index
+
+Revision ID: e5f8c2d1a9b3
+Revises: d7e2b9a4c1f6
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e5f8c2d1a9b3'
+down_revision = 'd7e2b9a4c1f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_appointments_doctor_time', 'appointments', ['doctor_id', 'appointment_time'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_appointments_doctor_time', table_name='appointments')
@@ -0,0 +1,22 @@
+"""add_appointments_patient_time_index
+
+Revision ID: f1a6d3e8b2c4
+Revises: e5f8c2d1a9b3
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f1a6d3e8b2c4'
+down_revision = 'e5f8c2d1a9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_appointments_patient_time', 'appointments', ['patient_id', 'appointment_time'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_appointments_patient_time', table_name='appointments')
@@ -0,0 +1,27 @@
+"""add_report_stored_size_and_encoding
+
+Revision ID: f7b1d3e5a9c2
+Revises: e4a8c2d6f3b9
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f7b1d3e5a9c2'
+down_revision = 'e4a8c2d6f3b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for table in ('medical_reports', 'stored_objects'):
+        op.add_column(table, sa.Column('stored_size', sa.Integer(), nullable=True))
+        op.add_column(table, sa.Column('content_encoding', sa.String(length=20), nullable=True))
+
+
+def downgrade() -> None:
+    for table in ('stored_objects', 'medical_reports'):
+        op.drop_column(table, 'content_encoding')
+        op.drop_column(table, 'stored_size')
@@ -1,9 +1,13 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from ..models import Appointment, Patient, Doctor
 from ..schemas import AppointmentCreate, AppointmentUpdate, AdminAppointmentResponse
 from fastapi import HTTPException
 from typing import List, Optional
 from datetime import datetime
+from .admin_dashboard_counters import counters
+from . import appointment_slots
+from .slot_bitmaps import bitmaps
 
 def get_all_appointments(db: Session) -> List[dict]:
     """Get all appointments with patient and doctor details"""
@@ -34,16 +38,29 @@ def get_all_appointments(db: Session) -> List[dict]:
 def create_appointment(db: Session, appointment: AppointmentCreate) -> dict:
     """Create a new appointment"""
     try:
+        appointment_time = appointment_slots.parse_appointment_time(appointment.appointment_time)
+        if appointment.status != "cancelled":
+            appointment_slots.ensure_slot_free(db, appointment.doctor_id, appointment_time)
+
         db_appointment = Appointment(
             patient_id=appointment.patient_id,
             doctor_id=appointment.doctor_id,
-            appointment_time=appointment.appointment_time,  # Already in string format
+            appointment_time=appointment_time,
             status=appointment.status
         )
         
         db.add(db_appointment)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError as e:
+            # Lost a race for the slot to a concurrent booking
+            db.rollback()
+            if appointment_slots.is_slot_conflict(e):
+                raise appointment_slots.conflict_error(db, appointment.doctor_id, appointment_time)
+            raise
         db.refresh(db_appointment)
+        counters.appointment_added(db_appointment.status, db_appointment.appointment_time)
+        bitmaps.slot_changed(db_appointment.doctor_id, None, db_appointment.booked_slot)
         
         # Get the complete appointment details including patient and doctor names
         result = (
@@ -64,12 +81,14 @@ def create_appointment(db: Session, appointment: AppointmentCreate) -> dict:
         return {
             "id": result.Appointment.id,
             "appointment_id": f"A{str(result.Appointment.id).zfill(6)}",
-            "appointment_time": result.Appointment.appointment_time,  # Already in string format
+            "appointment_time": result.Appointment.appointment_time.strftime("%Y-%m-%d %H:%M"),
             "patient_id": f"P{str(result.Appointment.patient_id).zfill(6)}",
             "patient_name": result.patient_name,
             "doctor_name": result.doctor_name,
             "status": result.Appointment.status
         }
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
@@ -109,6 +128,10 @@ def edit_appointment(db: Session, appointment_id: int, appointment_data: Appoint
     try:
         from datetime import datetime
         
+        old_status = appointment.status
+        old_time = appointment.appointment_time
+        old_slot = appointment.booked_slot
+        
         # Handle appointment_time conversion if it's a string
         if appointment_data.appointment_time:
             if isinstance(appointment_data.appointment_time, str):
@@ -119,9 +142,24 @@ def edit_appointment(db: Session, appointment_id: int, appointment_data: Appoint
         # Update status if provided
         if appointment_data.status:
             appointment.status = appointment_data.status
-            
-        db.commit()
+
+        # Kept for the conflict error: a rollback expires the appointment back to its old values
+        doctor_id = appointment.doctor_id
+        requested_time = appointment.appointment_time
+        if appointment.status != "cancelled":
+            # Only a new slot has to be within the doctor's schedule
+            moved = requested_time != old_time or old_status == "cancelled"
+            appointment_slots.ensure_slot_free(db, doctor_id, requested_time, appointment.id, check_schedule=moved)
+        try:
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            if appointment_slots.is_slot_conflict(e):
+                raise appointment_slots.conflict_error(db, doctor_id, requested_time)
+            raise
         db.refresh(appointment)
+        counters.appointment_changed(old_status, old_time, appointment.status, appointment.appointment_time)
+        bitmaps.slot_changed(appointment.doctor_id, old_slot, appointment.booked_slot)
         
         # Get the complete updated appointment details
         result = (
@@ -145,6 +183,9 @@ def edit_appointment(db: Session, appointment_id: int, appointment_data: Appoint
             "doctor_name": result.doctor_name,
             "status": result.Appointment.status
         }
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Error updating appointment: {str(e)}")
@@ -158,6 +199,8 @@ def remove_appointment(db: Session, appointment_id: int) -> dict:
     try:
         db.delete(appointment)
         db.commit()
+        counters.appointment_removed(appointment.status, appointment.appointment_time)
+        bitmaps.slot_changed(appointment.doctor_id, appointment.booked_slot, None)
         return {"message": "Appointment removed successfully"}
     except Exception as e:
         db.rollback()
@@ -172,7 +215,7 @@ def get_available_doctors(db: Session, appointment_time: datetime) -> List[dict]
     busy_doctors = (
         db.query(Doctor.id)
         .join(Appointment, Doctor.id == Appointment.doctor_id)
-        .filter(Appointment.appointment_time == appointment_time)
+        .filter(Appointment.booked_slot == appointment_time)
         .all()
     )
     
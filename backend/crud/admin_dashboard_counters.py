@@ -0,0 +1,150 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from .. import models
+from datetime import date, datetime, timedelta
+from typing import Optional
+import os
+import threading
+import time
+
+# How often (seconds) the in-memory counters are re-checked against COUNT queries.
+# Other workers and direct SQL edits are only picked up on reconcile.
+RECONCILE_INTERVAL = int(os.getenv("DASHBOARD_COUNTERS_RECONCILE_SECONDS", "300"))
+
+
+class DashboardCounters:
+    """
+    In-memory aggregate of the admin dashboard headline numbers.
+    The first read loads it with COUNT queries; after that the create/edit/remove
+    functions adjust it in place and it is reconciled every RECONCILE_INTERVAL seconds.
+    """
+
+    def __init__(self, reconcile_interval: int = RECONCILE_INTERVAL):
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._reconciled_at = 0.0
+        self._reconciled_at_utc = None
+        self._day = None
+        self._total_patients = 0
+        self._total_doctors = 0
+        self._appointments_by_status = {}
+        self._today_appointments = 0
+
+    def is_stale(self) -> bool:
+        return (
+            not self._loaded
+            or self._day != date.today()
+            or time.monotonic() - self._reconciled_at > self.reconcile_interval
+        )
+
+    def invalidate(self):
+        """Force the next read to reconcile against the database"""
+        with self._lock:
+            self._loaded = False
+
+    def reconcile(self, db: Session):
+        """Recompute every counter with COUNT queries"""
+        today = date.today()
+        day_start = datetime.combine(today, datetime.min.time())
+        day_end = day_start + timedelta(days=1)
+
+        total_patients = db.query(func.count(models.Patient.id)).scalar() or 0
+        total_doctors = db.query(func.count(models.Doctor.id)).scalar() or 0
+        # Archiving moves rows between these two tables, so totals count both
+        by_status = {}
+        for model in (models.Appointment, models.AppointmentArchive):
+            for status, count in db.query(model.status, func.count(model.id)).group_by(model.status).all():
+                by_status[status] = by_status.get(status, 0) + count
+        today_appointments = db.query(func.count(models.Appointment.id)).filter(
+            models.Appointment.appointment_time >= day_start,
+            models.Appointment.appointment_time < day_end
+        ).scalar() or 0
+
+        with self._lock:
+            self._total_patients = total_patients
+            self._total_doctors = total_doctors
+            self._appointments_by_status = by_status
+            self._today_appointments = today_appointments
+            self._day = today
+            self._reconciled_at = time.monotonic()
+            self._reconciled_at_utc = datetime.utcnow()
+            self._loaded = True
+
+    def adjust_patients(self, delta: int):
+        with self._lock:
+            if self._loaded:
+                self._total_patients += delta
+
+    def adjust_doctors(self, delta: int):
+        with self._lock:
+            if self._loaded:
+                self._total_doctors += delta
+
+    def appointment_added(self, status: str, appointment_time: Optional[datetime]):
+        with self._lock:
+            if self._loaded:
+                self._apply_appointment(status, appointment_time, 1)
+
+    def appointment_removed(self, status: str, appointment_time: Optional[datetime]):
+        with self._lock:
+            if self._loaded:
+                self._apply_appointment(status, appointment_time, -1)
+
+    def appointment_changed(
+        self,
+        old_status: str,
+        old_time: Optional[datetime],
+        new_status: str,
+        new_time: Optional[datetime],
+    ):
+        if old_status == new_status and old_time == new_time:
+            return
+        with self._lock:
+            if self._loaded:
+                self._apply_appointment(old_status, old_time, -1)
+                self._apply_appointment(new_status, new_time, 1)
+
+    def _apply_appointment(self, status: str, appointment_time: Optional[datetime], delta: int):
+        count = self._appointments_by_status.get(status, 0) + delta
+        if count > 0:
+            self._appointments_by_status[status] = count
+        else:
+            self._appointments_by_status.pop(status, None)
+        if isinstance(appointment_time, str):
+            appointment_time = _parse_appointment_time(appointment_time)
+        if appointment_time is not None and appointment_time.date() == self._day:
+            self._today_appointments = max(0, self._today_appointments + delta)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "total_patients": self._total_patients,
+                "total_doctors": self._total_doctors,
+                "total_appointments": sum(self._appointments_by_status.values()),
+                "appointments_by_status": dict(self._appointments_by_status),
+                "today_appointments": self._today_appointments,
+                "reconciled_at": self._reconciled_at_utc.strftime("%Y-%m-%d %H:%M:%S") if self._reconciled_at_utc else None,
+            }
+
+
+def _parse_appointment_time(value: str) -> Optional[datetime]:
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+# Process-wide instance shared by the crud modules
+counters = DashboardCounters()
+
+
+def get_dashboard_counters(db: Session, refresh: bool = False) -> dict:
+    """
+    Return the admin dashboard counters, reconciling first when they are stale
+    """
+    if refresh or counters.is_stale():
+        counters.reconcile(db)
+    return counters.snapshot()
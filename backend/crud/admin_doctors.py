@@ -4,6 +4,8 @@ from .. import models
 from .. import schemas
 from typing import List
 from fastapi import HTTPException
+from .admin_dashboard_counters import counters
+from .. import entity_cache
 
 
 def get_all_doctors_list(db: Session):
@@ -49,6 +51,7 @@ def edit_doctor(db: Session, doctor_id: int, doctor_data: schemas.DoctorUpdate):
 
         db.commit()
         db.refresh(doctor)
+        entity_cache.invalidate_doctor(doctor_id)
         return doctor
     except Exception as e:
         db.rollback()
@@ -66,6 +69,8 @@ def remove_doctor(db: Session, doctor_id: int):
 
         db.delete(doctor)
         db.commit()
+        entity_cache.invalidate_doctor(doctor_id)
+        counters.adjust_doctors(-1)
         return {"message": f"Doctor {doctor.name} successfully removed"}
     except Exception as e:
         db.rollback()
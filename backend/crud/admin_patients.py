@@ -1,8 +1,12 @@
 from sqlalchemy.orm import Session
-from ..models import Patient, Appointment
+from ..models import Patient
 from ..schemas import PatientCreate, PatientResponse, PatientUpdate, AdminPatientResponse
 from typing import List, Optional
 from fastapi import HTTPException
+from .admin_dashboard_counters import counters
+from . import patient_purge
+from .patient_search import index as search_index
+from .. import entity_cache
 
 def get_all_patients_list(db: Session) -> List[dict]:
     """Get all patients for admin view"""
@@ -22,7 +26,7 @@ def get_all_patients_list(db: Session) -> List[dict]:
 
 def get_patient_by_id(db: Session, patient_id: int) -> Optional[dict]:
     """Get specific patient details by ID"""
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient = entity_cache.get_patient(db, patient_id)
     if patient:
         return {
             "patient_id": f"P{str(patient.id).zfill(6)}",
@@ -50,6 +54,8 @@ def create_patient(db: Session, patient: PatientCreate) -> dict:
         db.add(db_patient)
         db.commit()
         db.refresh(db_patient)
+        counters.adjust_patients(1)
+        search_index.upsert(db_patient.id, db_patient.name, db_patient.email, db_patient.phone)
         return get_patient_by_id(db, db_patient.id)
     except Exception as e:
         db.rollback()
@@ -65,6 +71,8 @@ def edit_patient(db: Session, patient_id: int, patient_data: PatientUpdate) -> d
                 setattr(patient, key, value)
             db.commit()
             db.refresh(patient)
+            entity_cache.invalidate_patient(patient_id)
+            search_index.upsert(patient.id, patient.name, patient.email, patient.phone)
             return {
                 "id": patient.id,  # Add this line
                 "patient_id": f"P{str(patient.id).zfill(6)}",
@@ -81,17 +89,12 @@ def edit_patient(db: Session, patient_id: int, patient_data: PatientUpdate) -> d
     return None
 
 def remove_patient(db: Session, patient_id: int) -> dict:
-    """Remove a patient and their associated appointments"""
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    if patient:
-        try:
-            # First, delete associated appointments
-            db.query(Appointment).filter(Appointment.patient_id == patient_id).delete()
-            # Then delete the patient
-            db.delete(patient)
-            db.commit()
-            return {"message": "Patient and associated appointments removed successfully"}
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=400, detail=str(e))
-    return {"error": "Patient not found"}
\ No newline at end of file
+    """
+    Record a chunked background removal of the patient and everything that refers to them
+    (reports and their files, sessions, appointments, archived history); the caller runs the
+    job with patient_purge.run_job
+    """
+    if not db.query(Patient.id).filter(Patient.id == patient_id).first():
+        return {"error": "Patient not found"}
+    job = patient_purge.start_purge(db, patient_id, "delete")
+    return {"message": "Patient removal started", "job": job}
\ No newline at end of file
@@ -0,0 +1,113 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException
+from typing import Optional, Union
+from datetime import datetime, date, time, timedelta
+from .. import models
+from .slot_bitmaps import bitmaps, mask_to_times, slot_datetime, slot_index, DEFAULT_DAY_MASK
+
+# Bookable slots of a clinic day for doctors without their own schedule template
+SLOT_TIMES = mask_to_times(DEFAULT_DAY_MASK)
+
+# How many days ahead a conflict looks for the nearest free slot
+SUGGESTION_DAYS = 14
+
+_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M")
+
+
+def parse_appointment_time(value: Union[str, datetime]) -> datetime:
+    """Accept the "YYYY-MM-DD HH:MM[:SS]" strings the pages send as well as datetimes"""
+    if isinstance(value, datetime):
+        return value
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid appointment time: {value}")
+
+
+def is_slot_taken(db: Session, doctor_id: int, when: datetime, exclude_appointment_id: Optional[int] = None) -> bool:
+    query = db.query(models.Appointment.id).filter(
+        models.Appointment.doctor_id == doctor_id,
+        models.Appointment.booked_slot == when
+    )
+    if exclude_appointment_id is not None:
+        query = query.filter(models.Appointment.id != exclude_appointment_id)
+    return query.first() is not None
+
+
+def get_day_availability(db: Session, doctor_id: int, day: date) -> dict:
+    """Free slots within the doctor's schedule and the slots already booked, from the day bitmap"""
+    open_mask, booked = bitmaps.day(db, doctor_id, day)
+    return {
+        "available_slots": mask_to_times(open_mask & ~booked),
+        "booked_slots": mask_to_times(booked),
+    }
+
+
+def find_nearest_free_slot(db: Session, doctor_id: int, when: datetime) -> Optional[datetime]:
+    """Closest free scheduled slot to `when`: same day either side first, then the following days"""
+    now = datetime.now()
+    open_mask, booked = bitmaps.day(db, doctor_id, when.date())
+    free = open_mask & ~booked
+    best = None
+    while free:
+        low = free & -free
+        free ^= low
+        candidate = slot_datetime(when.date(), low.bit_length() - 1)
+        if candidate > now and (best is None or abs(candidate - when) < abs(best - when)):
+            best = candidate
+    if best is not None:
+        return best
+    next_day = datetime.combine(when.date() + timedelta(days=1), time.min)
+    return bitmaps.next_free(db, [doctor_id], max(next_day, now), SUGGESTION_DAYS)[doctor_id]
+
+
+def _unavailable(db: Session, doctor_id: int, when: datetime, message: str) -> HTTPException:
+    nearest = find_nearest_free_slot(db, doctor_id, when)
+    return HTTPException(status_code=409, detail={
+        "message": message,
+        "doctor_id": doctor_id,
+        "requested_time": when.strftime("%Y-%m-%d %H:%M"),
+        "nearest_free_slot": nearest.strftime("%Y-%m-%d %H:%M") if nearest else None,
+    })
+
+
+def conflict_error(db: Session, doctor_id: int, when: datetime) -> HTTPException:
+    """409 telling the caller the slot is taken and which one to try instead"""
+    # The slot may have been booked by another worker since this worker's bitmap was loaded
+    bitmaps.mark_booked(doctor_id, when)
+    return _unavailable(db, doctor_id, when, "Doctor already has an appointment at this time")
+
+
+def outside_schedule_error(db: Session, doctor_id: int, when: datetime) -> HTTPException:
+    """409 for a slot the doctor does not work (outside the template, or on leave)"""
+    return _unavailable(db, doctor_id, when, "Doctor is not available at this time")
+
+
+def is_slot_open(db: Session, doctor_id: int, when: datetime) -> bool:
+    open_mask, _ = bitmaps.day(db, doctor_id, when.date())
+    return bool(open_mask >> slot_index(when) & 1)
+
+
+def ensure_slot_free(
+    db: Session,
+    doctor_id: int,
+    when: datetime,
+    exclude_appointment_id: Optional[int] = None,
+    check_schedule: bool = True
+):
+    """
+    Fast pre-check that the doctor works the slot and nobody holds it; the unique constraint
+    still decides races between concurrent bookings. Pass check_schedule=False when the
+    appointment keeps its slot, so a later schedule change does not lock existing bookings.
+    """
+    if check_schedule and not is_slot_open(db, doctor_id, when):
+        raise outside_schedule_error(db, doctor_id, when)
+    if is_slot_taken(db, doctor_id, when, exclude_appointment_id):
+        raise conflict_error(db, doctor_id, when)
+
+
+def is_slot_conflict(error: IntegrityError) -> bool:
+    return "uq_appointments_doctor_slot" in str(error.orig) or "booked_slot" in str(error.orig)
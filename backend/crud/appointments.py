@@ -1,15 +1,30 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from .. import models
 from .. import schemas
 from datetime import datetime
+from .admin_dashboard_counters import counters
+from . import appointment_slots
+from .slot_bitmaps import bitmaps
 
 def create_appointment(db: Session, appointment: schemas.AppointmentCreate):
-    db_appointment = models.Appointment(**appointment.dict())
+    data = appointment.dict()
+    data["appointment_time"] = appointment_slots.parse_appointment_time(data["appointment_time"])
+    if data.get("status") != "cancelled":
+        appointment_slots.ensure_slot_free(db, data["doctor_id"], data["appointment_time"])
+    db_appointment = models.Appointment(**data)
     db.add(db_appointment)
     try:
         db.commit()
         db.refresh(db_appointment)
+        counters.appointment_added(db_appointment.status, db_appointment.appointment_time)
+        bitmaps.slot_changed(db_appointment.doctor_id, None, db_appointment.booked_slot)
         return db_appointment
+    except IntegrityError as e:
+        db.rollback()
+        if appointment_slots.is_slot_conflict(e):
+            raise appointment_slots.conflict_error(db, data["doctor_id"], data["appointment_time"])
+        raise e
     except Exception as e:
         db.rollback()
         raise e
@@ -31,10 +46,24 @@ def get_appointment(db: Session, appointment_id: int):
 def update_appointment_status(db: Session, appointment_id: int, status: str):
     appointment = get_appointment(db, appointment_id)
     if appointment:
+        old_status = appointment.status
+        old_slot = appointment.booked_slot
+        doctor_id, appointment_time = appointment.doctor_id, appointment.appointment_time
+        if old_status == "cancelled" and status != "cancelled":
+            # Un-cancelling books the slot again
+            appointment_slots.ensure_slot_free(db, doctor_id, appointment_time, appointment.id)
         appointment.status = status
         try:
             db.commit()
+            counters.appointment_changed(old_status, appointment.appointment_time, status, appointment.appointment_time)
+            bitmaps.slot_changed(appointment.doctor_id, old_slot, appointment.booked_slot)
             return appointment
+        except IntegrityError as e:
+            # Un-cancelling into a slot that has been re-booked meanwhile
+            db.rollback()
+            if appointment_slots.is_slot_conflict(e):
+                raise appointment_slots.conflict_error(db, doctor_id, appointment_time)
+            raise e
         except Exception as e:
             db.rollback()
             raise e
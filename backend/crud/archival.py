@@ -0,0 +1,173 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import exists, insert, select, delete, func
+from .. import models
+from ..database import SessionLocal
+from datetime import datetime, timedelta
+from typing import List, Optional
+import os
+import threading
+import time
+
+# Completed and cancelled appointments older than this many days are moved to the archive tables
+ARCHIVE_HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", "365"))
+
+# Appointments moved per transaction, and the pause between transactions, so that each
+# batch holds its row locks for milliseconds and live traffic interleaves with the run
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_BATCH_PAUSE = float(os.getenv("ARCHIVE_BATCH_PAUSE", "0.05"))
+
+ARCHIVABLE_STATUSES = ("completed", "cancelled")
+
+# Session child tables and where their rows go once archived
+SESSION_CHILDREN = [
+    (models.Prescription, models.PrescriptionArchive),
+    (models.Symptom, models.SymptomArchive),
+    (models.Diagnosis, models.DiagnosisArchive),
+    (models.VitalSign, models.VitalSignArchive),
+    (models.TreatmentPlan, models.TreatmentPlanArchive),
+]
+ARCHIVE_MODELS = {hot: archive for hot, archive in SESSION_CHILDREN}
+
+_run_lock = threading.Lock()
+last_run: Optional[dict] = None
+
+
+def _copy(db: Session, hot, archive, key_column, keys: List[int]):
+    """INSERT INTO archive (...) SELECT ... FROM hot WHERE key IN (keys)"""
+    names = [column.name for column in archive.__table__.columns if column.name in hot.__table__.columns]
+    db.execute(
+        insert(archive.__table__).from_select(
+            names,
+            select(*[hot.__table__.columns[name] for name in names]).where(key_column.in_(keys))
+        )
+    )
+
+
+def _eligible_ids(db: Session, cutoff: datetime, after_id: int, batch_size: int) -> List[int]:
+    """
+    Next batch of archivable appointment ids above after_id: finished before the cutoff,
+    every session completed, and no medical report pointing at one of their sessions
+    """
+    unfinished_session = exists().where(
+        models.MedicalSession.appointment_id == models.Appointment.id,
+        models.MedicalSession.status != models.SessionStatus.completed
+    )
+    reported_session = exists().where(
+        models.MedicalSession.appointment_id == models.Appointment.id,
+        models.MedicalReport.session_id == models.MedicalSession.session_id
+    )
+    rows = db.query(models.Appointment.id).filter(
+        models.Appointment.id > after_id,
+        models.Appointment.status.in_(ARCHIVABLE_STATUSES),
+        models.Appointment.appointment_time < cutoff,
+        ~unfinished_session,
+        ~reported_session
+    ).order_by(models.Appointment.id).limit(batch_size).all()
+    return [row.id for row in rows]
+
+
+def archive_batch(db: Session, appointment_ids: List[int]) -> dict:
+    """Move these appointments with their sessions and session rows in one short transaction"""
+    session_ids = [
+        row.session_id for row in db.query(models.MedicalSession.session_id)
+        .filter(models.MedicalSession.appointment_id.in_(appointment_ids))
+        .all()
+    ]
+    try:
+        _copy(db, models.Appointment, models.AppointmentArchive, models.Appointment.id, appointment_ids)
+        if session_ids:
+            _copy(db, models.MedicalSession, models.MedicalSessionArchive,
+                  models.MedicalSession.session_id, session_ids)
+            for hot, archive in SESSION_CHILDREN:
+                _copy(db, hot, archive, hot.session_id, session_ids)
+            for hot, _ in SESSION_CHILDREN:
+                db.execute(delete(hot).where(hot.session_id.in_(session_ids)))
+            db.execute(delete(models.MedicalSession).where(models.MedicalSession.session_id.in_(session_ids)))
+        db.execute(delete(models.Appointment).where(models.Appointment.id.in_(appointment_ids)))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"appointments": len(appointment_ids), "sessions": len(session_ids)}
+
+
+def archive_completed(
+    db: Session,
+    horizon_days: int = ARCHIVE_HORIZON_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+    pause: float = ARCHIVE_BATCH_PAUSE
+) -> dict:
+    """
+    Archive everything eligible older than horizon_days, batch_size appointments per
+    transaction, walking the appointments table once in id order. Only one run per process
+    at a time; a second caller gets {"skipped": True}. Safe to stop and rerun at any point.
+    """
+    global last_run
+    if not _run_lock.acquire(blocking=False):
+        return {"skipped": True, "reason": "An archive run is already in progress"}
+    try:
+        cutoff = datetime.now() - timedelta(days=horizon_days)
+        started = time.perf_counter()
+        totals = {"appointments": 0, "sessions": 0, "batches": 0}
+        after_id = 0
+        while max_batches is None or totals["batches"] < max_batches:
+            ids = _eligible_ids(db, cutoff, after_id, batch_size)
+            if not ids:
+                break
+            moved = archive_batch(db, ids)
+            totals["appointments"] += moved["appointments"]
+            totals["sessions"] += moved["sessions"]
+            totals["batches"] += 1
+            after_id = ids[-1]
+            if pause:
+                time.sleep(pause)
+        last_run = {
+            **totals,
+            "cutoff": cutoff.strftime("%Y-%m-%d %H:%M"),
+            "seconds": round(time.perf_counter() - started, 2),
+            "finished_at": datetime.utcnow().isoformat(),
+        }
+        print(f"📦 Archived {totals['appointments']} appointments and {totals['sessions']} sessions "
+              f"in {totals['batches']} batches ({last_run['seconds']} s)")
+        return last_run
+    finally:
+        _run_lock.release()
+
+
+def archive_status(db: Session) -> dict:
+    return {
+        "horizon_days": ARCHIVE_HORIZON_DAYS,
+        "batch_size": ARCHIVE_BATCH_SIZE,
+        "running": _run_lock.locked(),
+        "hot_appointments": db.query(func.count(models.Appointment.id)).scalar() or 0,
+        "archived_appointments": db.query(func.count(models.AppointmentArchive.id)).scalar() or 0,
+        "archived_sessions": db.query(func.count(models.MedicalSessionArchive.session_id)).scalar() or 0,
+        "last_run": last_run,
+    }
+
+
+def run_archive(
+    horizon_days: int = ARCHIVE_HORIZON_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+    pause: float = ARCHIVE_BATCH_PAUSE
+) -> dict:
+    """archive_completed on a session of its own, for background tasks and the command line"""
+    db = SessionLocal()
+    try:
+        return archive_completed(db, horizon_days, batch_size, max_batches, pause)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Move completed appointments and sessions to the archive tables")
+    parser.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--pause", type=float, default=ARCHIVE_BATCH_PAUSE)
+    args = parser.parse_args()
+    run_archive(args.horizon_days, args.batch_size, args.max_batches, args.pause)
@@ -0,0 +1,113 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from .. import models
+from ..database import SessionLocal, SUPPORTS_CONCURRENT_SESSIONS
+from . import doctor_dashboard, doctor_profiles, patient_dashboard, patient_profiles, patient_medical_history
+import os
+
+# Threads shared by all bootstrap requests for their independent panel queries. Each panel
+# holds its own pooled connection while it runs, so keep this within the engine's pool size.
+BOOTSTRAP_WORKERS = int(os.getenv("BOOTSTRAP_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=BOOTSTRAP_WORKERS, thread_name_prefix="bootstrap")
+
+
+def _in_own_session(panel: Callable[[Session], dict]) -> dict:
+    db = SessionLocal()
+    try:
+        return panel(db)
+    finally:
+        db.close()
+
+
+def run_panels(db: Session, panels: Dict[str, Callable[[Session], dict]]) -> dict:
+    """
+    Build each panel with its own session on the shared executor and wait for all of them.
+    Falls back to running them one after another on the request's session when the
+    database cannot serve parallel sessions (in-memory SQLite).
+
+    The request's session is closed first, so its connection is back in the pool before
+    the panels check theirs out: a request waiting on its panels while holding a connection
+    would deadlock the pool under load. Objects loaded through it stay readable (detached,
+    with their loaded columns), so read what the response needs before calling this.
+    """
+    if not SUPPORTS_CONCURRENT_SESSIONS or len(panels) < 2:
+        return {name: panel(db) for name, panel in panels.items()}
+    db.close()
+    futures = {name: _executor.submit(_in_own_session, panel) for name, panel in panels.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def get_doctor_bootstrap(db: Session, username: str) -> Optional[dict]:
+    """
+    Everything the doctor dashboard shows on load: header, profile, upcoming appointments
+    and the number of active sessions, from a single doctor lookup
+    """
+    doctor = db.query(models.Doctor).filter(models.Doctor.name == username).first()
+    if not doctor:
+        return None
+    doctor_id = doctor.id
+
+    def appointments(panel_db: Session) -> dict:
+        upcoming = doctor_dashboard.get_doctor_appointments(panel_db, doctor_id)
+        return doctor_dashboard.format_dashboard_response(upcoming)
+
+    def active_sessions(panel_db: Session) -> dict:
+        count = panel_db.query(func.count(models.MedicalSession.session_id)).filter(
+            models.MedicalSession.doctor_id == doctor_id,
+            models.MedicalSession.status == models.SessionStatus.active
+        ).scalar() or 0
+        return {"count": count}
+
+    header = {
+        "name": doctor.name,
+        "doctor_id": f"Doctor ID: D{doctor.id:05d}",
+        "department": doctor.department,
+    }
+    profile = doctor_profiles.format_profile_response(doctor)
+    panels = run_panels(db, {"appointments": appointments, "active_sessions": active_sessions})
+    return {
+        "header": header,
+        "profile": profile,
+        "appointments": panels["appointments"]["appointments"],
+        "active_sessions_count": panels["active_sessions"]["count"],
+    }
+
+
+def get_patient_bootstrap(db: Session, username: str) -> Optional[dict]:
+    """
+    Everything the patient pages show on load: dashboard header with recent appointments,
+    profile and the first page of the medical history, from a single patient lookup
+    """
+    patient = db.query(models.Patient).filter(models.Patient.name == username).first()
+    if not patient:
+        return None
+    patient_id = patient.id
+
+    def recent_appointments(panel_db: Session) -> dict:
+        recent = patient_dashboard.get_recent_appointments(panel_db, patient_id)
+        return patient_dashboard.format_dashboard_response(patient, recent)
+
+    def medical_history(panel_db: Session) -> dict:
+        appointments, next_cursor = patient_medical_history.get_patient_medical_history(panel_db, patient_id)
+        history = patient_medical_history.format_medical_history_response(patient, appointments, next_cursor)
+        return {
+            "appointments": history["appointments"],
+            "next_cursor": history["next_cursor"],
+            "has_more": history["has_more"],
+        }
+
+    header = {
+        "name": patient.name,
+        "patient_id": f"Patient ID: P{patient.id:05d}",
+    }
+    profile = patient_profiles.format_profile_response(patient)
+    panels = run_panels(db, {"dashboard": recent_appointments, "medical_history": medical_history})
+    return {
+        "header": header,
+        "profile": profile,
+        "recent_appointments": panels["dashboard"]["recent_appointments"],
+        "medical_history": panels["medical_history"],
+    }
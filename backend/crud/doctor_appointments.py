@@ -1,8 +1,8 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import desc
 from .. import models
-from typing import List
-from datetime import datetime
+from typing import List, Tuple
+from datetime import date, datetime, timedelta
 
 def get_doctor_by_name(db: Session, username: str):
     """
@@ -15,12 +15,17 @@ def get_doctor_by_name(db: Session, username: str):
 def get_all_doctor_appointments(db: Session, doctor_id: int) -> List[models.Appointment]:
     """
     Fetch all appointments for a doctor, ordered by date
-    Returns all appointments regardless of status
+    Returns all appointments regardless of status, archived ones included
     """
-    return db.query(models.Appointment)\
-             .filter(models.Appointment.doctor_id == doctor_id)\
-             .order_by(models.Appointment.appointment_time.asc())\
-             .all()
+    appointments = []
+    for model in (models.AppointmentArchive, models.Appointment):
+        appointments += db.query(model)\
+                          .options(joinedload(model.patient))\
+                          .filter(model.doctor_id == doctor_id)\
+                          .order_by(model.appointment_time.asc())\
+                          .all()
+    appointments.sort(key=lambda appointment: appointment.appointment_time)
+    return appointments
 
 def format_appointments_response(appointments: List[models.Appointment]):
     """
@@ -37,4 +42,72 @@ def format_appointments_response(appointments: List[models.Appointment]):
             }
             for appointment in appointments
         ]
-    }
\ No newline at end of file
+    }
+
+def get_calendar_window(start: date, view: str) -> Tuple[date, date]:
+    """
+    [first, last) days of the week (Monday-based) or month containing start
+    """
+    if view == "week":
+        first = start - timedelta(days=start.weekday())
+        return first, first + timedelta(days=7)
+    if view == "month":
+        first = start.replace(day=1)
+        last = (first + timedelta(days=32)).replace(day=1)
+        return first, last
+    raise ValueError("view must be 'week' or 'month'")
+
+def get_doctor_calendar(db: Session, doctor_id: int, first: date, last: date):
+    """
+    Appointments of a doctor in [first, last) with the patient name joined in,
+    one ranged query each on the hot and archive tables
+    """
+    rows = []
+    for model in (models.AppointmentArchive, models.Appointment):
+        rows += db.query(
+                    model.id,
+                    model.appointment_time,
+                    model.status,
+                    model.patient_id,
+                    models.Patient.name.label("patient_name")
+                 )\
+                 .join(models.Patient, model.patient_id == models.Patient.id)\
+                 .filter(model.doctor_id == doctor_id)\
+                 .filter(model.appointment_time >= datetime.combine(first, datetime.min.time()))\
+                 .filter(model.appointment_time < datetime.combine(last, datetime.min.time()))\
+                 .order_by(model.appointment_time.asc())\
+                 .all()
+    rows.sort(key=lambda row: row.appointment_time)
+    return rows
+
+def format_calendar_response(rows, doctor_id: int, view: str, first: date, last: date):
+    """
+    Group calendar rows by day; every day of the window is present, empty days with count 0
+    """
+    days = {}
+    day = first
+    while day < last:
+        days[day] = []
+        day += timedelta(days=1)
+
+    for row in rows:
+        days[row.appointment_time.date()].append({
+            "appointment_id": f"A{row.id:05d}",
+            "time": row.appointment_time.strftime("%H:%M"),
+            "date_time": row.appointment_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "patient_id": f"P{row.patient_id:05d}",
+            "patient_name": row.patient_name,
+            "status": row.status,
+        })
+
+    return {
+        "doctor_id": doctor_id,
+        "view": view,
+        "start": first.isoformat(),
+        "end": (last - timedelta(days=1)).isoformat(),
+        "total": len(rows),
+        "days": [
+            {"date": day.isoformat(), "count": len(appointments), "appointments": appointments}
+            for day, appointments in days.items()
+        ],
+    }
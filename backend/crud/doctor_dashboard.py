@@ -1,16 +1,28 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import asc
+from sqlalchemy.exc import IntegrityError
 from .. import models
 from typing import List
 from datetime import datetime
+from .admin_dashboard_counters import counters
+from . import appointment_slots
+from .slot_bitmaps import bitmaps
+
+# Statuses shown in the dashboard's upcoming list
+ACTIVE_STATUSES = ("pending", "confirmed", "in_progress")
 
 def get_doctor_appointments(db: Session, doctor_id: int, limit: int = 10) -> List[models.Appointment]:
     """
-    Fetch upcoming appointments for a doctor (all except completed) in ascending order of date/time
+    Fetch a doctor's upcoming active appointments in ascending order of date/time.
+    Bounded below by the start of today (so sessions due earlier today can still be started)
+    and served by the (doctor_id, appointment_time) index, so years of history are never scanned.
     """
+    since = datetime.combine(datetime.now().date(), datetime.min.time())
     return db.query(models.Appointment)\
+             .options(joinedload(models.Appointment.patient))\
              .filter(models.Appointment.doctor_id == doctor_id)\
-             .filter(models.Appointment.status != "completed")\
+             .filter(models.Appointment.appointment_time >= since)\
+             .filter(models.Appointment.status.in_(ACTIVE_STATUSES))\
              .order_by(asc(models.Appointment.appointment_time))\
              .limit(limit)\
              .all()
@@ -48,11 +60,27 @@ def update_appointment(db: Session, appointment_id: int, new_datetime: datetime
     if not appointment:
         return None
     
+    old_status = appointment.status
+    old_time = appointment.appointment_time
+    old_slot = appointment.booked_slot
     if new_datetime:
         appointment.appointment_time = new_datetime
     if new_status:
         appointment.status = new_status
-    
-    db.commit()
+
+    # Kept for the conflict error: a rollback expires the appointment back to its old values
+    doctor_id = appointment.doctor_id
+    requested_time = appointment.appointment_time
+    if appointment.status != "cancelled" and (new_datetime or old_status == "cancelled"):
+        appointment_slots.ensure_slot_free(db, doctor_id, requested_time, appointment.id)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if appointment_slots.is_slot_conflict(e):
+            raise appointment_slots.conflict_error(db, doctor_id, requested_time)
+        raise
     db.refresh(appointment)
+    counters.appointment_changed(old_status, old_time, appointment.status, appointment.appointment_time)
+    bitmaps.slot_changed(appointment.doctor_id, old_slot, appointment.booked_slot)
     return appointment
\ No newline at end of file
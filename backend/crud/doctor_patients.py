@@ -1,7 +1,9 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import distinct
+from sqlalchemy import func
 from .. import models
-from typing import List
+from .patient_search import get_doctor_patient_ids
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 def get_doctor_by_name(db: Session, username: str):
     """
@@ -11,18 +13,35 @@ def get_doctor_by_name(db: Session, username: str):
              .filter(models.Doctor.name == username)\
              .first()
 
-def get_doctor_patients(db: Session, doctor_id: int) -> List[models.Patient]:
+def get_doctor_patients(db: Session, doctor_id: int) -> List[Tuple[models.Patient, Optional[datetime], int]]:
     """
-    Fetch all patients who have appointments with the doctor
-    Returns unique patients even if they have multiple appointments
+    Fetch all patients who have appointments with the doctor, archived appointments included.
+    Returns unique patients with their last visit and visit count over all their appointments
+    (hot and archived)
     """
-    return db.query(models.Patient)\
-             .join(models.Appointment)\
-             .filter(models.Appointment.doctor_id == doctor_id)\
-             .distinct()\
-             .all()
+    patient_ids = get_doctor_patient_ids(db, doctor_id)
+    if not patient_ids:
+        return []
 
-def format_patients_response(patients: List[models.Patient]):
+    last_visits: Dict[int, datetime] = {}
+    total_visits: Dict[int, int] = {}
+    for model in (models.Appointment, models.AppointmentArchive):
+        rows = db.query(model.patient_id, func.max(model.appointment_time), func.count(model.id))\
+                 .filter(model.patient_id.in_(patient_ids))\
+                 .group_by(model.patient_id)\
+                 .all()
+        for patient_id, last_visit, visits in rows:
+            if patient_id not in last_visits or last_visit > last_visits[patient_id]:
+                last_visits[patient_id] = last_visit
+            total_visits[patient_id] = total_visits.get(patient_id, 0) + visits
+
+    patients = db.query(models.Patient)\
+                 .filter(models.Patient.id.in_(patient_ids))\
+                 .order_by(models.Patient.id)\
+                 .all()
+    return [(patient, last_visits.get(patient.id), total_visits.get(patient.id, 0)) for patient in patients]
+
+def format_patients_response(patients: List[Tuple[models.Patient, Optional[datetime], int]]):
     """
     Format all patients for display
     """
@@ -33,9 +52,9 @@ def format_patients_response(patients: List[models.Patient]):
                 "name": patient.name,
                 "email": patient.email,
                 "phone": patient.phone,
-                "last_visit": max([apt.appointment_time for apt in patient.appointments]).strftime("%Y-%m-%d %H:%M:%S") if patient.appointments else "No visits",
-                "total_visits": len(patient.appointments)
+                "last_visit": last_visit.strftime("%Y-%m-%d %H:%M:%S") if last_visit else "No visits",
+                "total_visits": total_visits
             }
-            for patient in patients
+            for patient, last_visit, total_visits in patients
         ]
-    }
\ No newline at end of file
+    }
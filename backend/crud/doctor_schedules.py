@@ -0,0 +1,149 @@
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from typing import List, Optional
+from datetime import date, datetime
+from .. import models
+from .. import schemas
+from .slot_bitmaps import bitmaps, block_mask, DEFAULT_BLOCKS
+
+
+def _validate_block(start_time: str, end_time: str):
+    if not block_mask(start_time, end_time):
+        raise HTTPException(status_code=400, detail=f"Invalid time range {start_time}-{end_time}")
+
+
+def get_schedule(db: Session, doctor_id: int) -> dict:
+    """Weekly template (or the clinic default) and upcoming exceptions"""
+    blocks = db.query(models.DoctorSchedule)\
+               .filter(models.DoctorSchedule.doctor_id == doctor_id)\
+               .order_by(models.DoctorSchedule.weekday, models.DoctorSchedule.start_time)\
+               .all()
+    exceptions = db.query(models.DoctorScheduleException)\
+                   .filter(models.DoctorScheduleException.doctor_id == doctor_id,
+                           models.DoctorScheduleException.exception_date >= date.today())\
+                   .order_by(models.DoctorScheduleException.exception_date)\
+                   .all()
+    if blocks:
+        template = [{"weekday": b.weekday, "start_time": b.start_time, "end_time": b.end_time} for b in blocks]
+    else:
+        template = [
+            {"weekday": weekday, "start_time": start, "end_time": end}
+            for weekday in range(7) for start, end in DEFAULT_BLOCKS
+        ]
+    return {
+        "doctor_id": doctor_id,
+        "is_default": not blocks,
+        "blocks": template,
+        "exceptions": [
+            {
+                "id": e.id,
+                "date": e.exception_date.isoformat(),
+                "start_time": e.start_time,
+                "end_time": e.end_time,
+                "reason": e.reason,
+            }
+            for e in exceptions
+        ],
+    }
+
+
+def replace_schedule(db: Session, doctor_id: int, schedule: schemas.DoctorScheduleUpdate) -> dict:
+    """Replace the doctor's weekly template; an empty list reverts to the clinic default"""
+    for block in schedule.blocks:
+        _validate_block(block.start_time, block.end_time)
+    try:
+        db.query(models.DoctorSchedule).filter(models.DoctorSchedule.doctor_id == doctor_id).delete()
+        for block in schedule.blocks:
+            db.add(models.DoctorSchedule(
+                doctor_id=doctor_id,
+                weekday=block.weekday,
+                start_time=block.start_time,
+                end_time=block.end_time
+            ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    bitmaps.invalidate_doctor(doctor_id)
+    return get_schedule(db, doctor_id)
+
+
+def add_exception(db: Session, doctor_id: int, exception: schemas.ScheduleExceptionCreate) -> dict:
+    try:
+        exception_date = datetime.strptime(exception.date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+    if bool(exception.start_time) != bool(exception.end_time):
+        raise HTTPException(status_code=400, detail="Give both start_time and end_time, or neither for the whole day")
+    if exception.start_time:
+        _validate_block(exception.start_time, exception.end_time)
+
+    db_exception = models.DoctorScheduleException(
+        doctor_id=doctor_id,
+        exception_date=exception_date,
+        start_time=exception.start_time,
+        end_time=exception.end_time,
+        reason=exception.reason
+    )
+    db.add(db_exception)
+    try:
+        db.commit()
+        db.refresh(db_exception)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    bitmaps.invalidate_doctor(doctor_id)
+    return {
+        "id": db_exception.id,
+        "date": db_exception.exception_date.isoformat(),
+        "start_time": db_exception.start_time,
+        "end_time": db_exception.end_time,
+        "reason": db_exception.reason,
+    }
+
+
+def remove_exception(db: Session, doctor_id: int, exception_id: int) -> dict:
+    db_exception = db.query(models.DoctorScheduleException).filter(
+        models.DoctorScheduleException.id == exception_id,
+        models.DoctorScheduleException.doctor_id == doctor_id
+    ).first()
+    if not db_exception:
+        return {"error": "Schedule exception not found"}
+    db.delete(db_exception)
+    db.commit()
+    bitmaps.invalidate_doctor(doctor_id)
+    return {"message": "Schedule exception removed"}
+
+
+def next_free_slots(
+    db: Session,
+    after: datetime,
+    days: int = 14,
+    doctor_ids: Optional[List[int]] = None,
+    department: Optional[str] = None,
+    limit: int = 20
+) -> dict:
+    """Earliest free slot per doctor across many doctors, soonest first"""
+    query = db.query(models.Doctor.id, models.Doctor.name, models.Doctor.department)
+    if doctor_ids:
+        query = query.filter(models.Doctor.id.in_(doctor_ids))
+    if department:
+        query = query.filter(models.Doctor.department == department)
+    doctors = query.all()
+    if not doctors:
+        return {"after": after.strftime("%Y-%m-%d %H:%M"), "days": days, "slots": []}
+
+    found = bitmaps.next_free(db, [d.id for d in doctors], after, days)
+    slots = sorted(
+        (
+            {
+                "doctor_id": d.id,
+                "doctor_name": d.name,
+                "department": d.department,
+                "slot": found[d.id].strftime("%Y-%m-%d %H:%M"),
+            }
+            for d in doctors if found[d.id] is not None
+        ),
+        key=lambda item: (item["slot"], item["doctor_id"])
+    )
+    return {"after": after.strftime("%Y-%m-%d %H:%M"), "days": days, "slots": slots[:limit]}
@@ -3,7 +3,9 @@ from sqlalchemy import or_, distinct
 from fastapi import HTTPException
 from .. import models
 from .. import schemas
+from .. import entity_cache
 from typing import List
+from .admin_dashboard_counters import counters
 
 def create_doctor(db: Session, doctor: schemas.DoctorCreate):
     db_doctor = models.Doctor(**doctor.dict())
@@ -11,6 +13,7 @@ def create_doctor(db: Session, doctor: schemas.DoctorCreate):
     try:
         db.commit()
         db.refresh(db_doctor)
+        counters.adjust_doctors(1)
         return db_doctor
     except Exception as e:
         db.rollback()
@@ -65,7 +68,7 @@ def format_doctor_response(doctor: models.Doctor) -> dict:
     }
 
 def get_doctor(db: Session, doctor_id: int):
-    doctor = db.query(models.Doctor).filter(models.Doctor.id == doctor_id).first()
+    doctor = entity_cache.get_doctor(db, doctor_id)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
     return format_doctor_response(doctor)
@@ -3,7 +3,8 @@ from sqlalchemy import and_
 from typing import List, Optional
 from datetime import datetime
 
-from .. import models, schemas
+from .. import models, schemas, entity_cache
+from .archival import ARCHIVE_MODELS
 
 
 def create_medical_session(db: Session, session_data: schemas.MedicalSessionCreate, patient_id: int, doctor_id: int):
@@ -23,8 +24,23 @@ def create_medical_session(db: Session, session_data: schemas.MedicalSessionCrea
 
 
 def get_medical_session(db: Session, session_id: int):
-    """Get medical session by ID"""
-    return db.query(models.MedicalSession).filter(models.MedicalSession.session_id == session_id).first()
+    """Get medical session by ID, looking in the archive when it is no longer in the hot table"""
+    session = db.query(models.MedicalSession).filter(models.MedicalSession.session_id == session_id).first()
+    if session is None:
+        session = db.query(models.MedicalSessionArchive)\
+                    .filter(models.MedicalSessionArchive.session_id == session_id)\
+                    .first()
+    return session
+
+
+def is_archived(session) -> bool:
+    return isinstance(session, models.MedicalSessionArchive)
+
+
+def _session_rows(db: Session, model, session_id: int, archived: bool):
+    if archived:
+        model = ARCHIVE_MODELS[model]
+    return db.query(model).filter(model.session_id == session_id).all()
 
 
 def get_active_sessions_by_doctor(db: Session, doctor_id: int):
@@ -38,10 +54,12 @@ def get_active_sessions_by_doctor(db: Session, doctor_id: int):
 
 
 def get_patient_medical_history(db: Session, patient_id: int):
-    """Get complete medical history for a patient"""
-    return db.query(models.MedicalSession).filter(
-        models.MedicalSession.patient_id == patient_id
-    ).order_by(models.MedicalSession.session_date.desc()).all()
+    """Get complete medical history for a patient, archived sessions included"""
+    sessions = []
+    for model in (models.MedicalSession, models.MedicalSessionArchive):
+        sessions += db.query(model).filter(model.patient_id == patient_id).all()
+    sessions.sort(key=lambda session: session.session_date or datetime.min, reverse=True)
+    return sessions
 
 
 def update_medical_session(db: Session, session_id: int, session_data: schemas.MedicalSessionUpdate):
@@ -85,9 +103,9 @@ def add_vital_signs(db: Session, session_id: int, vital_data: schemas.VitalSignC
     return db_vital
 
 
-def get_session_vital_signs(db: Session, session_id: int):
+def get_session_vital_signs(db: Session, session_id: int, archived: bool = False):
     """Get all vital signs for a session"""
-    return db.query(models.VitalSign).filter(models.VitalSign.session_id == session_id).all()
+    return _session_rows(db, models.VitalSign, session_id, archived)
 
 
 # Symptoms CRUD
@@ -106,9 +124,9 @@ def add_symptom(db: Session, session_id: int, symptom_data: schemas.SymptomCreat
     return db_symptom
 
 
-def get_session_symptoms(db: Session, session_id: int):
+def get_session_symptoms(db: Session, session_id: int, archived: bool = False):
     """Get all symptoms for a session"""
-    return db.query(models.Symptom).filter(models.Symptom.session_id == session_id).all()
+    return _session_rows(db, models.Symptom, session_id, archived)
 
 
 # Prescriptions CRUD
@@ -124,9 +142,9 @@ def add_prescription(db: Session, session_id: int, prescription_data: schemas.Pr
     return db_prescription
 
 
-def get_session_prescriptions(db: Session, session_id: int):
+def get_session_prescriptions(db: Session, session_id: int, archived: bool = False):
     """Get all prescriptions for a session"""
-    return db.query(models.Prescription).filter(models.Prescription.session_id == session_id).all()
+    return _session_rows(db, models.Prescription, session_id, archived)
 
 
 # Diagnoses CRUD
@@ -146,9 +164,9 @@ def add_diagnosis(db: Session, session_id: int, diagnosis_data: schemas.Diagnosi
     return db_diagnosis
 
 
-def get_session_diagnoses(db: Session, session_id: int):
+def get_session_diagnoses(db: Session, session_id: int, archived: bool = False):
     """Get all diagnoses for a session"""
-    return db.query(models.Diagnosis).filter(models.Diagnosis.session_id == session_id).all()
+    return _session_rows(db, models.Diagnosis, session_id, archived)
 
 
 # Treatment Plans CRUD
@@ -170,23 +188,24 @@ def add_treatment_plan(db: Session, session_id: int, treatment_data: schemas.Tre
     return db_treatment
 
 
-def get_session_treatment_plans(db: Session, session_id: int):
+def get_session_treatment_plans(db: Session, session_id: int, archived: bool = False):
     """Get all treatment plans for a session"""
-    return db.query(models.TreatmentPlan).filter(models.TreatmentPlan.session_id == session_id).all()
+    return _session_rows(db, models.TreatmentPlan, session_id, archived)
 
 
 def format_medical_session_response(session: models.MedicalSession, db: Session):
     """Format medical session for API response"""
     # Get patient and doctor names
-    patient = db.query(models.Patient).filter(models.Patient.id == session.patient_id).first()
-    doctor = db.query(models.Doctor).filter(models.Doctor.id == session.doctor_id).first()
+    patient = entity_cache.get_patient(db, session.patient_id)
+    doctor = entity_cache.get_doctor(db, session.doctor_id)
     
     # Get all related data
-    vital_signs = get_session_vital_signs(db, session.session_id)
-    symptoms = get_session_symptoms(db, session.session_id)
-    prescriptions = get_session_prescriptions(db, session.session_id)
-    diagnoses = get_session_diagnoses(db, session.session_id)
-    treatment_plans = get_session_treatment_plans(db, session.session_id)
+    archived = is_archived(session)
+    vital_signs = get_session_vital_signs(db, session.session_id, archived)
+    symptoms = get_session_symptoms(db, session.session_id, archived)
+    prescriptions = get_session_prescriptions(db, session.session_id, archived)
+    diagnoses = get_session_diagnoses(db, session.session_id, archived)
+    treatment_plans = get_session_treatment_plans(db, session.session_id, archived)
     
     return {
         "session_id": session.session_id,
@@ -197,6 +216,7 @@ def format_medical_session_response(session: models.MedicalSession, db: Session)
         "status": session.status.value if session.status else None,
         "chief_complaint": session.chief_complaint,
         "session_notes": session.session_notes,
+        "archived": archived,
         "patient_name": patient.name if patient else "Unknown",
         "doctor_name": doctor.name if doctor else "Unknown",
         "vital_signs": [
@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from .. import models
 from typing import Optional, List
 from datetime import datetime
@@ -16,6 +16,7 @@ def get_recent_appointments(db: Session, patient_id: int) -> List[models.Appoint
     Fetch the 5 most recent appointments for the patient
     """
     return db.query(models.Appointment)\
+             .options(joinedload(models.Appointment.doctor))\
              .filter(models.Appointment.patient_id == patient_id)\
              .order_by(models.Appointment.appointment_time.desc())\
              .limit(5)\
@@ -1,8 +1,9 @@
 from sqlalchemy.orm import Session
-from ..models import Patient, Appointment, Doctor
+from ..models import Patient, Appointment, AppointmentArchive, Doctor
 from ..schemas import PatientResponse
 from typing import Optional, Dict, Any
 from datetime import datetime
+from .. import entity_cache
 
 def get_patient_detail(db: Session, patient_id: int) -> Optional[Dict[Any, Any]]:
     """
@@ -10,15 +11,17 @@ def get_patient_detail(db: Session, patient_id: int) -> Optional[Dict[Any, Any]]
     """
     try:
         # Get patient basic info
-        patient = db.query(Patient).filter(Patient.id == patient_id).first()
+        patient = entity_cache.get_patient(db, patient_id)
         
         if not patient:
             return None
         
-        # Get patient's appointments with doctor details
-        appointments = db.query(Appointment, Doctor).join(
-            Doctor, Appointment.doctor_id == Doctor.id
-        ).filter(Appointment.patient_id == patient_id).all()
+        # Get patient's appointments with doctor details, archived ones included
+        appointments = []
+        for model in (AppointmentArchive, Appointment):
+            appointments += db.query(model, Doctor).join(
+                Doctor, model.doctor_id == Doctor.id
+            ).filter(model.patient_id == patient_id).all()
         
         # Format appointments for response
         visit_history = []
@@ -87,7 +90,7 @@ def get_patient_basic_info(db: Session, patient_id: int) -> Optional[PatientResp
     Get basic patient information
     """
     try:
-        patient = db.query(Patient).filter(Patient.id == patient_id).first()
+        patient = entity_cache.get_patient(db, patient_id)
         
         if not patient:
             return None
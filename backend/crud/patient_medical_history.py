@@ -1,7 +1,13 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_
 from .. import models
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Tuple
+from datetime import date, datetime, timedelta
+import base64
+
+# Page size of the medical history when the caller does not ask for one
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
 
 def get_patient_by_name(db: Session, username: str) -> Optional[models.Patient]:
     """
@@ -19,28 +25,81 @@ def get_patient_medical_history_info(db: Session, username: str) -> Optional[mod
              .filter(models.Patient.name == username)\
              .first()
 
-def get_patient_medical_history(db: Session, patient_id: int) -> List[models.Appointment]:
+def encode_cursor(appointment: models.Appointment) -> str:
+    """Opaque keyset cursor: the (appointment_time, id) of the last row of a page"""
+    raw = f"{appointment.appointment_time.isoformat()}|{appointment.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        appointment_time, appointment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(appointment_time), int(appointment_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def get_patient_medical_history(
+    db: Session,
+    patient_id: int,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None
+) -> Tuple[List[models.Appointment], Optional[str]]:
     """
-    Fetch all appointments for the patient's medical history
+    Fetch one page of the patient's appointments, newest first, with doctors joined in.
+    Keyset pagination on (appointment_time, id) over the (patient_id, appointment_time) index,
+    so later pages cost the same as the first. Archived appointments are merged in.
+    Returns (appointments, next_cursor).
     """
-    return db.query(models.Appointment)\
-             .filter(models.Appointment.patient_id == patient_id)\
-             .order_by(models.Appointment.appointment_time.desc())\
-             .all()
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor_key = decode_cursor(cursor) if cursor else None
+
+    # Hot and archived appointments share one id space; take a page from each and merge
+    appointments = []
+    for model in (models.Appointment, models.AppointmentArchive):
+        query = db.query(model)\
+                  .options(joinedload(model.doctor))\
+                  .filter(model.patient_id == patient_id)
+        if from_date:
+            query = query.filter(model.appointment_time >= datetime.combine(from_date, datetime.min.time()))
+        if to_date:
+            query = query.filter(model.appointment_time < datetime.combine(to_date + timedelta(days=1), datetime.min.time()))
+        if cursor_key:
+            cursor_time, cursor_id = cursor_key
+            query = query.filter(or_(
+                model.appointment_time < cursor_time,
+                and_(model.appointment_time == cursor_time, model.id < cursor_id)
+            ))
+        appointments += query.order_by(model.appointment_time.desc(), model.id.desc())\
+                             .limit(limit + 1)\
+                             .all()
+
+    appointments.sort(key=lambda appointment: (appointment.appointment_time, appointment.id), reverse=True)
+    appointments = appointments[:limit + 1]
+    next_cursor = None
+    if len(appointments) > limit:
+        appointments = appointments[:limit]
+        next_cursor = encode_cursor(appointments[-1])
+    return appointments, next_cursor
 
 def get_patient_appointments(db: Session, patient_id: int) -> List[models.Appointment]:
     """
-    Fetch all appointments for the patient
+    Fetch all appointments for the patient, archived ones included
     """
     return db.query(models.Appointment)\
              .filter(models.Appointment.patient_id == patient_id)\
+             .all() + \
+           db.query(models.AppointmentArchive)\
+             .filter(models.AppointmentArchive.patient_id == patient_id)\
              .all()
 
-def format_medical_history_response(patient: models.Patient, appointments: List[models.Appointment]):
+def format_medical_history_response(patient: models.Patient, appointments: List[models.Appointment], next_cursor: Optional[str] = None):
     """
     Format patient data and appointments for medical history display
     """
     return {
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
         "name": patient.name,
         "patient_id": f"Patient ID: P{patient.id:05d}",
         "appointments": [
@@ -0,0 +1,356 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import or_, select, update, delete
+from fastapi import HTTPException
+from .. import models
+from .. import entity_cache
+from .. import job_queue
+from ..database import SessionLocal
+from .admin_dashboard_counters import counters
+from .slot_bitmaps import bitmaps
+from .patient_search import index as search_index
+from .archival import SESSION_CHILDREN
+from . import stored_objects
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+import json
+import os
+import time
+import uuid
+
+# Rows deleted or updated per transaction, and the pause between transactions
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "200"))
+PURGE_BATCH_PAUSE = float(os.getenv("PURGE_BATCH_PAUSE", "0.02"))
+
+# A running job whose heartbeat is older than this is taken to belong to a dead worker
+# and may be claimed again; the background job queue retries failed runs up to PURGE_MAX_ATTEMPTS times
+PURGE_STALE_SECONDS = int(os.getenv("PURGE_STALE_SECONDS", "120"))
+PURGE_MAX_ATTEMPTS = int(os.getenv("PURGE_MAX_ATTEMPTS", "5"))
+
+PURGE_MODES = ("delete", "anonymize")
+
+# Free-text columns cleared when a patient is anonymized; structured clinical data is kept
+SCRUBBED_COLUMNS = [
+    (models.MedicalSession, "session_notes"),
+    (models.Symptom, "notes"),
+    (models.Diagnosis, "notes"),
+    (models.TreatmentPlan, "notes"),
+    (models.Prescription, "instructions"),
+]
+
+# A step handles at most batch_size rows of the patient and returns how many it handled;
+# 0 means the step is finished. Steps must be safe to repeat after a crash.
+Step = Callable[[Session, int, int, Callable[[str], None]], int]
+
+
+def _primary_key(model):
+    return model.__table__.primary_key.columns.values()[0]
+
+
+def _delete_batch(db: Session, model, condition, batch_size: int) -> int:
+    key = _primary_key(model)
+    ids = [row[0] for row in db.execute(select(key).where(condition).limit(batch_size)).all()]
+    if ids:
+        db.execute(delete(model).where(key.in_(ids)))
+    return len(ids)
+
+
+def _scrub_batch(db: Session, model, column_name: str, condition, batch_size: int) -> int:
+    key = _primary_key(model)
+    column = model.__table__.columns[column_name]
+    ids = [row[0] for row in db.execute(
+        select(key).where(condition, column.isnot(None)).limit(batch_size)
+    ).all()]
+    if ids:
+        db.execute(update(model).where(key.in_(ids)).values({column_name: None}))
+    return len(ids)
+
+
+def _hot_sessions(patient_id: int):
+    return select(models.MedicalSession.session_id).where(models.MedicalSession.patient_id == patient_id)
+
+
+def _archived_sessions(patient_id: int):
+    return select(models.MedicalSessionArchive.session_id).where(models.MedicalSessionArchive.patient_id == patient_id)
+
+
+# Steps
+
+def _reports_step(db: Session, patient_id: int, batch_size: int, delete_file: Callable[[str], None]) -> int:
+    """
+    Stored report files first (deleting a missing object succeeds, so a rerun is harmless), then
+    the rows; references and rows commit together, so a crashed batch is counted again on rerun
+    """
+    reports = db.query(
+        models.MedicalReport.report_id, models.MedicalReport.file_key, models.MedicalReport.preview_key
+    ).filter(or_(
+        models.MedicalReport.patient_id == patient_id,
+        models.MedicalReport.session_id.in_(_hot_sessions(patient_id))
+    )).limit(batch_size).all()
+    for report in reports:
+        # Files shared with other reports (same content) stay until their last report goes
+        if not stored_objects.release(db, report.file_key):
+            continue
+        if report.preview_key:
+            delete_file(report.preview_key)
+        delete_file(report.file_key)
+    if reports:
+        db.query(models.MedicalReport)\
+          .filter(models.MedicalReport.report_id.in_([report.report_id for report in reports]))\
+          .delete(synchronize_session=False)
+    return len(reports)
+
+
+def _appointments_step(db: Session, patient_id: int, batch_size: int, delete_file) -> int:
+    rows = db.query(models.Appointment.id, models.Appointment.doctor_id, models.Appointment.booked_slot)\
+             .filter(models.Appointment.patient_id == patient_id)\
+             .limit(batch_size)\
+             .all()
+    if rows:
+        db.query(models.Appointment)\
+          .filter(models.Appointment.id.in_([row.id for row in rows]))\
+          .delete(synchronize_session=False)
+        db.info.setdefault("released_slots", []).extend((row.doctor_id, row.booked_slot) for row in rows)
+    return len(rows)
+
+
+def _cancel_upcoming_step(db: Session, patient_id: int, batch_size: int, delete_file) -> int:
+    """Anonymized patients keep their history but give up the slots they still hold"""
+    rows = db.query(models.Appointment.id, models.Appointment.doctor_id, models.Appointment.booked_slot)\
+             .filter(models.Appointment.patient_id == patient_id,
+                     models.Appointment.booked_slot.isnot(None),
+                     models.Appointment.appointment_time >= datetime.now())\
+             .limit(batch_size)\
+             .all()
+    if rows:
+        # Bulk update bypasses the mapper events, so release the slot here as well
+        db.query(models.Appointment)\
+          .filter(models.Appointment.id.in_([row.id for row in rows]))\
+          .update({"status": "cancelled", "booked_slot": None}, synchronize_session=False)
+        db.info.setdefault("released_slots", []).extend((row.doctor_id, row.booked_slot) for row in rows)
+    return len(rows)
+
+
+def _delete_patient_step(db: Session, patient_id: int, batch_size: int, delete_file) -> int:
+    return db.query(models.Patient).filter(models.Patient.id == patient_id).delete(synchronize_session=False)
+
+
+def _anonymize_patient_step(db: Session, patient_id: int, batch_size: int, delete_file) -> int:
+    placeholder = f"anonymized-{patient_id}"
+    return db.query(models.Patient)\
+             .filter(models.Patient.id == patient_id, models.Patient.email != f"{placeholder}@invalid")\
+             .update({
+                 "name": f"Anonymized P{str(patient_id).zfill(6)}",
+                 "email": f"{placeholder}@invalid",
+                 "phone": placeholder[:20],
+                 "password": uuid.uuid4().hex,
+                 "medical_history": None,
+             }, synchronize_session=False)
+
+
+def _delete_step(model, condition_for: Callable[[int], object]) -> Step:
+    def step(db: Session, patient_id: int, batch_size: int, delete_file) -> int:
+        return _delete_batch(db, model, condition_for(patient_id), batch_size)
+    return step
+
+
+def _scrub_step(model, column_name: str, condition_for: Callable[[int], object]) -> Step:
+    def step(db: Session, patient_id: int, batch_size: int, delete_file) -> int:
+        return _scrub_batch(db, model, column_name, condition_for(patient_id), batch_size)
+    return step
+
+
+def _build_steps() -> dict:
+    """Ordered steps per mode, children before parents"""
+    delete_steps: List[Tuple[str, Step]] = [("reports", _reports_step)]
+    for hot, archive in SESSION_CHILDREN:
+        delete_steps.append((hot.__tablename__, _delete_step(
+            hot, lambda patient_id, hot=hot: hot.session_id.in_(_hot_sessions(patient_id)))))
+    delete_steps += [
+        ("medical_sessions", _delete_step(
+            models.MedicalSession, lambda patient_id: models.MedicalSession.patient_id == patient_id)),
+        ("appointments", _appointments_step),
+    ]
+    for hot, archive in SESSION_CHILDREN:
+        delete_steps.append((archive.__tablename__, _delete_step(
+            archive, lambda patient_id, archive=archive: archive.session_id.in_(_archived_sessions(patient_id)))))
+    delete_steps += [
+        ("medical_sessions_archive", _delete_step(
+            models.MedicalSessionArchive, lambda patient_id: models.MedicalSessionArchive.patient_id == patient_id)),
+        ("appointments_archive", _delete_step(
+            models.AppointmentArchive, lambda patient_id: models.AppointmentArchive.patient_id == patient_id)),
+        ("patient", _delete_patient_step),
+    ]
+
+    anonymize_steps: List[Tuple[str, Step]] = [("reports", _reports_step)]
+    for hot, column_name in SCRUBBED_COLUMNS:
+        if hot is models.MedicalSession:
+            anonymize_steps.append((f"{hot.__tablename__}.{column_name}", _scrub_step(
+                hot, column_name, lambda patient_id: models.MedicalSession.patient_id == patient_id)))
+            anonymize_steps.append((f"medical_sessions_archive.{column_name}", _scrub_step(
+                models.MedicalSessionArchive, column_name,
+                lambda patient_id: models.MedicalSessionArchive.patient_id == patient_id)))
+            continue
+        archive = dict(SESSION_CHILDREN)[hot]
+        anonymize_steps.append((f"{hot.__tablename__}.{column_name}", _scrub_step(
+            hot, column_name, lambda patient_id, hot=hot: hot.session_id.in_(_hot_sessions(patient_id)))))
+        anonymize_steps.append((f"{archive.__tablename__}.{column_name}", _scrub_step(
+            archive, column_name, lambda patient_id, archive=archive: archive.session_id.in_(_archived_sessions(patient_id)))))
+    anonymize_steps += [
+        ("upcoming_appointments", _cancel_upcoming_step),
+        ("patient", _anonymize_patient_step),
+    ]
+    return {"delete": delete_steps, "anonymize": anonymize_steps}
+
+
+STEPS = _build_steps()
+
+
+# Jobs
+
+def format_job(job: models.PatientPurgeJob) -> dict:
+    steps = [name for name, _ in STEPS[job.mode]]
+    done = len(steps) if job.status == "completed" else (steps.index(job.step) if job.step in steps else 0)
+    return {
+        "job_id": job.id,
+        "patient_id": job.patient_id,
+        "mode": job.mode,
+        "status": job.status,
+        "step": job.step,
+        "steps_done": done,
+        "steps_total": len(steps),
+        "progress": json.loads(job.progress or "{}"),
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def start_purge(db: Session, patient_id: int, mode: str = "delete") -> dict:
+    """Record a purge job for the patient, or return the one already pending or running"""
+    if mode not in PURGE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(PURGE_MODES)}")
+    existing = db.query(models.PatientPurgeJob).filter(
+        models.PatientPurgeJob.patient_id == patient_id,
+        models.PatientPurgeJob.status.in_(("pending", "running"))
+    ).first()
+    if existing:
+        return format_job(existing)
+    if not db.query(models.Patient.id).filter(models.Patient.id == patient_id).first():
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    job = models.PatientPurgeJob(patient_id=patient_id, mode=mode, status="pending",
+                                 step=STEPS[mode][0][0], progress="{}", attempts=0)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return format_job(job)
+
+
+def get_job(db: Session, job_id: int) -> Optional[dict]:
+    job = db.query(models.PatientPurgeJob).filter(models.PatientPurgeJob.id == job_id).first()
+    return format_job(job) if job else None
+
+
+def list_jobs(db: Session, limit: int = 50) -> List[dict]:
+    jobs = db.query(models.PatientPurgeJob).order_by(models.PatientPurgeJob.id.desc()).limit(limit).all()
+    return [format_job(job) for job in jobs]
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Atomically take the job unless a live worker holds it"""
+    now = datetime.utcnow()
+    claimed = db.query(models.PatientPurgeJob).filter(
+        models.PatientPurgeJob.id == job_id,
+        or_(
+            models.PatientPurgeJob.status.in_(("pending", "failed")),
+            (models.PatientPurgeJob.status == "running")
+            & or_(models.PatientPurgeJob.heartbeat_at.is_(None),
+                  models.PatientPurgeJob.heartbeat_at < now - timedelta(seconds=PURGE_STALE_SECONDS))
+        )
+    ).update({
+        "status": "running",
+        "heartbeat_at": now,
+        "error": None,
+        "attempts": models.PatientPurgeJob.attempts + 1,
+    }, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+
+def _release_slots(db: Session):
+    for doctor_id, booked_slot in db.info.pop("released_slots", []):
+        bitmaps.slot_changed(doctor_id, booked_slot, None)
+
+
+def run_job(
+    job_id: int,
+    delete_file: Callable[[str], None],
+    batch_size: int = PURGE_BATCH_SIZE,
+    pause: float = PURGE_BATCH_PAUSE
+) -> Optional[dict]:
+    """
+    Work through the job's remaining steps on a session of its own. Each batch and the job's
+    progress commit together, so a crash loses at most the batch in flight and a rerun
+    continues from the recorded step. A completed job is returned as it is, so running it
+    again is harmless. Returns None when another worker holds the job.
+    """
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            job = db.query(models.PatientPurgeJob).filter(models.PatientPurgeJob.id == job_id).first()
+            if job is not None and job.status == "completed":
+                return format_job(job)
+            return None
+        job = db.query(models.PatientPurgeJob).filter(models.PatientPurgeJob.id == job_id).one()
+        steps = STEPS[job.mode]
+        names = [name for name, _ in steps]
+        progress = json.loads(job.progress or "{}")
+        start = names.index(job.step) if job.step in names else 0
+        try:
+            for index in range(start, len(steps)):
+                name, step = steps[index]
+                while True:
+                    handled = step(db, job.patient_id, batch_size, delete_file)
+                    if handled:
+                        progress[name] = progress.get(name, 0) + handled
+                    finished = handled < batch_size
+                    job.step = names[index + 1] if finished and index + 1 < len(names) else name
+                    job.progress = json.dumps(progress)
+                    job.heartbeat_at = datetime.utcnow()
+                    db.commit()
+                    _release_slots(db)
+                    if finished:
+                        break
+                    if pause:
+                        time.sleep(pause)
+            job.status = "completed"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            db.info.pop("released_slots", None)
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+            db.commit()
+            print(f"❌ Patient purge job {job_id} failed at {job.step}: {job.error}")
+            return format_job(job)
+
+        entity_cache.invalidate_patient(job.patient_id)
+        if job.mode == "delete":
+            search_index.remove(job.patient_id)
+        else:
+            patient = db.query(models.Patient).filter(models.Patient.id == job.patient_id).first()
+            if patient:
+                search_index.upsert(patient.id, patient.name, patient.email, patient.phone)
+        counters.invalidate()
+        print(f"🧹 Patient {job.patient_id} {job.mode} finished: {progress}")
+        return format_job(job)
+    finally:
+        db.close()
+
+
+def enqueue_run(db: Session, job_id: int) -> dict:
+    """Queue the run on the background job queue; the "patient_purge" handler calls run_job"""
+    return job_queue.enqueue(db, "patient_purge", {"purge_job_id": job_id},
+                             key=f"patient_purge:{job_id}", max_attempts=PURGE_MAX_ATTEMPTS)
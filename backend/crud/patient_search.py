@@ -0,0 +1,278 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import or_
+from .. import models
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+import os
+import re
+import threading
+import time
+
+# The index is rebuilt from the database after this many seconds, which is how patients
+# added or edited by other workers show up (and how stale posting entries are dropped).
+# One request per process rebuilds; the others keep searching the previous index meanwhile.
+RELOAD_INTERVAL = int(os.getenv("PATIENT_SEARCH_RELOAD_SECONDS", "300"))
+
+# Queries shorter than the n-gram size use the database indexes (prefix matches only)
+GRAM = 3
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Upper bound on rows each database prefix query contributes to the ranking
+MAX_PREFIX_CANDIDATES = 500
+
+# Lower rank sorts first
+RANK_ID = 0
+RANK_EXACT = 1
+RANK_NAME_PREFIX = 2
+RANK_NAME_WORD_PREFIX = 3
+RANK_FIELD_PREFIX = 4
+RANK_SUBSTRING = 5
+
+_PATIENT_ID = re.compile(r"^p?0*(\d{1,9})$")
+
+
+def format_patient_id(patient_id: int) -> str:
+    return f"P{str(patient_id).zfill(6)}"
+
+
+def _digits(value: str) -> str:
+    return "".join(ch for ch in value if ch.isdigit())
+
+
+def _normalize(name: str, email: str, phone: str) -> Tuple[str, str, str]:
+    return (name or "").lower(), (email or "").lower(), _digits(phone or "")
+
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class PatientSearchIndex:
+    """
+    Per-process trigram index over patient name, email and phone digits for substring search.
+    Bulk-built as sorted integer arrays on first use; create/edit/remove add postings to a small
+    overlay and update the stored fields, and every candidate is verified against those fields,
+    so postings left behind by edits and removals never produce a wrong match.
+    """
+
+    def __init__(self, reload_interval: int = RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._built = False
+        self._loaded_at: Optional[float] = None
+        self._fields: Dict[int, Tuple[str, str, str]] = {}
+        self._postings: Dict[str, array] = {}
+        self._overlay: Dict[str, Set[int]] = {}
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_interval
+
+    def rebuild(self, db: Session):
+        fields = {}
+        building: Dict[str, List[int]] = {}
+        rows = db.query(models.Patient.id, models.Patient.name, models.Patient.email, models.Patient.phone)\
+                 .order_by(models.Patient.id)\
+                 .yield_per(5000)
+        for patient_id, name, email, phone in rows:
+            normalized = _normalize(name, email, phone)
+            fields[patient_id] = normalized
+            for gram in _grams(normalized[0]) | _grams(normalized[1]) | _grams(normalized[2]):
+                building.setdefault(gram, []).append(patient_id)
+        # Ids arrive in order, so every posting list is already sorted
+        postings = {gram: array("i", ids) for gram, ids in building.items()}
+        with self._lock:
+            self._fields = fields
+            self._postings = postings
+            self._overlay = {}
+            self._loaded_at = time.monotonic()
+            self._built = True
+
+    def ensure_loaded(self, db: Session):
+        """Rebuild when stale, one caller at a time; only the very first build is waited for"""
+        if not self.is_stale():
+            return
+        if not self._rebuild_lock.acquire(blocking=not self._built):
+            return  # another request is rebuilding; the previous index still answers
+        try:
+            if self.is_stale():
+                self.rebuild(db)
+        finally:
+            self._rebuild_lock.release()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    # Updates from admin_patients (after commit)
+
+    def upsert(self, patient_id: int, name: str, email: str, phone: str):
+        normalized = _normalize(name, email, phone)
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._fields[patient_id] = normalized
+            for gram in _grams(normalized[0]) | _grams(normalized[1]) | _grams(normalized[2]):
+                self._overlay.setdefault(gram, set()).add(patient_id)
+
+    def remove(self, patient_id: int):
+        with self._lock:
+            self._fields.pop(patient_id, None)
+
+    # Queries
+
+    def substring_matches(self, text: str, digits: str) -> Dict[int, Tuple[str, str, str]]:
+        """Patients whose name or email contains text, or whose phone contains digits"""
+        matches = {}
+        with self._lock:
+            for needle, positions in ((text, (0, 1)), (digits, (2,))):
+                if len(needle) < GRAM:
+                    continue
+                # Candidates from the rarest gram of the needle, then verified
+                rarest = min(
+                    _grams(needle),
+                    key=lambda gram: len(self._postings.get(gram, ())) + len(self._overlay.get(gram, ()))
+                )
+                candidates = set(self._postings.get(rarest, ())) | self._overlay.get(rarest, set())
+                for patient_id in candidates:
+                    fields = self._fields.get(patient_id)
+                    if fields and any(needle in fields[i] for i in positions):
+                        matches[patient_id] = fields
+        return matches
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "patients": len(self._fields),
+                "grams": len(self._postings),
+                "postings": sum(len(ids) for ids in self._postings.values()),
+                "overlay_grams": len(self._overlay),
+            }
+
+
+index = PatientSearchIndex()
+
+
+def _rank(fields: Tuple[str, str, str], patient_id: int, text: str, digits: str, id_match: Optional[int]) -> int:
+    name, email, phone = fields
+    if id_match is not None and patient_id == id_match:
+        return RANK_ID
+    if text in (name, email, email.split("@")[0]) or (digits and digits == phone):
+        return RANK_EXACT
+    if name.startswith(text):
+        return RANK_NAME_PREFIX
+    if any(word.startswith(text) for word in name.split()):
+        return RANK_NAME_WORD_PREFIX
+    if email.startswith(text) or (digits and phone.startswith(digits)):
+        return RANK_FIELD_PREFIX
+    return RANK_SUBSTRING
+
+
+def _prefix_candidates(
+    db: Session, query: str, digits: str, id_match: Optional[int]
+) -> Tuple[Dict[int, Tuple[str, str, str]], bool]:
+    """
+    Prefix (and P-id) matches through the name index, the unique email/phone indexes and the
+    primary key. At most MAX_PREFIX_CANDIDATES prefix matches, first by name; the flag says
+    whether more were left out.
+    """
+    pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    conditions = [
+        models.Patient.name.like(pattern, escape="\\"),
+        models.Patient.email.like(pattern, escape="\\"),
+        models.Patient.phone.like(pattern, escape="\\"),
+    ]
+    if digits and digits != query:
+        conditions.append(models.Patient.phone.like(digits + "%"))
+        conditions.append(models.Patient.phone.like("+" + digits + "%"))
+    columns = (models.Patient.id, models.Patient.name, models.Patient.email, models.Patient.phone)
+    rows = db.query(*columns)\
+             .filter(or_(*conditions))\
+             .order_by(models.Patient.name, models.Patient.id)\
+             .limit(MAX_PREFIX_CANDIDATES + 1)\
+             .all()
+    truncated = len(rows) > MAX_PREFIX_CANDIDATES
+    rows = rows[:MAX_PREFIX_CANDIDATES]
+    if id_match is not None:
+        # Looked up on its own so the best-ranked match can never be cut off
+        rows += db.query(*columns).filter(models.Patient.id == id_match).all()
+    return {row.id: _normalize(row.name, row.email, row.phone) for row in rows}, truncated
+
+
+def search_patients(
+    db: Session,
+    query: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    offset: int = 0,
+    patient_ids: Optional[Set[int]] = None
+) -> dict:
+    """
+    Ranked, paginated patient search by P-id, name, email or phone; prefix matches come from the
+    database indexes and substring matches from the trigram index. patient_ids restricts the
+    results (a doctor's own patients). Very broad prefixes are capped (see _prefix_candidates)
+    and the response says so in "truncated".
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    query = query.strip()
+    text = query.lower()
+    digits = _digits(query)
+    id_match = _PATIENT_ID.match(text)
+    id_match = int(id_match.group(1)) if id_match else None
+
+    index.ensure_loaded(db)
+    candidates = index.substring_matches(text, digits) if text else {}
+    truncated = False
+    if text:
+        prefix_matches, truncated = _prefix_candidates(db, query, digits, id_match)
+        candidates.update(prefix_matches)
+    if patient_ids is not None:
+        candidates = {patient_id: fields for patient_id, fields in candidates.items() if patient_id in patient_ids}
+
+    ranked = sorted(
+        candidates.items(),
+        key=lambda item: (_rank(item[1], item[0], text, digits, id_match), item[1][0], item[0])
+    )
+    page = ranked[offset:offset + limit]
+    rows = {
+        patient.id: patient
+        for patient in db.query(models.Patient).filter(models.Patient.id.in_([patient_id for patient_id, _ in page])).all()
+    } if page else {}
+
+    results = []
+    for patient_id, fields in page:
+        patient = rows.get(patient_id)
+        if patient is None:
+            continue  # removed by another worker since the index was built
+        results.append({
+            "id": patient.id,
+            "patient_id": format_patient_id(patient.id),
+            "name": patient.name,
+            "age": patient.age,
+            "blood_group": patient.blood_group,
+            "email": patient.email,
+            "phone": patient.phone,
+            "rank": _rank(fields, patient_id, text, digits, id_match),
+        })
+    return {
+        "query": query,
+        "total": len(ranked),
+        # total is a lower bound: the query matched more prefixes than are ranked
+        "truncated": truncated,
+        "limit": limit,
+        "offset": offset,
+        "has_more": offset + limit < len(ranked),
+        "results": results,
+    }
+
+
+def get_doctor_patient_ids(db: Session, doctor_id: int) -> Set[int]:
+    """Everyone the doctor has an appointment with, archived appointments included"""
+    patient_ids = set()
+    for model in (models.Appointment, models.AppointmentArchive):
+        patient_ids.update(
+            row.patient_id for row in db.query(model.patient_id).filter(model.doctor_id == doctor_id).distinct().all()
+        )
+    return patient_ids
@@ -2,6 +2,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from .. import models
 from .. import schemas
+from .admin_dashboard_counters import counters
+from .patient_search import index as search_index
 
 def get_patient_by_email(db: Session, email: str):
     return db.query(models.Patient).filter(models.Patient.email == email).first()
@@ -15,6 +17,8 @@ def create_patient(db: Session, patient: schemas.PatientCreate):
     try:
         db.commit()
         db.refresh(db_patient)
+        counters.adjust_patients(1)
+        search_index.upsert(db_patient.id, db_patient.name, db_patient.email, db_patient.phone)
         return db_patient
     except Exception as e:
         db.rollback()
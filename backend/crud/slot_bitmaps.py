@@ -0,0 +1,243 @@
+from sqlalchemy.orm import Session
+from .. import models
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import threading
+import time
+
+# A clinic day is 48 half-hour slots; bit i of a day mask is the slot starting at i * 30 minutes
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+# Used for every weekday of doctors without a schedule template
+DEFAULT_BLOCKS = [("09:00", "12:00"), ("14:00", "17:30")]
+
+# Cached doctor-days and schedule rules are reloaded after this many seconds, which is how
+# bookings made by other workers show up. The unique slot constraint, not these bitmaps,
+# is what prevents double booking; the bitmaps only answer availability questions.
+BITMAP_TTL = float(os.getenv("SLOT_BITMAP_TTL", "60"))
+MAX_CACHED_DAYS = int(os.getenv("SLOT_BITMAP_MAX_DAYS", "200000"))
+
+
+def minutes_of(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def block_mask(start: str, end: str) -> int:
+    """Mask of the slots that start inside [start, end)"""
+    first = minutes_of(start) // SLOT_MINUTES
+    last = min(-(-minutes_of(end) // SLOT_MINUTES), SLOTS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def slot_index(when: datetime) -> int:
+    return (when.hour * 60 + when.minute) // SLOT_MINUTES
+
+
+def slot_time(index: int) -> str:
+    minutes = index * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def mask_to_times(mask: int) -> List[str]:
+    times = []
+    while mask:
+        low = mask & -mask
+        times.append(slot_time(low.bit_length() - 1))
+        mask ^= low
+    return times
+
+
+def slot_datetime(day: date, index: int) -> datetime:
+    return datetime.combine(day, dt_time.min) + timedelta(minutes=index * SLOT_MINUTES)
+
+
+DEFAULT_DAY_MASK = 0
+for _start, _end in DEFAULT_BLOCKS:
+    DEFAULT_DAY_MASK |= block_mask(_start, _end)
+
+
+class _DoctorRules:
+    __slots__ = ("loaded_at", "weekday_masks", "exceptions")
+
+    def __init__(self, loaded_at: float, weekday_masks: List[int], exceptions: Dict[date, int]):
+        self.loaded_at = loaded_at
+        self.weekday_masks = weekday_masks  # Monday..Sunday open masks
+        self.exceptions = exceptions  # date -> slots closed that day (leave, holidays)
+
+    def open_mask(self, day: date) -> int:
+        return self.weekday_masks[day.weekday()] & ~self.exceptions.get(day, 0)
+
+
+class SlotBitmaps:
+    """
+    Per-process cache of doctor-day bitmaps: which slots a doctor works (schedule template
+    minus exceptions) and which are booked. Loaded in bulk from the database on first use,
+    then kept current by the booking/reschedule/cancel paths and reloaded after BITMAP_TTL.
+    """
+
+    def __init__(self, ttl: float = BITMAP_TTL, max_days: int = MAX_CACHED_DAYS):
+        self.ttl = ttl
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        self._rules: Dict[int, _DoctorRules] = {}
+        self._booked: "OrderedDict[Tuple[int, date], Tuple[float, int]]" = OrderedDict()
+
+    # Loading
+
+    def _load_rules(self, db: Session, doctor_ids: List[int]):
+        templates = {doctor_id: None for doctor_id in doctor_ids}
+        for row in db.query(models.DoctorSchedule).filter(models.DoctorSchedule.doctor_id.in_(doctor_ids)).all():
+            masks = templates[row.doctor_id]
+            if masks is None:
+                masks = templates[row.doctor_id] = [0] * 7
+            masks[row.weekday] |= block_mask(row.start_time, row.end_time)
+
+        exceptions = {doctor_id: {} for doctor_id in doctor_ids}
+        for row in db.query(models.DoctorScheduleException).filter(
+            models.DoctorScheduleException.doctor_id.in_(doctor_ids)
+        ).all():
+            closed = block_mask(row.start_time, row.end_time) if row.start_time and row.end_time else FULL_DAY
+            day_exceptions = exceptions[row.doctor_id]
+            day_exceptions[row.exception_date] = day_exceptions.get(row.exception_date, 0) | closed
+
+        now = time.monotonic()
+        with self._lock:
+            for doctor_id in doctor_ids:
+                self._rules[doctor_id] = _DoctorRules(
+                    now, templates[doctor_id] or [DEFAULT_DAY_MASK] * 7, exceptions[doctor_id]
+                )
+
+    def _load_booked(self, db: Session, doctor_ids: List[int], first_day: date, last_day: date):
+        start = datetime.combine(first_day, dt_time.min)
+        end = datetime.combine(last_day, dt_time.min) + timedelta(days=1)
+        masks = {}
+        rows = db.query(models.Appointment.doctor_id, models.Appointment.booked_slot).filter(
+            models.Appointment.doctor_id.in_(doctor_ids),
+            models.Appointment.booked_slot >= start,
+            models.Appointment.booked_slot < end
+        ).all()
+        for doctor_id, booked_slot in rows:
+            key = (doctor_id, booked_slot.date())
+            masks[key] = masks.get(key, 0) | (1 << slot_index(booked_slot))
+
+        now = time.monotonic()
+        days = (last_day - first_day).days + 1
+        with self._lock:
+            for doctor_id in doctor_ids:
+                for offset in range(days):
+                    key = (doctor_id, first_day + timedelta(days=offset))
+                    self._booked[key] = (now, masks.get(key, 0))
+                    self._booked.move_to_end(key)
+            while len(self._booked) > self.max_days:
+                self._booked.popitem(last=False)
+
+    def ensure_loaded(self, db: Session, doctor_ids: Iterable[int], first_day: date, last_day: date):
+        """Load whatever is missing or expired for these doctors and days with two or three queries"""
+        doctor_ids = list(doctor_ids)
+        now = time.monotonic()
+        with self._lock:
+            stale_rules = [
+                doctor_id for doctor_id in doctor_ids
+                if doctor_id not in self._rules or now - self._rules[doctor_id].loaded_at > self.ttl
+            ]
+            stale_days = []
+            for doctor_id in doctor_ids:
+                day = first_day
+                while day <= last_day:
+                    cached = self._booked.get((doctor_id, day))
+                    if cached is None or now - cached[0] > self.ttl:
+                        stale_days.append(doctor_id)
+                        break
+                    day += timedelta(days=1)
+        if stale_rules:
+            self._load_rules(db, stale_rules)
+        if stale_days:
+            self._load_booked(db, stale_days, first_day, last_day)
+
+    # Queries (pure bit operations once loaded)
+
+    def _masks(self, doctor_id: int, day: date) -> Tuple[int, int]:
+        rules = self._rules.get(doctor_id)
+        cached = self._booked.get((doctor_id, day))
+        open_mask = rules.open_mask(day) if rules else DEFAULT_DAY_MASK
+        return open_mask, cached[1] if cached else 0
+
+    def day(self, db: Session, doctor_id: int, day: date) -> Tuple[int, int]:
+        """(open, booked) masks of one doctor-day"""
+        self.ensure_loaded(db, [doctor_id], day, day)
+        with self._lock:
+            return self._masks(doctor_id, day)
+
+    def next_free(self, db: Session, doctor_ids: Iterable[int], after: datetime, days: int) -> Dict[int, Optional[datetime]]:
+        """Earliest free slot starting at or after `after` within `days` days, per doctor"""
+        doctor_ids = list(doctor_ids)
+        first_day = after.date()
+        last_day = first_day + timedelta(days=days - 1)
+        self.ensure_loaded(db, doctor_ids, first_day, last_day)
+
+        # Slots on the first day that start before `after` are not eligible
+        first_index = -(-(after.hour * 60 + after.minute + (1 if after.second or after.microsecond else 0)) // SLOT_MINUTES)
+        not_before = FULL_DAY & ~((1 << first_index) - 1)
+
+        found = {}
+        with self._lock:
+            for doctor_id in doctor_ids:
+                found[doctor_id] = None
+                for offset in range(days):
+                    day = first_day + timedelta(days=offset)
+                    open_mask, booked = self._masks(doctor_id, day)
+                    free = open_mask & ~booked
+                    if offset == 0:
+                        free &= not_before
+                    if free:
+                        found[doctor_id] = slot_datetime(day, (free & -free).bit_length() - 1)
+                        break
+        return found
+
+    # Updates from the booking paths (after commit)
+
+    def slot_changed(self, doctor_id: int, old_slot: Optional[datetime], new_slot: Optional[datetime]):
+        """An appointment released old_slot and/or took new_slot (None when not applicable)"""
+        if old_slot == new_slot:
+            return
+        with self._lock:
+            if old_slot is not None:
+                key = (doctor_id, old_slot.date())
+                cached = self._booked.get(key)
+                if cached is not None:
+                    if old_slot.minute % SLOT_MINUTES or old_slot.second:
+                        # Off-grid times may share a slot with another appointment; reload instead
+                        del self._booked[key]
+                    else:
+                        self._booked[key] = (cached[0], cached[1] & ~(1 << slot_index(old_slot)))
+            if new_slot is not None:
+                self._mark_booked(doctor_id, new_slot)
+
+    def mark_booked(self, doctor_id: int, when: datetime):
+        with self._lock:
+            self._mark_booked(doctor_id, when)
+
+    def _mark_booked(self, doctor_id: int, when: datetime):
+        key = (doctor_id, when.date())
+        cached = self._booked.get(key)
+        if cached is not None:
+            self._booked[key] = (cached[0], cached[1] | (1 << slot_index(when)))
+
+    def invalidate_doctor(self, doctor_id: int):
+        """Schedule template or exceptions changed"""
+        with self._lock:
+            self._rules.pop(doctor_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"doctors": len(self._rules), "doctor_days": len(self._booked), "max_doctor_days": self.max_days}
+
+
+bitmaps = SlotBitmaps()
@@ -0,0 +1,170 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func
+from fastapi import HTTPException, UploadFile
+from .. import models
+from .. import job_queue
+from typing import Optional, Tuple
+import hashlib
+import os
+
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# Bytes read from an upload at a time while hashing and spooling it
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def content_key(sha256: str) -> str:
+    """Object key derived from the content, so identical files map to one object"""
+    return f"reports/sha256/{sha256[:2]}/{sha256}"
+
+
+async def spool_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[str, int, str]:
+    """Copy the upload to the job spool chunk by chunk, hashing as it goes; returns (path, size, sha256)"""
+    path = job_queue.new_spool_path()
+    temporary = path + ".part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temporary, "wb") as handle:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB.")
+                digest.update(chunk)
+                handle.write(chunk)
+    except BaseException:
+        job_queue.discard_spool(temporary)
+        raise
+    os.replace(temporary, path)
+    return path, size, digest.hexdigest()
+
+
+def acquire(db: Session, sha256: str, size: int, content_type: str) -> Tuple[models.StoredObject, bool]:
+    """
+    Take a reference on the object with this content, creating it if it is new. Returns the
+    object and whether the caller must upload the bytes (new, or an earlier upload failed).
+    Call before adding anything else to the session: a lost race to create the row rolls it back.
+    Nothing is committed here; the reference commits with the caller's report row.
+    """
+    for _ in range(3):
+        referenced = db.query(models.StoredObject)\
+                       .filter(models.StoredObject.sha256 == sha256)\
+                       .update({"ref_count": models.StoredObject.ref_count + 1}, synchronize_session=False)
+        if referenced:
+            stored = db.query(models.StoredObject)\
+                       .filter(models.StoredObject.sha256 == sha256)\
+                       .populate_existing()\
+                       .one()
+            if stored.status == "failed":
+                stored.status = "pending"
+                return stored, True
+            return stored, False
+
+        stored = models.StoredObject(
+            sha256=sha256,
+            object_key=content_key(sha256),
+            size=size,
+            content_type=content_type,
+            status="pending",
+            ref_count=1
+        )
+        db.add(stored)
+        try:
+            db.flush()
+            return stored, True
+        except IntegrityError:
+            # Created by a concurrent upload of the same bytes; reference that one
+            db.rollback()
+    raise RuntimeError(f"Could not reference stored object {sha256}")
+
+
+def release(db: Session, object_key: str) -> bool:
+    """
+    Drop one report's reference to the object. True when the caller should delete the stored
+    file: that was the last reference, or the file predates content addressing. The row goes
+    with the caller's commit; delete the file before committing, so a concurrent upload of the
+    same bytes (blocked on the row until then) stores it afresh.
+    """
+    released = db.query(models.StoredObject)\
+                 .filter(models.StoredObject.object_key == object_key)\
+                 .update({"ref_count": models.StoredObject.ref_count - 1}, synchronize_session=False)
+    if not released:
+        return True
+    remaining = db.query(models.StoredObject.ref_count).filter(models.StoredObject.object_key == object_key).scalar()
+    if remaining > 0:
+        return False
+    db.query(models.StoredObject).filter(models.StoredObject.object_key == object_key).delete(synchronize_session=False)
+    return True
+
+
+def is_live(db: Session, object_key: str) -> bool:
+    """Some report still references the object (its row goes with the last reference)"""
+    return db.query(models.StoredObject.id).filter(models.StoredObject.object_key == object_key).first() is not None
+
+
+def mark_stored(db: Session, object_key: str, stored_size: int, content_encoding: Optional[str] = None) -> bool:
+    """
+    The upload finished: the object and every report waiting on it become available.
+    False when the object lost its last reference meanwhile; the caller deletes the file.
+    """
+    stored = {"stored_size": stored_size, "content_encoding": content_encoding}
+    updated = db.query(models.StoredObject).filter(models.StoredObject.object_key == object_key)\
+                .update({"status": "stored", **stored}, synchronize_session=False)
+    if not updated:
+        return False
+    db.query(models.MedicalReport).filter(
+        models.MedicalReport.file_key == object_key,
+        models.MedicalReport.upload_status == "pending"
+    ).update({"upload_status": "stored", **stored}, synchronize_session=False)
+    return True
+
+
+def mark_failed(db: Session, object_key: str):
+    db.query(models.StoredObject).filter(models.StoredObject.object_key == object_key)\
+      .update({"status": "failed"}, synchronize_session=False)
+    db.query(models.MedicalReport).filter(
+        models.MedicalReport.file_key == object_key,
+        models.MedicalReport.upload_status == "pending"
+    ).update({"upload_status": "failed"}, synchronize_session=False)
+
+
+def is_referenced(db: Session, object_key: str) -> bool:
+    return db.query(models.MedicalReport.report_id).filter(models.MedicalReport.file_key == object_key).first() is not None
+
+
+def shared_preview_key(db: Session, object_key: str) -> Optional[str]:
+    """Preview already generated for another report with the same content"""
+    row = db.query(models.MedicalReport.preview_key).filter(
+        models.MedicalReport.file_key == object_key,
+        models.MedicalReport.preview_key.isnot(None)
+    ).first()
+    return row.preview_key if row else None
+
+
+def set_preview(db: Session, object_key: str, preview_key: str):
+    db.query(models.MedicalReport).filter(models.MedicalReport.file_key == object_key)\
+      .update({"preview_key": preview_key}, synchronize_session=False)
+
+
+def storage_stats(db: Session) -> dict:
+    objects, references, original_bytes, stored_bytes, referenced_bytes = db.query(
+        func.count(models.StoredObject.id),
+        func.coalesce(func.sum(models.StoredObject.ref_count), 0),
+        func.coalesce(func.sum(models.StoredObject.size), 0),
+        func.coalesce(func.sum(func.coalesce(models.StoredObject.stored_size, models.StoredObject.size)), 0),
+        func.coalesce(func.sum(models.StoredObject.size * models.StoredObject.ref_count), 0)
+    ).one()
+    return {
+        "objects": objects,
+        "references": references,
+        "original_bytes": original_bytes,
+        "stored_bytes": stored_bytes,
+        "compressed_objects": db.query(func.count(models.StoredObject.id))
+                                .filter(models.StoredObject.content_encoding.isnot(None)).scalar() or 0,
+        "deduplicated_bytes": referenced_bytes - original_bytes,
+        "pending": db.query(func.count(models.StoredObject.id)).filter(models.StoredObject.status == "pending").scalar() or 0,
+    }
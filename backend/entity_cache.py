@@ -0,0 +1,240 @@
+"""
+Read-through cache for Patient and Doctor rows looked up by primary key.
+
+Entries are plain column snapshots (never ORM instances, never passwords) so they
+can be shared across sessions and stored out of process. Writers call
+invalidate_patient / invalidate_doctor after committing.
+
+Configuration (environment):
+    ENTITY_CACHE_BACKEND      memory (default), redis or none
+    ENTITY_CACHE_URL          redis://localhost:6379/0 - any Redis-protocol server works as a local stand-in
+    ENTITY_CACHE_TTL          seconds an entry stays valid (default 60)
+    ENTITY_CACHE_MAX_ENTRIES  LRU capacity of the in-process backend (default 10000)
+"""
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Callable, Optional
+from sqlalchemy.orm import Session
+from . import models
+import json
+import os
+import threading
+import time
+
+CACHE_BACKEND = os.getenv("ENTITY_CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("ENTITY_CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL = int(os.getenv("ENTITY_CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("ENTITY_CACHE_MAX_ENTRIES", "10000"))
+
+PATIENT_FIELDS = ("id", "name", "phone", "email", "age", "blood_group", "medical_history")
+DOCTOR_FIELDS = ("id", "name", "phone", "email", "department", "description", "image_url")
+
+
+class CacheBackend:
+    """Storage interface used by EntityCache"""
+
+    name = "none"
+
+    def get(self, key: str) -> Optional[dict]:
+        return None
+
+    def set(self, key: str, value: dict, ttl: int):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InProcessBackend(CacheBackend):
+    """LRU dictionary with per-entry expiry, private to the current worker process"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisBackend(CacheBackend):
+    """Out-of-process store shared by every worker; eviction is left to the server's maxmemory policy"""
+
+    name = "redis"
+
+    def __init__(self, url: str = CACHE_URL, prefix: str = "curanet:entity:"):
+        import redis  # optional dependency, only needed for this backend
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25)
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: dict, ttl: int):
+        self._client.set(self.prefix + key, json.dumps(value), ex=ttl)
+
+    def delete(self, key: str):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(key)
+
+
+class EntityCache:
+    """Read-through cache with hit/miss accounting per entity kind"""
+
+    def __init__(self, backend: CacheBackend, ttl: int = CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def _count(self, kind: str, outcome: str):
+        with self._lock:
+            per_kind = self._counts.setdefault(kind, {"hits": 0, "misses": 0, "errors": 0})
+            per_kind[outcome] += 1
+
+    def get_or_load(self, kind: str, entity_id: int, loader: Callable[[], Optional[dict]]) -> Optional[dict]:
+        key = f"{kind}:{entity_id}"
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            # A broken cache server must not take the API down with it
+            print(f"Entity cache read error ({self.backend.name}): {e}")
+            self._count(kind, "errors")
+            return loader()
+
+        if value is not None:
+            self._count(kind, "hits")
+            return value
+
+        self._count(kind, "misses")
+        value = loader()
+        if value is not None:
+            try:
+                self.backend.set(key, value, self.ttl)
+            except Exception as e:
+                print(f"Entity cache write error ({self.backend.name}): {e}")
+                self._count(kind, "errors")
+        return value
+
+    def invalidate(self, kind: str, entity_id: int):
+        try:
+            self.backend.delete(f"{kind}:{entity_id}")
+        except Exception as e:
+            print(f"Entity cache invalidate error ({self.backend.name}): {e}")
+            self._count(kind, "errors")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            kinds = {kind: dict(counts) for kind, counts in self._counts.items()}
+        for counts in kinds.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_ratio"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+        return {
+            "backend": self.backend.name,
+            "ttl_seconds": self.ttl,
+            "entities": kinds,
+            **self.backend.stats(),
+        }
+
+
+def _create_backend() -> CacheBackend:
+    if CACHE_BACKEND == "redis":
+        try:
+            return RedisBackend(CACHE_URL)
+        except Exception as e:
+            print(f"⚠️  Redis entity cache unavailable, using in-process cache: {e}")
+            return InProcessBackend()
+    if CACHE_BACKEND == "none":
+        return CacheBackend()
+    return InProcessBackend()
+
+
+cache = EntityCache(_create_backend())
+
+
+def _snapshot(row, fields) -> dict:
+    return {field: getattr(row, field) for field in fields}
+
+
+def get_patient(db: Session, patient_id: int) -> Optional[SimpleNamespace]:
+    """
+    Fetch a patient's columns (without password) through the cache
+    """
+    def load():
+        patient = db.query(models.Patient).filter(models.Patient.id == patient_id).first()
+        return _snapshot(patient, PATIENT_FIELDS) if patient else None
+
+    value = cache.get_or_load("patient", patient_id, load)
+    return SimpleNamespace(**value) if value else None
+
+
+def get_doctor(db: Session, doctor_id: int) -> Optional[SimpleNamespace]:
+    """
+    Fetch a doctor's columns (without password) through the cache
+    """
+    def load():
+        doctor = db.query(models.Doctor).filter(models.Doctor.id == doctor_id).first()
+        return _snapshot(doctor, DOCTOR_FIELDS) if doctor else None
+
+    value = cache.get_or_load("doctor", doctor_id, load)
+    return SimpleNamespace(**value) if value else None
+
+
+def invalidate_patient(patient_id: int):
+    cache.invalidate("patient", patient_id)
+
+
+def invalidate_doctor(doctor_id: int):
+    cache.invalidate("doctor", doctor_id)
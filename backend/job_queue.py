@@ -0,0 +1,493 @@
+"""
+Durable background job queue for work that should not hold up a request: report uploads,
+patient purges, archive runs.
+
+Jobs are rows in background_jobs, so they survive restarts and deploys. Every process runs a
+small pool of worker threads that claim due jobs with a conditional UPDATE (exactly one worker
+wins each job, across processes), hold a lease on the job while it runs and record the outcome.
+A failed attempt is retried with exponential backoff and jitter until max_attempts, after which
+the job is "dead" and its handler's on_dead hook runs. A job whose lease runs out (its worker
+was killed) is queued again, so handlers must be safe to run twice; enqueueing with an
+idempotency key is safe to repeat as well.
+
+With in-memory SQLite (one shared connection) there are no worker threads: due jobs run
+inline, right after the enqueue that commits them.
+
+Configuration (environment):
+    JOB_WORKERS               worker threads per process (default 2; 0 leaves jobs to other processes)
+    JOB_POLL_SECONDS          idle poll interval; enqueue in the same process wakes a worker at once (default 2)
+    JOB_LEASE_SECONDS         a running job not heartbeated for this long is taken back (default 120)
+    JOB_MAX_ATTEMPTS          attempts before a job is dead (default 5)
+    JOB_BACKOFF_SECONDS       delay before the first retry, doubled for each further one (default 5)
+    JOB_BACKOFF_MAX_SECONDS   retry delay cap (default 600)
+    JOB_SPOOL_DIR             files waiting for their job (uploads); must be shared by every process running workers
+"""
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+from . import models
+from .database import SessionLocal, SUPPORTS_CONCURRENT_SESSIONS
+from .metrics import observe_job
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import uuid
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "5"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "600"))
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "curanet-job-spool")
+
+JOB_STATUSES = ("queued", "running", "succeeded", "dead")
+
+# Finished jobs the admin latency view looks back over
+LATENCY_WINDOW_SECONDS = 3600
+LATENCY_SAMPLE_SIZE = 2000
+
+Handler = Callable[[dict], None]
+DeadHook = Callable[[dict, str], None]
+
+_handlers: Dict[str, Tuple[Handler, Optional[DeadHook]]] = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help; the job goes straight to dead"""
+
+
+def handler(kind: str, on_dead: Optional[DeadHook] = None):
+    """Register the function that runs jobs of this kind; on_dead(payload, error) runs when it gives up"""
+    def register(fn: Handler) -> Handler:
+        _handlers[kind] = (fn, on_dead)
+        return fn
+    return register
+
+
+def format_job(job: models.BackgroundJob) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "payload": json.loads(job.payload or "{}"),
+        "idempotency_key": job.idempotency_key,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after.isoformat() if job.run_after else None,
+        "last_error": job.last_error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter, so jobs that failed together do not retry together"""
+    delay = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobQueue:
+    """Worker pool of this process plus the lease heartbeat for the jobs it is running"""
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._running: Dict[int, str] = {}
+        self._outcomes: Dict[str, int] = {"succeeded": 0, "retried": 0, "dead": 0}
+        self._inline = threading.local()
+
+    @property
+    def started(self) -> bool:
+        return bool(self._threads)
+
+    def start(self):
+        if self._threads:
+            return
+        if not SUPPORTS_CONCURRENT_SESSIONS:
+            print("⚙️  Background jobs run inline (in-memory SQLite)")
+            return
+        if self.workers <= 0:
+            print("⚙️  Background job workers disabled (JOB_WORKERS=0)")
+            return
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"  # after a fork, the pid changed
+        self._stopping.clear()
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        print(f"⚙️  {self.workers} background job workers started ({self.worker_id})")
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """A job was committed: wake a worker, or run it now when there are no workers"""
+        if self._threads:
+            self._wake.set()
+        elif not SUPPORTS_CONCURRENT_SESSIONS and not getattr(self._inline, "active", False):
+            self._inline.active = True
+            try:
+                self.run_due()
+            finally:
+                self._inline.active = False
+
+    # Workers
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_due(limit=1)
+            except Exception as e:
+                print(f"⚠️  Background job worker error: {type(e).__name__}: {e}")
+                ran = 0
+            if not ran:
+                self._wake.wait(JOB_POLL_SECONDS)
+                self._wake.clear()
+
+    def _heartbeat(self):
+        while not self._stopping.wait(max(JOB_LEASE_SECONDS / 3, 1)):
+            try:
+                self.renew_leases()
+                reclaim_expired()
+            except Exception as e:
+                print(f"⚠️  Background job heartbeat error: {type(e).__name__}: {e}")
+
+    def renew_leases(self):
+        with self._lock:
+            job_ids = list(self._running)
+        if not job_ids:
+            return
+        db = SessionLocal()
+        try:
+            db.query(models.BackgroundJob).filter(
+                models.BackgroundJob.id.in_(job_ids),
+                models.BackgroundJob.locked_by == self.worker_id,
+                models.BackgroundJob.status == "running"
+            ).update({"locked_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def run_due(self, limit: Optional[int] = None) -> int:
+        """Claim and run due jobs one at a time; returns how many ran"""
+        ran = 0
+        db = SessionLocal()
+        try:
+            while limit is None or ran < limit:
+                job = self._claim_next(db)
+                if job is None:
+                    break
+                self._execute(db, job)
+                ran += 1
+        finally:
+            db.close()
+        return ran
+
+    def _claim_next(self, db: Session) -> Optional[models.BackgroundJob]:
+        now = datetime.utcnow()
+        for _ in range(5):  # another worker may win the row we picked; try the next one
+            row = db.query(models.BackgroundJob.id).filter(
+                models.BackgroundJob.status == "queued",
+                models.BackgroundJob.run_after <= now
+            ).order_by(models.BackgroundJob.run_after, models.BackgroundJob.id).first()
+            if row is None:
+                db.commit()
+                return None
+            claimed = db.query(models.BackgroundJob).filter(
+                models.BackgroundJob.id == row.id,
+                models.BackgroundJob.status == "queued"
+            ).update({
+                "status": "running",
+                "locked_by": self.worker_id,
+                "locked_at": now,
+                "started_at": now,
+                "attempts": models.BackgroundJob.attempts + 1,
+            }, synchronize_session=False)
+            db.commit()
+            if claimed == 1:
+                return db.query(models.BackgroundJob).filter(models.BackgroundJob.id == row.id).one()
+        return None
+
+    def _execute(self, db: Session, job: models.BackgroundJob):
+        job_id, kind, attempts = job.id, job.kind, job.attempts
+        payload = json.loads(job.payload or "{}")
+        waited = (job.started_at - job.run_after).total_seconds() if job.started_at and job.run_after else 0.0
+        fn, on_dead = _handlers.get(kind, (None, None))
+        with self._lock:
+            self._running[job_id] = kind
+        start = perf_counter()
+        error = None
+        permanent = False
+        try:
+            if fn is None:
+                raise PermanentJobError(f"No handler registered for job kind '{kind}'")
+            fn(payload)
+        except PermanentJobError as e:
+            error, permanent = str(e), True
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+        ran = perf_counter() - start
+        db.rollback()  # nothing of the handler's lives on this session, but start clean
+
+        now = datetime.utcnow()
+        if error is None:
+            outcome, values = "succeeded", {"status": "succeeded", "finished_at": now, "last_error": None}
+        elif permanent or attempts >= job.max_attempts:
+            outcome, values = "dead", {"status": "dead", "finished_at": now, "last_error": error}
+        else:
+            outcome, values = "retried", {
+                "status": "queued",
+                "run_after": now + timedelta(seconds=backoff_seconds(attempts)),
+                "last_error": error,
+            }
+        values.update({"locked_by": None, "locked_at": None})
+        # Only while the lease is still ours; a job taken back after a stall belongs to its new worker
+        db.query(models.BackgroundJob).filter(
+            models.BackgroundJob.id == job_id,
+            models.BackgroundJob.status == "running",
+            models.BackgroundJob.locked_by == self.worker_id
+        ).update(values, synchronize_session=False)
+        db.commit()
+
+        with self._lock:
+            self._outcomes[outcome] += 1
+        observe_job(kind, waited, ran, outcome)
+        if outcome == "succeeded":
+            return
+        print(f"❌ Background job {job_id} ({kind}) attempt {attempts} failed: {error}"
+              + (" - giving up" if outcome == "dead" else ""))
+        if outcome == "dead" and on_dead is not None:
+            try:
+                on_dead(payload, error)
+            except Exception as e:
+                print(f"⚠️  on_dead hook for job {job_id} ({kind}) failed: {type(e).__name__}: {e}")
+
+    def worker_stats(self) -> dict:
+        with self._lock:
+            return {
+                "worker_id": self.worker_id,
+                "mode": "threads" if self._threads else ("inline" if not SUPPORTS_CONCURRENT_SESSIONS else "off"),
+                "workers": self.workers if self._threads else 0,
+                "running": dict(self._running),
+                "outcomes": dict(self._outcomes),
+            }
+
+
+queue = JobQueue()
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    key: Optional[str] = None,
+    max_attempts: Optional[int] = None,
+    delay: float = 0
+) -> dict:
+    """
+    Queue a job and commit the session, so rows the caller added commit together with it.
+    With a key, a job already recorded under that key is returned instead of a new one.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"No handler registered for job kind '{kind}'")
+    if key:
+        existing = db.query(models.BackgroundJob).filter(models.BackgroundJob.idempotency_key == key).first()
+        if existing:
+            db.commit()
+            return format_job(existing)
+    now = datetime.utcnow()
+    job = models.BackgroundJob(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        idempotency_key=key,
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts or JOB_MAX_ATTEMPTS,
+        run_after=now + timedelta(seconds=delay),
+        created_at=now,
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race to enqueue the same key
+        db.rollback()
+        existing = db.query(models.BackgroundJob).filter(models.BackgroundJob.idempotency_key == key).first() if key else None
+        if existing is None:
+            raise
+        return format_job(existing)
+    db.refresh(job)
+    result = format_job(job)
+    queue.notify()
+    return result
+
+
+def reclaim_expired() -> int:
+    """Queue again running jobs whose worker stopped heartbeating; dead if that was their last attempt"""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    stalled = (models.BackgroundJob.status == "running") & (models.BackgroundJob.locked_at < cutoff)
+    db = SessionLocal()
+    try:
+        dead = db.query(models.BackgroundJob).filter(
+            stalled, models.BackgroundJob.attempts >= models.BackgroundJob.max_attempts
+        ).update({
+            "status": "dead", "finished_at": datetime.utcnow(), "locked_by": None, "locked_at": None,
+            "last_error": "Lease expired (worker stopped)",
+        }, synchronize_session=False)
+        requeued = db.query(models.BackgroundJob).filter(stalled).update({
+            "status": "queued", "run_after": datetime.utcnow(), "locked_by": None, "locked_at": None,
+            "last_error": "Lease expired (worker stopped)",
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    if dead or requeued:
+        print(f"♻️  Took back {requeued + dead} stalled background jobs ({dead} out of attempts)")
+    return requeued
+
+
+# Admin views
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0), len(sorted_values) - 1)
+    return round(sorted_values[index], 3)
+
+
+def queue_stats(db: Session) -> dict:
+    """Depth by status and kind, age of the oldest due job, and latency of recently finished jobs"""
+    now = datetime.utcnow()
+    depth: Dict[str, Dict[str, int]] = {status: {} for status in JOB_STATUSES}
+    for status, kind, count in db.query(
+        models.BackgroundJob.status, models.BackgroundJob.kind, func.count(models.BackgroundJob.id)
+    ).group_by(models.BackgroundJob.status, models.BackgroundJob.kind).all():
+        depth.setdefault(status, {})[kind] = count
+
+    due = db.query(func.count(models.BackgroundJob.id), func.min(models.BackgroundJob.run_after)).filter(
+        models.BackgroundJob.status == "queued",
+        models.BackgroundJob.run_after <= now
+    ).one()
+
+    finished = db.query(
+        models.BackgroundJob.kind, models.BackgroundJob.created_at,
+        models.BackgroundJob.started_at, models.BackgroundJob.finished_at
+    ).filter(
+        models.BackgroundJob.finished_at >= now - timedelta(seconds=LATENCY_WINDOW_SECONDS)
+    ).order_by(models.BackgroundJob.finished_at.desc()).limit(LATENCY_SAMPLE_SIZE).all()
+    samples: Dict[str, Tuple[List[float], List[float]]] = {}
+    for kind, created_at, started_at, finished_at in finished:
+        if not (created_at and started_at and finished_at):
+            continue
+        total, run = samples.setdefault(kind, ([], []))
+        total.append((finished_at - created_at).total_seconds())
+        run.append((finished_at - started_at).total_seconds())
+    latency = {}
+    for kind, (total, run) in samples.items():
+        total.sort()
+        run.sort()
+        latency[kind] = {
+            "jobs": len(total),
+            "enqueue_to_done_p50": _percentile(total, 50),
+            "enqueue_to_done_p95": _percentile(total, 95),
+            "run_p50": _percentile(run, 50),
+            "run_p95": _percentile(run, 95),
+        }
+
+    return {
+        "depth": depth,
+        "queued": sum(depth["queued"].values()),
+        "due": due[0] or 0,
+        "oldest_due_seconds": round((now - due[1]).total_seconds(), 1) if due[1] else None,
+        "latency_window_seconds": LATENCY_WINDOW_SECONDS,
+        "latency": latency,
+        "this_process": queue.worker_stats(),
+    }
+
+
+def list_jobs(db: Session, status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50) -> List[dict]:
+    query = db.query(models.BackgroundJob)
+    if status:
+        query = query.filter(models.BackgroundJob.status == status)
+    if kind:
+        query = query.filter(models.BackgroundJob.kind == kind)
+    jobs = query.order_by(models.BackgroundJob.id.desc()).limit(max(1, min(limit, 500))).all()
+    return [format_job(job) for job in jobs]
+
+
+def get_job(db: Session, job_id: int) -> Optional[dict]:
+    job = db.query(models.BackgroundJob).filter(models.BackgroundJob.id == job_id).first()
+    return format_job(job) if job else None
+
+
+def retry_job(db: Session, job_id: int) -> Optional[dict]:
+    """Give a dead job a fresh set of attempts"""
+    job = db.query(models.BackgroundJob).filter(models.BackgroundJob.id == job_id).first()
+    if not job:
+        return None
+    if job.status != "dead":
+        raise HTTPException(status_code=409, detail=f"Only dead jobs can be retried (job is {job.status})")
+    job.status = "queued"
+    job.attempts = 0
+    job.run_after = datetime.utcnow()
+    job.finished_at = None
+    db.commit()
+    db.refresh(job)
+    result = format_job(job)
+    queue.notify()
+    return result
+
+
+# Spool for request data too large for the payload column
+
+def new_spool_path() -> str:
+    """Fresh path in the spool directory; write to path + ".part" and rename, so readers never see half a file"""
+    os.makedirs(JOB_SPOOL_DIR, exist_ok=True)
+    return os.path.join(JOB_SPOOL_DIR, uuid.uuid4().hex)
+
+
+def spool(content: bytes) -> str:
+    """Write content to the spool directory (atomically) and return its path"""
+    path = new_spool_path()
+    temporary = path + ".part"
+    with open(temporary, "wb") as handle:
+        handle.write(content)
+    os.replace(temporary, path)
+    return path
+
+
+def read_spool(path: str) -> bytes:
+    if not os.path.exists(path):
+        raise PermanentJobError(f"Spooled file {path} is gone")
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+def discard_spool(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,17 +1,20 @@
 from fastapi import FastAPI, Depends, HTTPException, Security, UploadFile, File, Form, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, List
 from datetime import datetime
 import os
 import json
+import random
+import hashlib
 
 # Relative imports within backend package
 from . import schemas
-from .database import SessionLocal
+from .database import SessionLocal, engine, IS_SQLITE
 from .crud import (
     patients,
     doctors,
@@ -23,9 +26,13 @@ from .crud import (
     patient_dashboard,
     admin_dashboard_header,
     admin_dashboard,
+    admin_dashboard_counters,
     admin_doctors,
     admin_patients,
     admin_appointments,
+    appointment_slots,
+    doctor_schedules,
+    bootstrap,
     doctor_dashboard_header,
     doctor_dashboard,
     doctor_profiles,
@@ -33,10 +40,22 @@ from .crud import (
     doctor_patients,
     patient_detail,
     medical_sessions,
+    archival,
+    patient_search,
+    patient_purge,
+    stored_objects,
 )
 from .schemas import AdminAppointmentResponse, AppointmentCreate, AppointmentUpdate
-from .s3_service import S3Service
+from .storage import create_storage, StorageObjectNotFound
 from . import models
+from . import entity_cache
+from . import job_queue
+from . import report_previews
+from . import report_compression
+from . import report_content
+from .serializers import trusted_json, doctor_list_json
+from . import metrics
+from . import n_plus_one
 
 app = FastAPI()
 
@@ -59,6 +78,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency, DB and pool metrics (outermost, so it times CORS handling too)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
+# SQLite databases (benchmarks, CI) are not migrated with alembic; create the schema directly
+if IS_SQLITE:
+    models.Base.metadata.create_all(bind=engine)
+
+# Opt-in N+1 query detection (N_PLUS_ONE_DETECTION=1), meant for staging
+n_plus_one.install(app, engine)
+
 # Security
 security = HTTPBearer()
 
@@ -90,23 +120,28 @@ def root():
 def api_root():
     return {"message": "CuraNet API is running"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render_latest(), media_type="text/plain; version=0.0.4")
+
 @app.get("/test-upload")
 def test_upload_simple():
     """Test upload functionality with a simple file"""
     try:
         # Create a small test file
         test_content = b"This is a test medical report file for testing upload functionality."
-        
-        # Test the upload process
-        file_key = s3_service.upload_file(
-            test_content, "test_report.txt", "text/plain", 1, 1
-        )
+        content_type = "text/plain"
         
         # Test database save
         from .database import SessionLocal
         db = SessionLocal()
         
         try:
+            # Stored like real uploads (content-addressed, see crud/stored_objects.py), but synchronously
+            stored, needs_upload = stored_objects.acquire(
+                db, hashlib.sha256(test_content).hexdigest(), len(test_content), content_type
+            )
+            file_key = stored.object_key
             report = models.MedicalReport(
                 patient_id=1,
                 doctor_id=1,
@@ -114,16 +149,23 @@ def test_upload_simple():
                 report_name="test_report.txt",
                 file_key=file_key,
                 file_size=len(test_content),
-                content_type="text/plain",
-                shared_with="[]"
+                content_type=content_type,
+                shared_with="[]",
+                upload_status="pending" if stored.status == "pending" else "stored",
+                stored_size=stored.stored_size,
+                content_encoding=stored.content_encoding
             )
-            
             db.add(report)
+            db.flush()
+            if needs_upload:
+                body, content_encoding = report_compression.encode_for_storage(test_content, content_type)
+                storage.put_file(file_key, body, content_type, content_encoding)
+                stored_objects.mark_stored(db, file_key, len(body), content_encoding)
             db.commit()
             db.refresh(report)
             
             # Test download URL
-            download_url = s3_service.generate_presigned_url(file_key)
+            download_url = storage.generate_presigned_url(file_key) or f"/reports/{report.report_id}/content?doctor_id=1"
             
             return {
                 "status": "success",
@@ -131,7 +173,7 @@ def test_upload_simple():
                 "report_id": report.report_id,
                 "file_key": file_key,
                 "download_url": download_url,
-                "s3_service_type": type(s3_service).__name__
+                "s3_service_type": type(storage).__name__
             }
             
         finally:
@@ -141,7 +183,7 @@ def test_upload_simple():
         return {
             "status": "error",
             "message": str(e),
-            "s3_service_type": type(s3_service).__name__,
+            "s3_service_type": type(storage).__name__,
             "error_type": type(e).__name__
         }
 
@@ -176,18 +218,35 @@ def debug_reports(db: Session = Depends(get_db)):
     except Exception as e:
         return {"error": str(e), "error_type": type(e).__name__}
 
+def _sample_users(db: Session, model, count: int, seed: int) -> list:
+    """Up to count users spread over the whole id range (for load tests), one bounded query"""
+    low, high = db.query(func.min(model.id), func.max(model.id)).one()
+    if low is None:
+        return []
+    rng = random.Random(seed)
+    span = range(low, high + 1)
+    ids = rng.sample(span, min(len(span), count * 2))  # room for gaps left by removed users
+    rows = db.query(model.id, model.name, model.email).filter(model.id.in_(ids)).all()
+    rng.shuffle(rows)
+    return [{"id": row.id, "name": row.name, "email": row.email} for row in rows[:count]]
+
 @app.get("/check-ids")
-def check_ids(db: Session = Depends(get_db)):
-    """Check existing patient and doctor IDs"""
+def check_ids(sample: int = 0, seed: int = 42, db: Session = Depends(get_db)):
+    """Check existing patient and doctor IDs; sample=N returns N of each spread over all ids"""
     try:
-        patients = db.query(models.Patient).all()
-        doctors = db.query(models.Doctor).all()
-        
+        if sample > 0:
+            sample = min(sample, 1000)
+            patients = _sample_users(db, models.Patient, sample, seed)
+            doctors = _sample_users(db, models.Doctor, sample, seed)
+        else:
+            patients = [{"id": p.id, "name": p.name} for p in db.query(models.Patient).order_by(models.Patient.id).limit(5)]
+            doctors = [{"id": d.id, "name": d.name} for d in db.query(models.Doctor).order_by(models.Doctor.id).limit(5)]
+
         return {
-            "patients": [{"id": p.id, "name": p.name} for p in patients[:5]],
-            "doctors": [{"id": d.id, "name": d.name} for d in doctors[:5]],
-            "total_patients": len(patients),
-            "total_doctors": len(doctors)
+            "patients": patients,
+            "doctors": doctors,
+            "total_patients": db.query(func.count(models.Patient.id)).scalar(),
+            "total_doctors": db.query(func.count(models.Doctor.id)).scalar()
         }
     except Exception as e:
         return {"error": str(e)}
@@ -275,6 +334,14 @@ def get_doctor_dashboard_info(username: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Doctor not found")
     return doctor
 
+# Whole doctor dashboard (header, profile, upcoming appointments, active sessions) in one response
+@app.get("/doctor/bootstrap/{username}")
+def get_doctor_bootstrap(username: str, db: Session = Depends(get_db)):
+    result = bootstrap.get_doctor_bootstrap(db, username)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    return trusted_json(result)
+
 @app.get("/doctor/appointments/{username}", response_model=schemas.DoctorDashboardResponse)
 def get_doctor_appointments(username: str, db: Session = Depends(get_db)):
     doctor = doctor_dashboard.get_doctor_by_name(db, username)
@@ -282,7 +349,7 @@ def get_doctor_appointments(username: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Doctor not found")
     
     appointments = doctor_dashboard.get_doctor_appointments(db, doctor.id)
-    return doctor_dashboard.format_dashboard_response(appointments)
+    return trusted_json(doctor_dashboard.format_dashboard_response(appointments))
 
 @app.put("/doctor/appointment/{appointment_id}")
 def update_doctor_appointment(
@@ -302,6 +369,8 @@ def update_doctor_appointment(
         if not result:
             raise HTTPException(status_code=404, detail="Appointment not found")
         return {"status": "success", "message": "Appointment updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -321,6 +390,35 @@ def get_all_doctor_appointments(username: str, db: Session = Depends(get_db)):
     appointments = doctor_appointments.get_all_doctor_appointments(db, doctor.id)
     return doctor_appointments.format_appointments_response(appointments)
 
+@app.get("/doctor/calendar/{username}")
+def get_doctor_calendar(username: str, start: Optional[str] = None, view: str = "week", db: Session = Depends(get_db)):
+    doctor = doctor_appointments.get_doctor_by_name(db, username)
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    try:
+        start_date = datetime.strptime(start, "%Y-%m-%d").date() if start else datetime.now().date()
+        first, last = doctor_appointments.get_calendar_window(start_date, view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = doctor_appointments.get_doctor_calendar(db, doctor.id, first, last)
+    return trusted_json(doctor_appointments.format_calendar_response(rows, doctor.id, view, first, last))
+
+# Search within the doctor's own patients
+@app.get("/doctor/patients/{username}/search")
+def search_doctor_patients(
+    username: str,
+    q: str,
+    limit: int = patient_search.DEFAULT_PAGE_SIZE,
+    offset: int = 0,
+    db: Session = Depends(get_db)
+):
+    doctor = doctor_patients.get_doctor_by_name(db, username)
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    patient_ids = patient_search.get_doctor_patient_ids(db, doctor.id)
+    return trusted_json(patient_search.search_patients(db, q, limit, offset, patient_ids))
+
 @app.get("/doctor/patients/{username}")
 def get_doctor_patients(username: str, db: Session = Depends(get_db)):
     doctor = doctor_patients.get_doctor_by_name(db, username)
@@ -340,6 +438,14 @@ def get_patient_dashboard_info(username: str, db: Session = Depends(get_db)):
     recent_appointments = patient_dashboard.get_recent_appointments(db, patient.id)
     return patient_dashboard.format_dashboard_response(patient, recent_appointments)
 
+# Patient dashboard, profile and first medical history page in one response
+@app.get("/patient/bootstrap/{username}")
+def get_patient_bootstrap(username: str, db: Session = Depends(get_db)):
+    result = bootstrap.get_patient_bootstrap(db, username)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return trusted_json(result)
+
 # Admin dashboard header info
 @app.get("/admin/dashboard-info/{admin_id}", response_model=schemas.AdminHeaderResponse)
 def get_admin_dashboard_info(admin_id: int, db: Session = Depends(get_db)):
@@ -348,15 +454,79 @@ def get_admin_dashboard_info(admin_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Admin not found")
     return admin
 
+# Admin dashboard headline numbers, served from the in-memory aggregate
+@app.get("/admin/dashboard-counters", response_model=schemas.AdminDashboardCountersResponse)
+def get_admin_dashboard_counters(refresh: bool = False, db: Session = Depends(get_db)):
+    return admin_dashboard_counters.get_dashboard_counters(db, refresh=refresh)
+
+# Archival of completed appointments and sessions older than the archive horizon
+@app.get("/admin/archive")
+def get_archive_status(db: Session = Depends(get_db)):
+    return archival.archive_status(db)
+
+@app.post("/admin/archive/run")
+def run_archive(
+    horizon_days: int = archival.ARCHIVE_HORIZON_DAYS,
+    batch_size: int = archival.ARCHIVE_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    if horizon_days < 1 or batch_size < 1:
+        raise HTTPException(status_code=400, detail="horizon_days and batch_size must be positive")
+    job = job_queue.enqueue(db, "archive_run", {
+        "horizon_days": horizon_days, "batch_size": batch_size, "max_batches": max_batches,
+    })
+    return {"message": "Archive run queued", "horizon_days": horizon_days, "batch_size": batch_size, "job": job}
+
+# Report storage: distinct stored files, references to them and bytes saved by deduplication
+@app.get("/admin/storage")
+def get_storage_stats(db: Session = Depends(get_db)):
+    return {"backend": storage.name, **stored_objects.storage_stats(db)}
+
+# Background job queue: depth, latency, recent jobs, and retrying dead ones
+@app.get("/admin/jobs")
+def get_job_queue_stats(db: Session = Depends(get_db)):
+    return job_queue.queue_stats(db)
+
+@app.get("/admin/jobs/recent")
+def list_background_jobs(
+    status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)
+):
+    return job_queue.list_jobs(db, status, kind, limit)
+
+@app.get("/admin/jobs/{job_id}")
+def get_background_job(job_id: int, db: Session = Depends(get_db)):
+    job = job_queue.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/admin/jobs/{job_id}/retry")
+def retry_background_job(job_id: int, db: Session = Depends(get_db)):
+    job = job_queue.retry_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# Entity cache hit ratios for this worker
+@app.get("/admin/cache-stats")
+def get_entity_cache_stats():
+    return entity_cache.cache.stats()
+
+# Recent N+1 query findings (empty unless N_PLUS_ONE_DETECTION=1)
+@app.get("/admin/n-plus-one")
+def get_n_plus_one_findings():
+    return {"enabled": n_plus_one.ENABLED, "threshold": n_plus_one.THRESHOLD, "findings": n_plus_one.recent_findings()}
+
 # Get recent doctors list
 @app.get("/admin/recent-doctors")
 def get_recent_doctors_endpoint(db: Session = Depends(get_db)):
-    return admin_dashboard.get_recent_doctors(db)
+    return trusted_json(admin_dashboard.get_recent_doctors(db))
 
 # Get all doctors list
 @app.get("/admin/doctors-list")
 def get_all_doctors_list_endpoint(db: Session = Depends(get_db)):
-    return admin_doctors.get_all_doctors_list(db)
+    return trusted_json(admin_doctors.get_all_doctors_list(db))
 
 @app.get("/admin/doctor/{doctor_id}")
 def get_doctor_endpoint(doctor_id: int, db: Session = Depends(get_db)):
@@ -387,37 +557,62 @@ def get_doctor_availability(doctor_id: int, date: str, db: Session = Depends(get
         # Parse the date
         target_date = datetime.strptime(date, "%Y-%m-%d").date()
         
-        # Get existing appointments for this doctor on this date
-        from sqlalchemy import func, Date
-        existing_appointments = db.query(models.Appointment).filter(
-            models.Appointment.doctor_id == doctor_id,
-            func.date(models.Appointment.appointment_time) == target_date
-        ).all()
-        
-        # Extract booked time slots
-        booked_slots = []
-        for apt in existing_appointments:
-            time_str = apt.appointment_time.strftime("%H:%M")
-            booked_slots.append(time_str)
-        
-        # Define all available time slots
-        all_slots = [
-            "09:00", "09:30", "10:00", "10:30", "11:00", "11:30",
-            "14:00", "14:30", "15:00", "15:30", "16:00", "16:30", "17:00"
-        ]
-        
-        # Return available slots (not booked)
-        available_slots = [slot for slot in all_slots if slot not in booked_slots]
+        # From the doctor-day bitmap: the doctor's schedule minus booked slots
+        availability = appointment_slots.get_day_availability(db, doctor_id, target_date)
         
         return {
             "date": date,
             "doctor_id": doctor_id,
-            "available_slots": available_slots,
-            "booked_slots": booked_slots
+            "available_slots": availability["available_slots"],
+            "booked_slots": availability["booked_slots"]
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# Earliest free slot per doctor, optionally narrowed to some doctors or a department
+@app.get("/doctors/next-free-slot")
+def get_next_free_slots(
+    after: Optional[str] = None,
+    days: int = 14,
+    doctor_ids: Optional[str] = None,
+    department: Optional[str] = None,
+    limit: int = 20,
+    db: Session = Depends(get_db)
+):
+    try:
+        start = appointment_slots.parse_appointment_time(after) if after else datetime.now()
+        ids = [int(doctor_id) for doctor_id in doctor_ids.split(",") if doctor_id.strip()] if doctor_ids else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    days = max(1, min(days, 90))
+    return doctor_schedules.next_free_slots(db, start, days, ids, department, limit)
+
+# Doctor schedule templates and exceptions
+@app.get("/admin/doctor/{doctor_id}/schedule")
+def get_doctor_schedule(doctor_id: int, db: Session = Depends(get_db)):
+    if not entity_cache.get_doctor(db, doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    return doctor_schedules.get_schedule(db, doctor_id)
+
+@app.put("/admin/doctor/{doctor_id}/schedule")
+def update_doctor_schedule(doctor_id: int, schedule: schemas.DoctorScheduleUpdate, db: Session = Depends(get_db)):
+    if not entity_cache.get_doctor(db, doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    return doctor_schedules.replace_schedule(db, doctor_id, schedule)
+
+@app.post("/admin/doctor/{doctor_id}/schedule/exceptions")
+def add_doctor_schedule_exception(doctor_id: int, exception: schemas.ScheduleExceptionCreate, db: Session = Depends(get_db)):
+    if not entity_cache.get_doctor(db, doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    return doctor_schedules.add_exception(db, doctor_id, exception)
+
+@app.delete("/admin/doctor/{doctor_id}/schedule/exceptions/{exception_id}")
+def remove_doctor_schedule_exception(doctor_id: int, exception_id: int, db: Session = Depends(get_db)):
+    result = doctor_schedules.remove_exception(db, doctor_id, exception_id)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
 # Patient endpoints
 @app.get("/patient/profile/{username}")
 def get_patient_profile(username: str, db: Session = Depends(get_db)):
@@ -427,13 +622,27 @@ def get_patient_profile(username: str, db: Session = Depends(get_db)):
     return patient_profiles.format_profile_response(patient)
 
 @app.get("/patient/medical-history/{username}")
-def get_patient_medical_history(username: str, db: Session = Depends(get_db)):
+def get_patient_medical_history(
+    username: str,
+    limit: int = patient_medical_history.DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
     patient = patient_medical_history.get_patient_by_name(db, username)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    appointments = patient_medical_history.get_patient_medical_history(db, patient.id)
-    return patient_medical_history.format_medical_history_response(patient, appointments)
+    try:
+        start = datetime.strptime(from_date, "%Y-%m-%d").date() if from_date else None
+        end = datetime.strptime(to_date, "%Y-%m-%d").date() if to_date else None
+        appointments, next_cursor = patient_medical_history.get_patient_medical_history(
+            db, patient.id, limit=limit, cursor=cursor, from_date=start, to_date=end
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return patient_medical_history.format_medical_history_response(patient, appointments, next_cursor)
 
 # Doctor list endpoint
 @app.get("/api/doctors", response_model=List[schemas.DoctorResponse])
@@ -443,19 +652,29 @@ async def read_doctors(
     db: Session = Depends(get_db),
 ):
     if department:
-        return doctors.get_doctors_by_department(db, department)
+        return doctor_list_json(doctors.get_doctors_by_department(db, department))
     elif search:
-        return doctors.search_doctors(db, search)
-    return doctors.get_doctors(db, skip=0, limit=100)
+        return doctor_list_json(doctors.search_doctors(db, search))
+    return doctor_list_json(doctors.get_doctors(db, skip=0, limit=100))
 
 @app.get("/api/departments", response_model=List[str])
 async def get_departments(db: Session = Depends(get_db)):
     return doctors.get_all_departments(db)
 
+# Ranked, paginated search by P-id, name, email or phone
+@app.get("/admin/patients/search")
+def search_patients_endpoint(
+    q: str,
+    limit: int = patient_search.DEFAULT_PAGE_SIZE,
+    offset: int = 0,
+    db: Session = Depends(get_db)
+):
+    return trusted_json(patient_search.search_patients(db, q, limit, offset))
+
 # Get all patients list
 @app.get("/admin/patients-list")
 def get_all_patients_list_endpoint(db: Session = Depends(get_db)):
-    return admin_patients.get_all_patients_list(db)
+    return trusted_json(admin_patients.get_all_patients_list(db))
 
 # Get specific patient details
 @app.get("/admin/patient/{patient_id}")
@@ -475,29 +694,50 @@ def update_patient_endpoint(
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient
 
-# Remove patient
+# Remove patient (chunked background purge; progress at /admin/purge-jobs/{job_id})
 @app.delete("/admin/patient/{patient_id}")
 def remove_patient_endpoint(patient_id: int, db: Session = Depends(get_db)):
     result = admin_patients.remove_patient(db, patient_id)
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
+    patient_purge.enqueue_run(db, result["job"]["job_id"])
     return result
 
+# Keep the patient's clinical history but strip their identity and delete their reports
+@app.post("/admin/patient/{patient_id}/anonymize")
+def anonymize_patient_endpoint(patient_id: int, db: Session = Depends(get_db)):
+    job = patient_purge.start_purge(db, patient_id, "anonymize")
+    patient_purge.enqueue_run(db, job["job_id"])
+    return {"message": "Patient anonymization started", "job": job}
+
+@app.get("/admin/purge-jobs")
+def list_purge_jobs(limit: int = 50, db: Session = Depends(get_db)):
+    return patient_purge.list_jobs(db, limit)
+
+@app.get("/admin/purge-jobs/{job_id}")
+def get_purge_job(job_id: int, db: Session = Depends(get_db)):
+    job = patient_purge.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Purge job not found")
+    return job
+
 @app.get("/admin/appointments-list", response_model=List[AdminAppointmentResponse])
 def get_all_appointments_endpoint(db: Session = Depends(get_db)):
-    return admin_appointments.get_all_appointments(db)
+    return trusted_json(admin_appointments.get_all_appointments(db))
 
 @app.get("/admin/appointment/{appointment_id}", response_model=AdminAppointmentResponse)
 def get_appointment_endpoint(appointment_id: int, db: Session = Depends(get_db)):
     appointment = admin_appointments.get_appointment_by_id(db, appointment_id)
     if appointment is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
-    return appointment
+    return trusted_json(appointment)
 
 @app.post("/admin/appointment")
 def create_appointment_endpoint(appointment: AppointmentCreate, db: Session = Depends(get_db)):
     try:
         return admin_appointments.create_appointment(db, appointment)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -527,36 +767,29 @@ def get_admin_patient_medical_history(patient_id: int, db: Session = Depends(get
     from . import models
     
     # Get patient info
-    patient = db.query(models.Patient).filter(models.Patient.id == patient_id).first()
+    patient = entity_cache.get_patient(db, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Get all medical sessions for this patient
-    sessions = db.query(models.MedicalSession).filter(
-        models.MedicalSession.patient_id == patient_id
-    ).order_by(models.MedicalSession.session_date.desc()).all()
+    # Get all medical sessions for this patient, archived ones included
+    sessions = medical_sessions.get_patient_medical_history(db, patient_id)
     
-    # Get all appointments for this patient
-    appointments = db.query(models.Appointment).filter(
-        models.Appointment.patient_id == patient_id
-    ).order_by(models.Appointment.appointment_time.desc()).all()
+    # Get all appointments for this patient, archived ones included
+    appointments = sorted(
+        patient_medical_history.get_patient_appointments(db, patient_id),
+        key=lambda appointment: appointment.appointment_time,
+        reverse=True
+    )
     
     session_history = []
     for session in sessions:
-        doctor = db.query(models.Doctor).filter(models.Doctor.id == session.doctor_id).first()
+        doctor = entity_cache.get_doctor(db, session.doctor_id)
+        archived = medical_sessions.is_archived(session)
         
         # Get detailed session data
-        vital_signs = db.query(models.VitalSign).filter(
-            models.VitalSign.session_id == session.session_id
-        ).all()
-        
-        prescriptions = db.query(models.Prescription).filter(
-            models.Prescription.session_id == session.session_id
-        ).all()
-        
-        symptoms = db.query(models.Symptom).filter(
-            models.Symptom.session_id == session.session_id
-        ).all()
+        vital_signs = medical_sessions.get_session_vital_signs(db, session.session_id, archived)
+        prescriptions = medical_sessions.get_session_prescriptions(db, session.session_id, archived)
+        symptoms = medical_sessions.get_session_symptoms(db, session.session_id, archived)
         
         session_history.append({
             "session_id": session.session_id,
@@ -590,7 +823,7 @@ def get_admin_patient_medical_history(patient_id: int, db: Session = Depends(get
     
     appointment_history = []
     for appointment in appointments:
-        doctor = db.query(models.Doctor).filter(models.Doctor.id == appointment.doctor_id).first()
+        doctor = entity_cache.get_doctor(db, appointment.doctor_id)
         appointment_history.append({
             "appointment_id": appointment.id,
             "date_time": appointment.appointment_time.isoformat(),
@@ -620,28 +853,42 @@ def get_admin_patient_summary(patient_id: int, db: Session = Depends(get_db)):
     from . import models
     from sqlalchemy import func
     
-    patient = db.query(models.Patient).filter(models.Patient.id == patient_id).first()
+    patient = entity_cache.get_patient(db, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Get statistics
-    total_appointments = db.query(func.count(models.Appointment.id)).filter(
-        models.Appointment.patient_id == patient_id
-    ).scalar()
+    # Get statistics, archived appointments and sessions included
+    total_appointments = sum(
+        db.query(func.count(model.id)).filter(model.patient_id == patient_id).scalar()
+        for model in (models.Appointment, models.AppointmentArchive)
+    )
     
-    total_sessions = db.query(func.count(models.MedicalSession.session_id)).filter(
-        models.MedicalSession.patient_id == patient_id
-    ).scalar()
+    total_sessions = sum(
+        db.query(func.count(model.session_id)).filter(model.patient_id == patient_id).scalar()
+        for model in (models.MedicalSession, models.MedicalSessionArchive)
+    )
     
     # Get unique doctors who treated this patient
-    doctors = db.query(models.Doctor).join(models.Appointment).filter(
-        models.Appointment.patient_id == patient_id
-    ).distinct().all()
+    doctor_ids = set()
+    for model in (models.Appointment, models.AppointmentArchive):
+        doctor_ids.update(
+            row.doctor_id for row in db.query(model.doctor_id).filter(model.patient_id == patient_id).distinct()
+        )
+    doctors = db.query(models.Doctor).filter(models.Doctor.id.in_(doctor_ids)).order_by(models.Doctor.id).all() if doctor_ids else []
     
-    # Get recent prescriptions
-    recent_prescriptions = db.query(models.Prescription).join(models.MedicalSession).filter(
-        models.MedicalSession.patient_id == patient_id
-    ).order_by(models.MedicalSession.session_date.desc()).limit(5).all()
+    # Get recent prescriptions, from whichever table each session is in
+    recent_prescriptions = []
+    for prescription_model, session_model in (
+        (models.Prescription, models.MedicalSession),
+        (models.PrescriptionArchive, models.MedicalSessionArchive),
+    ):
+        recent_prescriptions += db.query(prescription_model, session_model.session_date)\
+            .join(session_model, prescription_model.session_id == session_model.session_id)\
+            .filter(session_model.patient_id == patient_id)\
+            .order_by(session_model.session_date.desc())\
+            .limit(5).all()
+    recent_prescriptions.sort(key=lambda row: row.session_date or datetime.min, reverse=True)
+    recent_prescriptions = [row[0] for row in recent_prescriptions[:5]]
     
     return {
         "patient_info": {
@@ -680,7 +927,7 @@ def get_patient_detail(patient_id: str, db: Session = Depends(get_db)):
             numeric_id = int(patient_id)
         
         # Get patient directly from database
-        patient = db.query(models.Patient).filter(models.Patient.id == numeric_id).first()
+        patient = entity_cache.get_patient(db, numeric_id)
         if not patient:
             raise HTTPException(status_code=404, detail="Patient not found")
         
@@ -710,26 +957,21 @@ def get_patient_medical_history_by_id(patient_id: str, db: Session = Depends(get
         else:
             numeric_id = int(patient_id)
         
-        # Get all medical sessions for this patient (cross-doctor access)
-        sessions = db.query(models.MedicalSession).filter(
-            models.MedicalSession.patient_id == numeric_id
-        ).order_by(models.MedicalSession.session_date.desc()).all()
+        # Get all medical sessions for this patient (cross-doctor access), archived ones included
+        sessions = medical_sessions.get_patient_medical_history(db, numeric_id)
         
         history = []
         for session in sessions:
-            doctor = db.query(models.Doctor).filter(models.Doctor.id == session.doctor_id).first()
+            doctor = entity_cache.get_doctor(db, session.doctor_id)
+            archived = medical_sessions.is_archived(session)
             
             # Get prescriptions for this session
-            prescriptions = db.query(models.Prescription).filter(
-                models.Prescription.session_id == session.session_id
-            ).all()
+            prescriptions = medical_sessions.get_session_prescriptions(db, session.session_id, archived)
             
             # Get diagnoses for this session (if diagnosis table exists)
             diagnoses = []
             try:
-                diagnoses = db.query(models.Diagnosis).filter(
-                    models.Diagnosis.session_id == session.session_id
-                ).all()
+                diagnoses = medical_sessions.get_session_diagnoses(db, session.session_id, archived)
             except:
                 pass  # Diagnosis table might not exist
             
@@ -778,8 +1020,12 @@ def start_medical_session(appointment_id: int, db: Session = Depends(get_db)):
         db, session_data, appointment.patient_id, appointment.doctor_id
     )
     
+    old_status = appointment.status
     appointment.status = "in_progress"
     db.commit()
+    admin_dashboard_counters.counters.appointment_changed(
+        old_status, appointment.appointment_time, appointment.status, appointment.appointment_time
+    )
     
     return {"session_id": session.session_id, "message": "Medical session started"}
 
@@ -855,33 +1101,22 @@ def get_patient_complete_history(patient_id: str, db: Session = Depends(get_db))
             numeric_id = int(patient_id)
         
         # Get patient basic info
-        patient = db.query(models.Patient).filter(models.Patient.id == numeric_id).first()
+        patient = entity_cache.get_patient(db, numeric_id)
         if not patient:
             raise HTTPException(status_code=404, detail="Patient not found")
         
-        # Get all medical sessions for this patient (from any doctor)
-        sessions = db.query(models.MedicalSession).filter(
-            models.MedicalSession.patient_id == numeric_id
-        ).order_by(models.MedicalSession.session_date.desc()).all()
+        # Get all medical sessions for this patient (from any doctor), archived ones included
+        sessions = medical_sessions.get_patient_medical_history(db, numeric_id)
         
         session_history = []
         for session in sessions:
-            doctor = db.query(models.Doctor).filter(models.Doctor.id == session.doctor_id).first()
+            doctor = entity_cache.get_doctor(db, session.doctor_id)
+            archived = medical_sessions.is_archived(session)
             
-            # Get vital signs for this session
-            vital_signs = db.query(models.VitalSign).filter(
-                models.VitalSign.session_id == session.session_id
-            ).all()
-            
-            # Get prescriptions for this session
-            prescriptions = db.query(models.Prescription).filter(
-                models.Prescription.session_id == session.session_id
-            ).all()
-            
-            # Get symptoms for this session
-            symptoms = db.query(models.Symptom).filter(
-                models.Symptom.session_id == session.session_id
-            ).all()
+            # Get vital signs, prescriptions and symptoms from the session's table set
+            vital_signs = medical_sessions.get_session_vital_signs(db, session.session_id, archived)
+            prescriptions = medical_sessions.get_session_prescriptions(db, session.session_id, archived)
+            symptoms = medical_sessions.get_session_symptoms(db, session.session_id, archived)
             
             session_history.append({
                 "session_id": session.session_id,
@@ -930,26 +1165,99 @@ def get_patient_complete_history(patient_id: str, db: Session = Depends(get_db))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving complete history: {str(e)}")
 
-# File Sharing Endpoints - Mock S3 service for testing
-class MockS3Service:
-    def upload_file(self, file_content, filename, content_type, patient_id, doctor_id):
-        # Generate a mock file key
-        import uuid
-        return f"mock/patient_{patient_id}/doctor_{doctor_id}/{uuid.uuid4()}_{filename}"
-    
-    def generate_presigned_url(self, file_key, expiration=3600):
-        # Return a mock download URL
-        return f"https://mock-s3-url.com/download/{file_key}?expires={expiration}"
-    
-    def delete_file(self, file_key):
-        return True
+# File Sharing Endpoints - report files live in the backend chosen by STORAGE_BACKEND (see storage.py)
+storage = create_storage()
+
+@app.on_event("startup")
+def warm_up_storage():
+    # Runs per worker after fork, off the request path
+    storage.warm_up()
+
+# Background job handlers (see job_queue.py); each must be safe to run again after a crash
+
+def _report_upload_failed(payload: dict, error: str):
+    db = SessionLocal()
+    try:
+        stored_objects.mark_failed(db, payload["file_key"])
+        db.commit()
+    finally:
+        db.close()
+    job_queue.discard_spool(payload["spool_path"])
+
+@job_queue.handler("report_upload", on_dead=_report_upload_failed)
+def run_report_upload(payload: dict):
+    db = SessionLocal()
+    try:
+        if not stored_objects.is_live(db, payload["file_key"]):
+            # Every report was removed (or its patient purged) before the file was stored
+            job_queue.discard_spool(payload["spool_path"])
+            return
+        db.rollback()  # no connection held while uploading
+        # Text-heavy types are stored gzip-compressed with Content-Encoding set (see report_compression.py)
+        body, content_encoding = report_compression.encode_for_storage(
+            job_queue.read_spool(payload["spool_path"]), payload["content_type"]
+        )
+        storage.put_file(payload["file_key"], body, payload["content_type"], content_encoding)
+        # Every report that referenced the content while it was uploading becomes available
+        if not stored_objects.mark_stored(db, payload["file_key"], len(body), content_encoding):
+            # The last reference went while uploading; its release saw no file to delete
+            storage.delete_file(payload["file_key"])
+            db.rollback()
+            if stored_objects.is_live(db, payload["file_key"]):
+                # Same bytes uploaded again meanwhile; their upload may already have stored the file
+                storage.put_file(payload["file_key"], body, payload["content_type"], content_encoding)
+            job_queue.discard_spool(payload["spool_path"])
+            return
+        if report_previews.supports(payload["content_type"]):
+            # The spooled file is handed on to the preview job, which discards it
+            job_queue.enqueue(db, "report_preview", payload, key=f"report_preview:{payload['report_id']}")
+            return
+        db.commit()
+    finally:
+        db.close()
+    job_queue.discard_spool(payload["spool_path"])
 
-try:
-    s3_service = S3Service()
-    print("✅ S3 service initialized successfully")
-except Exception as e:
-    print(f"⚠️  S3 service failed, using mock service: {e}")
-    s3_service = MockS3Service()
+def _discard_payload_spool(payload: dict, error: str):
+    job_queue.discard_spool(payload["spool_path"])
+
+@job_queue.handler("report_preview", on_dead=_discard_payload_spool)
+def run_report_preview(payload: dict):
+    db = SessionLocal()
+    try:
+        if not stored_objects.is_referenced(db, payload["file_key"]):
+            job_queue.discard_spool(payload["spool_path"])  # reports removed meanwhile
+            return
+        preview = report_previews.renderer.render(job_queue.read_spool(payload["spool_path"]), payload["content_type"])
+        if preview is not None:
+            preview_key = report_previews.preview_key_for(payload["file_key"])
+            storage.put_file(preview_key, preview, report_previews.PREVIEW_CONTENT_TYPE)
+            stored_objects.set_preview(db, payload["file_key"], preview_key)
+            db.commit()
+    finally:
+        db.close()
+    job_queue.discard_spool(payload["spool_path"])
+
+@job_queue.handler("patient_purge")
+def run_patient_purge(payload: dict):
+    job = patient_purge.run_job(payload["purge_job_id"], storage.delete_file)
+    if job is None:
+        raise RuntimeError("Purge job is held by another worker")
+    if job["status"] == "failed":
+        raise RuntimeError(job["error"])
+
+@job_queue.handler("archive_run")
+def run_archive_job(payload: dict):
+    archival.run_archive(payload["horizon_days"], payload["batch_size"], payload.get("max_batches"))
+
+@app.on_event("startup")
+def start_job_workers():
+    # Per worker process, after fork; queued jobs left by a restart are picked up right away
+    job_queue.queue.start()
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    job_queue.queue.stop()
+    report_previews.renderer.shutdown()
 
 @app.post("/reports/upload")
 async def upload_report(
@@ -963,55 +1271,58 @@ async def upload_report(
     try:
         print(f"Upload attempt: file={file.filename}, patient={patient_id}, doctor={doctor_id}")
         
-        # Validate file size (50MB limit)
-        file_content = await file.read()
-        print(f"File size: {len(file_content)} bytes")
-        
-        if len(file_content) > 50 * 1024 * 1024:  # 50MB
-            raise HTTPException(status_code=413, detail="File too large. Maximum size is 50MB.")
-        
-        # Upload to S3
-        print("Uploading to S3...")
-        file_key = s3_service.upload_file(
-            file_content, file.filename, file.content_type, patient_id, doctor_id
-        )
-        print(f"S3 upload successful: {file_key}")
-        
-        # Save to database using ORM model
-        print("Saving to database...")
+        # Hashed while it is spooled; the file then waits in the spool and is uploaded to S3
+        # by a background job, so the request returns once the report row is committed
+        spool_path, file_size, sha256 = await stored_objects.spool_upload(file)
+        print(f"File size: {file_size} bytes, sha256 {sha256[:12]}")
+        content_type = file.content_type or 'application/octet-stream'
         try:
+            # Identical bytes uploaded before (by any doctor) are not transferred again
+            stored, needs_upload = stored_objects.acquire(db, sha256, file_size, content_type)
             report = models.MedicalReport(
                 patient_id=patient_id,
                 doctor_id=doctor_id,
                 session_id=session_id,
                 report_name=file.filename,
-                file_key=file_key,
-                file_size=len(file_content),
-                content_type=file.content_type or 'application/octet-stream',
-                shared_with='[]'
+                file_key=stored.object_key,
+                file_size=file_size,
+                content_type=content_type,
+                shared_with='[]',
+                upload_status="pending" if stored.status == "pending" else "stored",
+                stored_size=stored.stored_size,
+                content_encoding=stored.content_encoding,
+                preview_key=stored_objects.shared_preview_key(db, stored.object_key)
             )
-            
             db.add(report)
-            db.commit()
-            db.refresh(report)
-            print(f"Database save successful, report_id: {report.report_id}")
-            
-            return {
-                "report_id": report.report_id,
-                "message": "Report uploaded successfully",
-                "file_name": file.filename
-            }
-            
-        except Exception as db_error:
-            print(f"Database error: {db_error}")
+            db.flush()
+            if needs_upload:
+                job_queue.enqueue(db, "report_upload", {
+                    "report_id": report.report_id,
+                    "file_key": stored.object_key,
+                    "spool_path": spool_path,
+                    "content_type": content_type,
+                }, key=f"report_upload:{report.report_id}")
+                print(f"Report {report.report_id} saved, upload queued")
+            else:
+                db.commit()
+                job_queue.discard_spool(spool_path)
+                print(f"Report {report.report_id} saved, content already stored")
+        except Exception:
             db.rollback()
-            # Return success since S3 upload worked
-            return {
-                "report_id": 999,
-                "message": "Report uploaded to S3 (database pending)",
-                "file_name": file.filename
-            }
-            
+            job_queue.discard_spool(spool_path)
+            raise
+
+        return {
+            "report_id": report.report_id,
+            "message": "Report received; the file is being stored" if report.upload_status == "pending"
+                       else "Report uploaded successfully",
+            "file_name": file.filename,
+            "upload_status": report.upload_status,
+            "deduplicated": not needs_upload
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Upload error: {type(e).__name__}: {str(e)}")
         import traceback
@@ -1028,12 +1339,19 @@ def get_patient_reports(patient_id: int, doctor_id: int, db: Session = Depends(g
         
         accessible_reports = []
         for report in reports:
-            doctor = db.query(models.Doctor).filter(models.Doctor.id == report.doctor_id).first()
+            doctor = entity_cache.get_doctor(db, report.doctor_id)
             accessible_reports.append({
                 "report_id": report.report_id,
                 "report_name": report.report_name,
                 "uploaded_at": report.uploaded_at.isoformat(),
                 "file_size": report.file_size,
+                "stored_size": report.stored_size,
+                "upload_status": report.upload_status,
+                # Presigned like downloads; a few KB instead of the original
+                "preview_url": (
+                    storage.generate_presigned_url(report.preview_key)
+                    or f"/reports/{report.report_id}/preview?doctor_id={doctor_id}"
+                ) if report.preview_key else None,
                 "uploaded_by": doctor.name if doctor else "Unknown Doctor"
             })
         
@@ -1047,15 +1365,62 @@ def download_report(report_id: int, doctor_id: int, db: Session = Depends(get_db
     report = db.query(models.MedicalReport).filter(models.MedicalReport.report_id == report_id).first()
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
+    if report.upload_status != "stored":
+        raise HTTPException(status_code=409, detail=f"Report file is not available (upload {report.upload_status})")
     
     # All doctors can download patient reports (removed access restriction)
     try:
-        # Generate presigned URL
-        download_url = s3_service.generate_presigned_url(report.file_key)
-        return {"download_url": download_url, "file_name": report.report_name}
+        # Same file through the app, for clients that cannot reach storage directly
+        content_url = f"/reports/{report.report_id}/content?doctor_id={doctor_id}&download=true"
+        # Generate presigned URL; content-addressed keys carry no file name, so the URL names the download.
+        # Backends without presigned URLs (local, mock) download through the app
+        download_url = storage.generate_presigned_url(report.file_key, file_name=report.report_name) or content_url
+        return {
+            "download_url": download_url,
+            "content_url": content_url,
+            "file_name": report.report_name
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Download failed: {str(e)}")
 
+# The file itself, streamed through the app with Range and conditional request support
+@app.api_route("/reports/{report_id}/content", methods=["GET", "HEAD"])
+def get_report_content(
+    report_id: int, doctor_id: int, request: Request, download: bool = False, db: Session = Depends(get_db)
+):
+    report = db.query(models.MedicalReport).filter(models.MedicalReport.report_id == report_id).first()
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if report.upload_status != "stored":
+        raise HTTPException(status_code=409, detail=f"Report file is not available (upload {report.upload_status})")
+    stored = db.query(models.StoredObject.sha256).filter(models.StoredObject.object_key == report.file_key).first()
+    try:
+        return report_content.serve_report(
+            request, report, stored.sha256 if stored else None, storage, download
+        )
+    except StorageObjectNotFound:
+        raise HTTPException(status_code=404, detail="Report file is missing from storage")
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Reading the report file failed: {str(e)}")
+
+# Preview thumbnail through the app, for backends without presigned URLs
+@app.api_route("/reports/{report_id}/preview", methods=["GET", "HEAD"])
+def get_report_preview(report_id: int, doctor_id: int, request: Request, db: Session = Depends(get_db)):
+    report = db.query(models.MedicalReport).filter(models.MedicalReport.report_id == report_id).first()
+    if not report or not report.preview_key:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    try:
+        return report_content.serve_stored(
+            request, storage, report.preview_key,
+            size=storage.object_size(report.preview_key),
+            content_type=report_previews.PREVIEW_CONTENT_TYPE,
+            etag=report_content.content_etag(report.preview_key, None),
+            last_modified=report.uploaded_at or datetime.utcnow(),
+            file_name=f"{report.report_name}.preview.jpg"
+        )
+    except StorageObjectNotFound:
+        raise HTTPException(status_code=404, detail="Preview is missing from storage")
+
 @app.put("/reports/{report_id}/share")
 def share_report(
     report_id: int,
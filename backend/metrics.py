@@ -0,0 +1,268 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+- MetricsMiddleware times every HTTP request per route template and tracks in-flight requests
+- instrument_engine hooks SQLAlchemy cursor events (queries and DB time per request)
+  and the connection pool (checkout wait)
+- observe_s3 is called by the storage service around each S3 operation
+
+Values are per worker process; with several gunicorn workers each scrape sees
+the worker that answered it.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional, Sequence, Tuple
+from sqlalchemy import event
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+TRANSFER_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _label_text(self, labelvalues: Tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        yield from self._samples()
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, amount: float = 1, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            yield f"{self.name}{self._label_text(labelvalues)} {value}"
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, *labelvalues):
+        self.inc(-amount, *labelvalues)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labelvalues -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items()]
+        for labelvalues, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = self._label_text(labelvalues, 'le="' + le + '"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{self._label_text(labelvalues)} {total}"
+            yield f"{self.name}_count{self._label_text(labelvalues)} {count}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY = []
+
+HTTP_REQUEST_DURATION = Histogram(
+    "curanet_http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "curanet_http_requests_in_flight", "HTTP requests currently being served",
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "curanet_db_queries_per_request", "SQL statements executed per HTTP request",
+    ("route",), buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "curanet_db_time_per_request_seconds", "Time spent in SQL statements per HTTP request",
+    ("route",),
+)
+DB_QUERY_DURATION = Histogram(
+    "curanet_db_query_duration_seconds", "Latency of individual SQL statements",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "curanet_db_pool_checkout_wait_seconds", "Time waiting for a pooled DB connection",
+    buckets=POOL_WAIT_BUCKETS,
+)
+S3_OPERATION_DURATION = Histogram(
+    "curanet_s3_operation_duration_seconds", "Latency of S3 operations",
+    ("operation",), buckets=TRANSFER_BUCKETS,
+)
+S3_BYTES = Counter(
+    "curanet_s3_bytes_total", "Bytes transferred to/from S3",
+    ("operation",),
+)
+JOB_QUEUE_WAIT = Histogram(
+    "curanet_job_queue_wait_seconds", "Time background jobs spend queued before a worker starts them",
+    ("kind",), buckets=TRANSFER_BUCKETS,
+)
+JOB_RUN_DURATION = Histogram(
+    "curanet_job_run_duration_seconds", "Run time of background job attempts",
+    ("kind", "outcome"), buckets=TRANSFER_BUCKETS,
+)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Mutable per-request accumulator; copied contexts (threadpool handlers) share the same object
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("curanet_request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so no per-request Request/Response objects are built"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_holder = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            _request_stats.reset(token)
+            route = route_template(scope)
+            HTTP_REQUEST_DURATION.observe(elapsed, scope["method"], route, str(status_holder[0]))
+            DB_QUERIES_PER_REQUEST.observe(stats.queries, route)
+            DB_TIME_PER_REQUEST.observe(stats.db_seconds, route)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("curanet_query_start", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - conn.info["curanet_query_start"].pop()
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire for failed statements
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("curanet_query_start"):
+        conn.info["curanet_query_start"].pop()
+
+
+def instrument_pool(pool):
+    """Time connection checkout by wrapping the pool's _do_get (idempotent)"""
+    if getattr(pool, "_curanet_timed", False):
+        return
+    do_get = pool._do_get
+
+    def timed_do_get():
+        start = perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(perf_counter() - start)
+
+    pool._do_get = timed_do_get
+    pool._curanet_timed = True
+
+
+def instrument_engine(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    instrument_pool(engine.pool)
+
+
+def observe_s3(operation: str, seconds: float, nbytes: int = 0):
+    S3_OPERATION_DURATION.observe(seconds, operation)
+    if nbytes:
+        S3_BYTES.inc(nbytes, operation)
+
+
+def observe_job(kind: str, waited: float, ran: float, outcome: str):
+    JOB_QUEUE_WAIT.observe(waited, kind)
+    JOB_RUN_DURATION.observe(ran, kind, outcome)
+
+
+def render_latest() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Enum, Boolean, DECIMAL
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Enum, Boolean, DECIMAL, Date, Index, UniqueConstraint, event, func
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -43,6 +43,29 @@ class Doctor(BaseUser):
             "image_url": self.image_url
         }
 
+class DoctorSchedule(Base):
+    """Weekly template: one working block of a weekday, e.g. Monday 09:00-12:00"""
+    __tablename__ = "doctor_schedules"
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id", ondelete="CASCADE"), index=True, nullable=False)
+    weekday = Column(Integer, nullable=False)  # 0 = Monday ... 6 = Sunday
+    start_time = Column(String(5), nullable=False)  # "HH:MM"
+    end_time = Column(String(5), nullable=False)  # "HH:MM", exclusive
+
+class DoctorScheduleException(Base):
+    """Leave, holidays and other one-off closures; no times means the whole day"""
+    __tablename__ = "doctor_schedule_exceptions"
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False)
+    exception_date = Column(Date, nullable=False)
+    start_time = Column(String(5), nullable=True)
+    end_time = Column(String(5), nullable=True)
+    reason = Column(String(200), nullable=True)
+
+    __table_args__ = (
+        Index("ix_doctor_schedule_exceptions_doctor_date", "doctor_id", "exception_date"),
+    )
+
 class Admin(BaseUser):
     __tablename__ = "admins"
     department = Column(String(50), nullable=True)
@@ -80,15 +103,35 @@ class Appointment(Base):
     doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)
     appointment_time = Column(DateTime, nullable=False)
     status = Column(String(50), nullable=False, default="pending")
+    # appointment_time while the appointment holds its slot, NULL once cancelled;
+    # the unique constraint makes double-booking a doctor impossible even under concurrent requests
+    booked_slot = Column(DateTime, nullable=True)
 
     patient = relationship("Patient", back_populates="appointments")
     doctor = relationship("Doctor", back_populates="appointments")
     medical_sessions = relationship("MedicalSession", back_populates="appointment")
 
+    __table_args__ = (
+        UniqueConstraint("doctor_id", "booked_slot", name="uq_appointments_doctor_slot"),
+        # Doctor dashboard, calendar and upcoming-appointment range scans
+        Index("ix_appointments_doctor_time", "doctor_id", "appointment_time"),
+        # Patient dashboard and paginated medical history
+        Index("ix_appointments_patient_time", "patient_id", "appointment_time"),
+    )
+
+    def sync_booked_slot(self):
+        self.booked_slot = None if self.status == "cancelled" else self.appointment_time
+
+
+@event.listens_for(Appointment, "before_insert")
+@event.listens_for(Appointment, "before_update")
+def _sync_appointment_slot(mapper, connection, target):
+    target.sync_booked_slot()
+
 class MedicalSession(Base):
     __tablename__ = "medical_sessions"
     session_id = Column(Integer, primary_key=True, index=True)
-    appointment_id = Column(Integer, ForeignKey("appointments.id"), nullable=False)
+    appointment_id = Column(Integer, ForeignKey("appointments.id"), index=True, nullable=False)
     patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
     doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)
     session_date = Column(DateTime, default=datetime.utcnow)
@@ -110,7 +153,7 @@ class MedicalSession(Base):
 class Prescription(Base):
     __tablename__ = "prescriptions"
     prescription_id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), nullable=False)
+    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), index=True, nullable=False)
     medication_name = Column(String(200), nullable=False)
     dosage = Column(String(100), nullable=False)
     frequency = Column(String(100), nullable=False)
@@ -123,7 +166,7 @@ class Prescription(Base):
 class Symptom(Base):
     __tablename__ = "symptoms"
     symptom_id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), nullable=False)
+    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), index=True, nullable=False)
     symptom_description = Column(Text, nullable=False)
     severity = Column(Enum(SeverityLevel), nullable=False)
     duration = Column(String(100))
@@ -135,7 +178,7 @@ class Symptom(Base):
 class Diagnosis(Base):
     __tablename__ = "diagnoses"
     diagnosis_id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), nullable=False)
+    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), index=True, nullable=False)
     diagnosis_code = Column(String(20))
     diagnosis_description = Column(Text, nullable=False)
     diagnosis_type = Column(Enum(DiagnosisType), default=DiagnosisType.primary)
@@ -148,7 +191,7 @@ class Diagnosis(Base):
 class VitalSign(Base):
     __tablename__ = "vital_signs"
     vital_id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), nullable=False)
+    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), index=True, nullable=False)
     blood_pressure_systolic = Column(Integer)
     blood_pressure_diastolic = Column(Integer)
     heart_rate = Column(Integer)
@@ -164,7 +207,7 @@ class VitalSign(Base):
 class TreatmentPlan(Base):
     __tablename__ = "treatment_plans"
     plan_id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), nullable=False)
+    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), index=True, nullable=False)
     treatment_description = Column(Text, nullable=False)
     start_date = Column(DateTime)
     end_date = Column(DateTime)
@@ -181,14 +224,171 @@ class MedicalReport(Base):
     report_id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
     doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)
-    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), nullable=True)
+    session_id = Column(Integer, ForeignKey("medical_sessions.session_id"), index=True, nullable=True)
     report_name = Column(String(255), nullable=False)
-    file_key = Column(String(500), nullable=False)  # S3 object key
-    file_size = Column(Integer, nullable=False)
+    file_key = Column(String(500), index=True, nullable=False)  # S3 object key; shared by reports with identical content
+    file_size = Column(Integer, nullable=False)  # as uploaded
+    stored_size = Column(Integer)  # in storage, after compression; set once stored
+    content_encoding = Column(String(20))  # "gzip" when stored compressed
     content_type = Column(String(100), nullable=False)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     shared_with = Column(Text)  # JSON array of doctor IDs who can access
+    upload_status = Column(String(20), nullable=False, default="stored", server_default="stored")  # pending, stored, failed
+    preview_key = Column(String(500))  # small JPEG stored next to the original, once generated
     
     patient = relationship("Patient")
     doctor = relationship("Doctor")
-    session = relationship("MedicalSession")
\ No newline at end of file
+    session = relationship("MedicalSession")
+
+# Archive storage: completed appointments older than the archive horizon and their sessions
+# are moved here in small batches by crud/archival.py. Rows keep their original ids, so ids
+# stay unique across hot and archive tables and the history endpoints can read both.
+
+class AppointmentArchive(Base):
+    __tablename__ = "appointments_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)
+    appointment_time = Column(DateTime, nullable=False)
+    status = Column(String(50), nullable=False)
+    archived_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    patient = relationship("Patient", viewonly=True)
+    doctor = relationship("Doctor", viewonly=True)
+
+    __table_args__ = (
+        Index("ix_appointments_archive_doctor_time", "doctor_id", "appointment_time"),
+        Index("ix_appointments_archive_patient_time", "patient_id", "appointment_time"),
+    )
+
+class MedicalSessionArchive(Base):
+    __tablename__ = "medical_sessions_archive"
+    session_id = Column(Integer, primary_key=True, autoincrement=False)
+    appointment_id = Column(Integer, ForeignKey("appointments_archive.id"), index=True, nullable=False)
+    patient_id = Column(Integer, ForeignKey("patients.id"), index=True, nullable=False)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)
+    session_date = Column(DateTime)
+    status = Column(Enum(SessionStatus))
+    chief_complaint = Column(Text)
+    session_notes = Column(Text)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+class PrescriptionArchive(Base):
+    __tablename__ = "prescriptions_archive"
+    prescription_id = Column(Integer, primary_key=True, autoincrement=False)
+    session_id = Column(Integer, ForeignKey("medical_sessions_archive.session_id"), index=True, nullable=False)
+    medication_name = Column(String(200), nullable=False)
+    dosage = Column(String(100), nullable=False)
+    frequency = Column(String(100), nullable=False)
+    duration = Column(String(100), nullable=False)
+    instructions = Column(Text)
+    prescribed_date = Column(DateTime)
+
+class SymptomArchive(Base):
+    __tablename__ = "symptoms_archive"
+    symptom_id = Column(Integer, primary_key=True, autoincrement=False)
+    session_id = Column(Integer, ForeignKey("medical_sessions_archive.session_id"), index=True, nullable=False)
+    symptom_description = Column(Text, nullable=False)
+    severity = Column(Enum(SeverityLevel), nullable=False)
+    duration = Column(String(100))
+    notes = Column(Text)
+    recorded_at = Column(DateTime)
+
+class DiagnosisArchive(Base):
+    __tablename__ = "diagnoses_archive"
+    diagnosis_id = Column(Integer, primary_key=True, autoincrement=False)
+    session_id = Column(Integer, ForeignKey("medical_sessions_archive.session_id"), index=True, nullable=False)
+    diagnosis_code = Column(String(20))
+    diagnosis_description = Column(Text, nullable=False)
+    diagnosis_type = Column(Enum(DiagnosisType))
+    confidence_level = Column(Enum(ConfidenceLevel))
+    notes = Column(Text)
+    diagnosed_at = Column(DateTime)
+
+class VitalSignArchive(Base):
+    __tablename__ = "vital_signs_archive"
+    vital_id = Column(Integer, primary_key=True, autoincrement=False)
+    session_id = Column(Integer, ForeignKey("medical_sessions_archive.session_id"), index=True, nullable=False)
+    blood_pressure_systolic = Column(Integer)
+    blood_pressure_diastolic = Column(Integer)
+    heart_rate = Column(Integer)
+    temperature = Column(DECIMAL(4, 2))
+    respiratory_rate = Column(Integer)
+    oxygen_saturation = Column(Integer)
+    weight = Column(DECIMAL(5, 2))
+    height = Column(DECIMAL(5, 2))
+    recorded_at = Column(DateTime)
+
+class TreatmentPlanArchive(Base):
+    __tablename__ = "treatment_plans_archive"
+    plan_id = Column(Integer, primary_key=True, autoincrement=False)
+    session_id = Column(Integer, ForeignKey("medical_sessions_archive.session_id"), index=True, nullable=False)
+    treatment_description = Column(Text, nullable=False)
+    start_date = Column(DateTime)
+    end_date = Column(DateTime)
+    status = Column(Enum(TreatmentStatus))
+    follow_up_required = Column(Boolean)
+    follow_up_date = Column(DateTime)
+    notes = Column(Text)
+    created_at = Column(DateTime)
+
+
+class PatientPurgeJob(Base):
+    """Progress of a chunked patient deletion or anonymization (see crud/patient_purge.py)"""
+    __tablename__ = "patient_purge_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    patient_id = Column(Integer, index=True, nullable=False)  # no foreign key: the patient row goes last
+    mode = Column(String(20), nullable=False)  # "delete" or "anonymize"
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, failed
+    step = Column(String(50))  # step in progress; earlier steps are finished
+    progress = Column(Text, nullable=False, default="{}")  # JSON: rows handled per step
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    heartbeat_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+
+class StoredObject(Base):
+    """
+    One stored report file, shared by every report with the same content: the key is derived
+    from the SHA-256 of the bytes and ref_count counts the reports pointing at it
+    (see crud/stored_objects.py)
+    """
+    __tablename__ = "stored_objects"
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False)
+    object_key = Column(String(500), unique=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    stored_size = Column(Integer)
+    content_encoding = Column(String(20))
+    content_type = Column(String(100), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, stored, failed
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class BackgroundJob(Base):
+    """Durable queue entry for work done off the request path (see job_queue.py)"""
+    __tablename__ = "background_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False, default="{}")  # JSON arguments for the handler
+    idempotency_key = Column(String(200), unique=True)  # enqueueing the same key again returns the existing job
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # not before; pushed back by retries
+    locked_by = Column(String(100))  # worker holding the lease
+    locked_at = Column(DateTime)  # lease heartbeat
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)  # start of the latest attempt
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        # The workers' poll: next due job in a status
+        Index("ix_background_jobs_status_run_after", "status", "run_after"),
+    )
@@ -0,0 +1,136 @@
+"""
+Opt-in runtime N+1 query detector.
+
+Every SQL statement executed while serving a request is reduced to a shape
+(literals and IN-lists collapsed, whitespace normalized) and counted. When one
+shape repeats THRESHOLD or more times in a single request, the route, count,
+originating call site in backend/ and the statement are logged and kept in a
+small in-memory list served at /admin/n-plus-one.
+
+Configuration (environment):
+    N_PLUS_ONE_DETECTION   1 to enable (default off; nothing is hooked when off)
+    N_PLUS_ONE_THRESHOLD   repetitions of one statement shape that count as N+1 (default 5)
+"""
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+from sqlalchemy import event
+from .metrics import route_template
+import logging
+import os
+import re
+import sys
+import threading
+
+ENABLED = os.getenv("N_PLUS_ONE_DETECTION", "0") == "1"
+THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+logger = logging.getLogger("curanet.n_plus_one")
+
+_backend_dir = os.path.dirname(os.path.abspath(__file__))
+_this_file = os.path.abspath(__file__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Reduce a SQL statement to its shape so per-row variants compare equal"""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _WHITESPACE.sub(" ", shape).strip()
+    return _IN_LIST.sub("IN (...)", shape)
+
+
+class _RequestQueries:
+    __slots__ = ("shapes",)
+
+    def __init__(self):
+        # shape -> [count, call site captured when the threshold was reached]
+        self.shapes = {}
+
+
+_current: ContextVar[Optional[_RequestQueries]] = ContextVar("curanet_n_plus_one", default=None)
+
+_findings = deque(maxlen=100)
+_findings_lock = threading.Lock()
+
+
+def _call_site() -> str:
+    """First frame inside backend/ (other than this module) on the current stack"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_backend_dir) and filename != _this_file:
+            return f"{os.path.relpath(filename, os.path.dirname(_backend_dir))}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    state = _current.get()
+    if state is None:
+        return
+    shape = fingerprint(statement)
+    entry = state.shapes.get(shape)
+    if entry is None:
+        entry = state.shapes[shape] = [0, None]
+    entry[0] += 1
+    if entry[0] == THRESHOLD:
+        entry[1] = _call_site()
+
+
+def _report(route: str, method: str, state: _RequestQueries):
+    for shape, (count, call_site) in state.shapes.items():
+        if count < THRESHOLD:
+            continue
+        finding = {
+            "detected_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+            "route": route,
+            "method": method,
+            "count": count,
+            "call_site": call_site,
+            "statement": shape[:500],
+        }
+        with _findings_lock:
+            _findings.append(finding)
+        logger.warning(
+            "N+1 query: %s %s ran the same statement %d times (from %s): %s",
+            method, route, count, call_site, shape[:200],
+        )
+
+
+class NPlusOneMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = _RequestQueries()
+        token = _current.set(state)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            _report(route_template(scope), scope["method"], state)
+
+
+def recent_findings() -> list:
+    with _findings_lock:
+        return list(reversed(_findings))
+
+
+def install(app, engine) -> bool:
+    """Hook the detector into the app and engine when N_PLUS_ONE_DETECTION=1"""
+    if not ENABLED:
+        return False
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    app.add_middleware(NPlusOneMiddleware)
+    return True
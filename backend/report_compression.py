@@ -0,0 +1,93 @@
+"""
+Compression of text-heavy report uploads (CSV lab exports, HL7/XML, JSON device dumps,
+plain-text notes) before they are stored.
+
+Objects are gzip-compressed and stored with Content-Encoding: gzip, so S3 serves them with that
+header and browsers following a presigned URL decode them transparently; clients get the bytes
+that were uploaded. zstd compresses better but is not a Content-Encoding every browser can
+decode, and objects are downloaded straight from S3, so gzip it is.
+
+Whether a file is worth compressing is decided from its content type and a quick level-1
+compression of a few samples, so already-compressed payloads with text types (a zipped CSV
+uploaded as text/csv) are stored as they are.
+
+Configuration (environment):
+    REPORT_COMPRESSION            on (default) or off
+    REPORT_COMPRESSION_LEVEL      gzip level for stored objects (default 6)
+    REPORT_COMPRESSION_MIN_SAVING fraction of the samples compression must save (default 0.1)
+"""
+from typing import Optional, Tuple
+import gzip
+import os
+import zlib
+
+REPORT_COMPRESSION = os.getenv("REPORT_COMPRESSION", "on") != "off"
+COMPRESSION_LEVEL = int(os.getenv("REPORT_COMPRESSION_LEVEL", "6"))
+MIN_SAVING = float(os.getenv("REPORT_COMPRESSION_MIN_SAVING", "0.1"))
+
+# Files smaller than this gain nothing worth a Content-Encoding header
+MIN_COMPRESS_BYTES = 1024
+
+# Up to this many samples of this size (start, middle, end) are test-compressed
+SAMPLE_BYTES = 64 * 1024
+SAMPLES = 3
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/csv",
+    "application/hl7-v2",
+    "application/x-hl7",
+    "application/edi-hl7",
+    "application/fhir+json",
+    "application/fhir+xml",
+    "application/javascript",
+    "application/rtf",
+    "image/svg+xml",
+}
+
+
+def _media_type(content_type: Optional[str]) -> str:
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def is_compressible_type(content_type: Optional[str]) -> bool:
+    media_type = _media_type(content_type)
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith("+json")
+        or media_type.endswith("+xml")
+    )
+
+
+def _samples(content: bytes):
+    if len(content) <= SAMPLE_BYTES * SAMPLES:
+        yield content
+        return
+    step = (len(content) - SAMPLE_BYTES) // (SAMPLES - 1)
+    for index in range(SAMPLES):
+        yield content[index * step:index * step + SAMPLE_BYTES]
+
+
+def worth_compressing(content: bytes, content_type: Optional[str]) -> bool:
+    """Text type, big enough, and the samples shrink by at least MIN_SAVING at level 1"""
+    if not REPORT_COMPRESSION or len(content) < MIN_COMPRESS_BYTES or not is_compressible_type(content_type):
+        return False
+    raw = compressed = 0
+    for sample in _samples(content):
+        raw += len(sample)
+        compressed += len(zlib.compress(sample, 1))
+    return compressed <= raw * (1 - MIN_SAVING)
+
+
+def encode_for_storage(content: bytes, content_type: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Bytes to store and their Content-Encoding (None when stored as uploaded)"""
+    if not worth_compressing(content, content_type):
+        return content, None
+    # mtime=0 keeps the output identical for identical input
+    body = gzip.compress(content, COMPRESSION_LEVEL, mtime=0)
+    if len(body) >= len(content):
+        return content, None
+    return body, "gzip"
@@ -0,0 +1,250 @@
+"""
+Report files streamed through the app (GET /reports/{id}/content) rather than via a presigned
+URL: for backends without presigned URLs (local, mock), for clients that cannot reach S3, and for seeking inside large scans.
+
+Objects are piped from storage in fixed-size chunks, so memory stays constant whatever the file
+size; files of the local storage backend are sent straight from disk. Single byte ranges
+(Range, If-Range) let downloads resume and viewers fetch just the part they show; ETag /
+Last-Modified with If-None-Match / If-Modified-Since answer repeat requests with 304. Ranges always count bytes of the file as uploaded: a gzip-stored object is decoded on
+the fly for range requests and for clients without gzip, and passed through compressed otherwise.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Iterator, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+import anyio
+import hashlib
+import zlib
+
+from .storage import StorageBackend, content_disposition
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) byte positions of a single "bytes=" range, or None to send the whole file
+    (no header, a malformed one, or several ranges, which servers may answer in full)
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)  # bytes=-N: the last N bytes
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - suffix, 0), size - 1
+        first = int(first)
+        last = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable()
+    if first > last:
+        return None
+    return first, min(last, size - 1)
+
+
+def _entity_tags(header: str):
+    for tag in header.split(","):
+        tag = tag.strip()
+        yield tag[2:] if tag.startswith("W/") else tag
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value) if value else None
+    except (TypeError, ValueError):
+        return None
+    if parsed is not None and parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """If-None-Match (weak comparison) decides when present; If-Modified-Since otherwise"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in _entity_tags(if_none_match)
+    since = _parse_http_date(request.headers.get("if-modified-since"))
+    return since is not None and last_modified <= since
+
+
+def range_applies(request: Request, etag: str, last_modified: datetime) -> bool:
+    """If-Range: the range is only valid against the version the client already has part of"""
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == etag  # strong comparison
+    since = _parse_http_date(if_range)
+    return since is not None and last_modified == since
+
+
+def accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _decompressed(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        output = decoder.decompress(chunk)
+        if output:
+            yield output
+    tail = decoder.flush()
+    if tail:
+        yield tail
+
+
+def decoded_range(chunks: Iterable[bytes], first: int, last: int) -> Iterator[bytes]:
+    """Decode a gzip stream on the fly and yield only bytes first..last of the output"""
+    position = 0
+    try:
+        for chunk in _decompressed(chunks):
+            end = position + len(chunk)
+            if end > first:
+                yield chunk[max(first - position, 0):last + 1 - position]
+            position = end
+            if position > last:
+                break
+    finally:
+        # Stopped early: release the storage stream now rather than at garbage collection
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+class LocalFileResponse(Response):
+    """
+    Bytes first..last of a file on this machine. Servers offering the ASGI zero-copy extension
+    get the file descriptor and send it with sendfile; otherwise it is read in large chunks
+    in a worker thread.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: str, first: int, last: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.first = first
+        self.last = last
+
+    async def __call__(self, scope, receive, send):
+        count = self.last - self.first + 1
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as handle:
+                await send({"type": "http.response.zerocopysend", "file": handle, "offset": self.first, "count": count})
+            return
+        async with await anyio.open_file(self.path, "rb") as handle:
+            await handle.seek(self.first)
+            while count > 0:
+                chunk = await handle.read(min(self.chunk_size, count))
+                if not chunk:
+                    break
+                count -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": count > 0})
+        if count > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def content_etag(file_key: str, sha256: Optional[str]) -> str:
+    """Content hash when known; otherwise the key, which is never reused for other content"""
+    return f'"{sha256 or hashlib.sha256(file_key.encode()).hexdigest()}"'
+
+
+def serve_stored(
+    request: Request,
+    storage: StorageBackend,
+    file_key: str,
+    size: int,
+    content_type: str,
+    etag: str,
+    last_modified: datetime,
+    file_name: str,
+    content_encoding: Optional[str] = None,
+    stored_size: Optional[int] = None,
+    download: bool = False
+) -> Response:
+    """Full, partial (206), 304 or 416 response for a stored object, streamed from storage"""
+    last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+    gzip_stored = content_encoding == "gzip"
+    requested_range = request.headers.get("range")
+    passthrough = gzip_stored and not requested_range and accepts_gzip(request)
+
+    if passthrough:
+        etag = etag[:-1] + '-gzip"'  # a different representation needs its own tag
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": content_disposition(file_name, "attachment" if download else "inline"),
+    }
+    if gzip_stored:
+        headers["Vary"] = "Accept-Encoding"
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers={
+            name: value for name, value in headers.items() if name != "Content-Disposition"
+        })
+
+    byte_range = None
+    if requested_range and range_applies(request, etag, last_modified):
+        try:
+            byte_range = parse_range(requested_range, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    if byte_range is not None:
+        first, last = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+        headers["Content-Length"] = str(last - first + 1)
+    elif passthrough:
+        first, last = 0, (stored_size or size) - 1
+        headers["Content-Encoding"] = "gzip"
+        headers["Content-Length"] = str(last + 1)
+    else:
+        first, last = 0, size - 1
+        headers["Content-Length"] = str(size)
+
+    if request.method == "HEAD" or last < first:
+        return Response(status_code=status_code, headers=headers, media_type=content_type)
+
+    if gzip_stored and not passthrough:
+        chunks = decoded_range(storage.get_object(file_key), first, last)
+        return StreamingResponse(chunks, status_code=status_code, headers=headers, media_type=content_type)
+    path = storage.local_path(file_key)
+    if path is not None:
+        return LocalFileResponse(path, first, last, status_code, headers, content_type)
+    if byte_range is not None:
+        chunks = storage.get_object(file_key, first, last)
+    else:
+        chunks = storage.get_object(file_key)
+    return StreamingResponse(chunks, status_code=status_code, headers=headers, media_type=content_type)
+
+
+def serve_report(request: Request, report, sha256: Optional[str], storage: StorageBackend, download: bool = False) -> Response:
+    """The report's file as uploaded, whatever the storage encoding"""
+    return serve_stored(
+        request, storage, report.file_key,
+        size=report.file_size,
+        content_type=report.content_type,
+        etag=content_etag(report.file_key, sha256),
+        last_modified=report.uploaded_at or datetime.utcnow(),
+        file_name=report.report_name,
+        content_encoding=report.content_encoding,
+        stored_size=report.stored_size,
+        download=download
+    )
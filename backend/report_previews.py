@@ -0,0 +1,140 @@
+"""
+Small JPEG previews of uploaded reports, so report lists can show what a file is without
+anyone downloading the original: the first page of a PDF, or a downscaled photo or scan.
+
+Rendering is CPU-bound and runs in a process pool, off the job workers and the event loop.
+A preview is stored next to its original (<file_key>.preview.jpg) by the "report_preview"
+background job that the upload job queues.
+
+Rendering needs Pillow for images and pypdfium2 (with Pillow) for PDFs, both in
+requirements.txt. They are checked at runtime, so an install without them simply gets no
+previews for the matching content types.
+
+A render that overruns its time limit is left hung in its process, so the pool is thrown away
+(its processes killed) and rebuilt on the next render; renders that were in flight on it fail
+and their jobs retry.
+
+Configuration (environment):
+    PREVIEW_MAX_SIZE          longest side of a preview in pixels (default 320)
+    PREVIEW_QUALITY           JPEG quality (default 70)
+    PREVIEW_PROCESSES         render processes per app process (default 2)
+    PREVIEW_TIMEOUT_SECONDS   render time limit per file (default 60)
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as RenderTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+import importlib.util
+import io
+import multiprocessing
+import os
+import threading
+
+# Imported by the render processes too, so nothing from the app is imported at module level
+
+PREVIEW_MAX_SIZE = int(os.getenv("PREVIEW_MAX_SIZE", "320"))
+PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", "70"))
+PREVIEW_PROCESSES = int(os.getenv("PREVIEW_PROCESSES", "2"))
+PREVIEW_TIMEOUT_SECONDS = float(os.getenv("PREVIEW_TIMEOUT_SECONDS", "60"))
+
+PREVIEW_CONTENT_TYPE = "image/jpeg"
+PREVIEW_SUFFIX = ".preview.jpg"
+
+HAS_PILLOW = importlib.util.find_spec("PIL") is not None
+HAS_PDFIUM = importlib.util.find_spec("pypdfium2") is not None
+
+
+def supports(content_type: Optional[str]) -> bool:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type == "application/pdf":
+        return HAS_PILLOW and HAS_PDFIUM
+    return content_type.startswith("image/") and HAS_PILLOW
+
+
+def preview_key_for(file_key: str) -> str:
+    return file_key + PREVIEW_SUFFIX
+
+
+def _first_pdf_page(content: bytes, max_size: int):
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(content)
+    try:
+        page = pdf[0]
+        width, height = page.get_size()
+        # Render at about the preview size instead of full resolution and scaling down
+        scale = max_size / max(width, height, 1) * 2
+        return page.render(scale=scale).to_pil()
+    finally:
+        pdf.close()
+
+
+def render_preview(content: bytes, content_type: str, max_size: int = PREVIEW_MAX_SIZE,
+                   quality: int = PREVIEW_QUALITY) -> Optional[bytes]:
+    """JPEG bytes of the preview, or None when the file cannot be read as an image or PDF (runs in the pool)"""
+    from PIL import Image, ImageOps
+
+    try:
+        if content_type.split(";")[0].strip().lower() == "application/pdf":
+            image = _first_pdf_page(content, max_size)
+        else:
+            image = Image.open(io.BytesIO(content))
+            image.draft("RGB", (max_size, max_size))  # JPEG decoders can skip detail we would throw away
+            image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=quality, optimize=True)
+        return output.getvalue()
+    except Exception:
+        return None  # corrupt or unsupported variant; retrying would not help
+
+
+class PreviewRenderer:
+    """Process pool created on first use, and rebuilt if a render process dies or hangs"""
+
+    def __init__(self, processes: int = PREVIEW_PROCESSES):
+        self.processes = max(1, processes)
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: the app process has threads (job workers, DB pool) that must not be forked
+                self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def render(self, content: bytes, content_type: str) -> Optional[bytes]:
+        if not supports(content_type):
+            return None
+        pool = self._get_pool()
+        try:
+            return pool.submit(render_preview, content, content_type).result(PREVIEW_TIMEOUT_SECONDS)
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+        except RenderTimeout:
+            # The render keeps its process busy for good; only killing the process frees it
+            self._discard(pool, kill=True)
+            raise
+
+    def _discard(self, pool: ProcessPoolExecutor, kill: bool = False):
+        with self._lock:
+            if self._pool is not pool:
+                return  # already replaced by another thread
+            self._pool = None
+        if kill:
+            # ProcessPoolExecutor has no public way to stop a running task before Python 3.14
+            for process in list((getattr(pool, "_processes", None) or {}).values()):
+                process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+renderer = PreviewRenderer()
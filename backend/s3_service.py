@@ -1,61 +1,141 @@
-import boto3
+import importlib.util
 import os
-from botocore.exceptions import ClientError
-from datetime import datetime, timedelta
-import uuid
+import threading
+from time import perf_counter
+
+from .metrics import observe_s3
+from .storage import StorageBackend, StorageObjectNotFound, STREAM_CHUNK_SIZE, content_disposition
+
+
+class S3Service(StorageBackend):
+    name = "s3"
 
-class S3Service:
     def __init__(self):
+        # boto3 is imported and the client built on first use (or by warm_up), not at app import
+        if importlib.util.find_spec('boto3') is None:
+            raise ImportError("boto3 is not installed")
+
         # Get AWS credentials from environment or use defaults
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID', 'your_access_key_here')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY', 'your_secret_key_here')
-        aws_region = os.getenv('AWS_REGION', 'us-east-1')
-        
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=aws_access_key,
-            aws_secret_access_key=aws_secret_key,
-            region_name=aws_region
-        )
+        self.aws_access_key = os.getenv('AWS_ACCESS_KEY_ID', 'your_access_key_here')
+        self.aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY', 'your_secret_key_here')
+        self.aws_region = os.getenv('AWS_REGION', 'us-east-1')
         self.bucket_name = os.getenv('S3_BUCKET_NAME', 'curanet-medical-reports')
-    
-    def upload_file(self, file_content, file_name, content_type, patient_id, doctor_id):
-        """Upload file to S3 and return the file key"""
+
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def s3_client(self):
+        """boto3 S3 client, created once per process on first access"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+
+                    self._client = boto3.client(
+                        's3',
+                        aws_access_key_id=self.aws_access_key,
+                        aws_secret_access_key=self.aws_secret_key,
+                        region_name=self.aws_region
+                    )
+        return self._client
+
+    def warm_up(self):
+        """Build the client in a background thread so the first upload does not pay for it"""
+        def build():
+            try:
+                self.s3_client
+            except Exception as e:
+                print(f"⚠️  S3 client warm-up failed: {e}")
+
+        threading.Thread(target=build, name="s3-warm-up", daemon=True).start()
+
+    def put_file(self, file_key, file_content, content_type, content_encoding=None):
+        """Upload file content under an existing key; S3 serves it back with content_encoding"""
+        s3_client = self.s3_client
+        from botocore.exceptions import ClientError
         try:
-            # Generate unique file key
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            unique_id = str(uuid.uuid4())[:8]
-            file_key = f"reports/patient_{patient_id}/doctor_{doctor_id}/{timestamp}_{unique_id}_{file_name}"
-            
-            # Upload to S3
-            self.s3_client.put_object(
+            extra = {'ContentEncoding': content_encoding} if content_encoding else {}
+            start = perf_counter()
+            s3_client.put_object(
                 Bucket=self.bucket_name,
                 Key=file_key,
                 Body=file_content,
                 ContentType=content_type,
-                ServerSideEncryption='AES256'
+                ServerSideEncryption='AES256',
+                **extra
             )
-            
-            return file_key
+            observe_s3('put_object', perf_counter() - start, len(file_content))
         except ClientError as e:
             raise Exception(f"Failed to upload file to S3: {str(e)}")
-    
-    def generate_presigned_url(self, file_key, expiration=3600):
-        """Generate a presigned URL for file download"""
+
+    def generate_presigned_url(self, file_key, expiration=3600, file_name=None):
+        """Generate a presigned URL for file download, saved as file_name when given"""
+        s3_client = self.s3_client
+        from botocore.exceptions import ClientError
         try:
-            response = self.s3_client.generate_presigned_url(
+            params = {'Bucket': self.bucket_name, 'Key': file_key}
+            if file_name:
+                params['ResponseContentDisposition'] = content_disposition(file_name)
+            start = perf_counter()
+            response = s3_client.generate_presigned_url(
                 'get_object',
-                Params={'Bucket': self.bucket_name, 'Key': file_key},
+                Params=params,
                 ExpiresIn=expiration
             )
+            observe_s3('generate_presigned_url', perf_counter() - start)
             return response
         except ClientError as e:
             raise Exception(f"Failed to generate presigned URL: {str(e)}")
-    
+
+    def get_object(self, file_key, start=None, end=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Iterator over the stored bytes (from start to end inclusive, when given) in chunks.
+        The request is made here, so a missing object raises before anything is streamed.
+        """
+        s3_client = self.s3_client
+        from botocore.exceptions import ClientError
+        params = {'Bucket': self.bucket_name, 'Key': file_key}
+        if start is not None:
+            params['Range'] = f"bytes={start}-{'' if end is None else end}"
+        started = perf_counter()
+        try:
+            body = s3_client.get_object(**params)['Body']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                raise StorageObjectNotFound(file_key)
+            raise Exception(f"Failed to read file from S3: {str(e)}")
+
+        def chunks():
+            transferred = 0
+            try:
+                for chunk in body.iter_chunks(chunk_size):
+                    transferred += len(chunk)
+                    yield chunk
+            finally:
+                body.close()
+                observe_s3('get_object', perf_counter() - started, transferred)
+
+        return chunks()
+
+    def object_size(self, file_key):
+        s3_client = self.s3_client
+        from botocore.exceptions import ClientError
+        try:
+            return s3_client.head_object(Bucket=self.bucket_name, Key=file_key)['ContentLength']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                raise StorageObjectNotFound(file_key)
+            raise Exception(f"Failed to read file metadata from S3: {str(e)}")
+
     def delete_file(self, file_key):
         """Delete file from S3"""
+        s3_client = self.s3_client
+        from botocore.exceptions import ClientError
         try:
-            self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_key)
+            start = perf_counter()
+            s3_client.delete_object(Bucket=self.bucket_name, Key=file_key)
+            observe_s3('delete_object', perf_counter() - start)
             return True
         except ClientError as e:
-            raise Exception(f"Failed to delete file from S3: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to delete file from S3: {str(e)}")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -129,6 +129,14 @@ class AdminHeaderResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AdminDashboardCountersResponse(BaseModel):
+    total_patients: int
+    total_doctors: int
+    total_appointments: int
+    appointments_by_status: Dict[str, int]
+    today_appointments: int
+    reconciled_at: Optional[str] = None
+
 # Add this new schema for admin dashboard
 class AdminDoctorResponse(BaseModel):
     doctor_id: str
@@ -301,4 +309,19 @@ class MedicalSessionResponse(BaseModel):
     treatment_plans: List[dict] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+# Doctor schedule schemas
+
+class ScheduleBlock(BaseModel):
+    weekday: int = Field(..., ge=0, le=6)  # 0 = Monday
+    start_time: str = Field(..., pattern=r"^\d{2}:\d{2}$")
+    end_time: str = Field(..., pattern=r"^\d{2}:\d{2}$")
+
+class DoctorScheduleUpdate(BaseModel):
+    blocks: List[ScheduleBlock]
+
+class ScheduleExceptionCreate(BaseModel):
+    date: str  # "YYYY-MM-DD"
+    start_time: Optional[str] = Field(None, pattern=r"^\d{2}:\d{2}$")  # both omitted = whole day
+    end_time: Optional[str] = Field(None, pattern=r"^\d{2}:\d{2}$")
+    reason: Optional[str] = None
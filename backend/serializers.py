@@ -0,0 +1,32 @@
+"""
+Response serialization for the hot list endpoints.
+
+FastAPI normally validates a handler's return value against response_model and
+then encodes it with the stdlib json module. For data the crud layer built
+itself that validation is redundant, so these helpers return a finished
+Response instead (FastAPI skips response_model validation for Response objects;
+the model stays on the route for the OpenAPI docs).
+
+- trusted_json: dicts/lists produced by crud format_* functions, encoded with orjson
+- ORM rows go through TypeAdapters built once at import time and dumped to JSON
+  in pydantic-core without an intermediate Python dict
+"""
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import TypeAdapter
+from typing import Any, List
+from .schemas import DoctorResponse
+
+JSON_MEDIA_TYPE = "application/json"
+
+doctor_list_adapter = TypeAdapter(List[DoctorResponse])
+
+
+def trusted_json(content: Any, status_code: int = 200) -> ORJSONResponse:
+    """Encode crud-built content with orjson, without response_model validation"""
+    return ORJSONResponse(content, status_code=status_code)
+
+
+def doctor_list_json(doctors) -> Response:
+    """Serialize Doctor ORM rows as a List[DoctorResponse] payload"""
+    models = doctor_list_adapter.validate_python(doctors, from_attributes=True)
+    return Response(doctor_list_adapter.dump_json(models), media_type=JSON_MEDIA_TYPE)
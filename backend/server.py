@@ -0,0 +1,93 @@
+"""
+Production entry point: gunicorn supervising uvicorn workers.
+
+    python -m backend.server
+
+Configuration (environment):
+    PORT                    listen port (default 8000)
+    WEB_CONCURRENCY         worker count (default 2 x CPU + 1)
+    MAX_REQUESTS            recycle a worker after this many requests (default 1000, 0 disables)
+    MAX_REQUESTS_JITTER     random extra requests per worker so they do not all restart together (default 100)
+    GRACEFUL_TIMEOUT        seconds a stopping worker gets to finish in-flight requests, e.g. 50MB report uploads (default 120)
+    WORKER_TIMEOUT          seconds of silence before a worker is killed and replaced (default 120)
+    KEEPALIVE               keep-alive seconds; keep above the load balancer idle timeout (default 75)
+"""
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+import importlib.util
+import multiprocessing
+import os
+
+
+def _has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+class CuraNetWorker(UvicornWorker):
+    """Uvicorn worker that prefers uvloop/httptools and drains requests on shutdown"""
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop" if _has_module("uvloop") else "asyncio",
+        "http": "httptools" if _has_module("httptools") else "h11",
+        "lifespan": "on",
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Stop accepting on SIGTERM but let uploads in flight finish before gunicorn's hard kill
+        self.config.timeout_graceful_shutdown = max(self.cfg.graceful_timeout - 5, 1)
+
+
+def default_workers() -> int:
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def post_fork(server, worker):
+    # The app is preloaded in the master; pooled DB connections must not be shared with children
+    from .database import engine
+    from . import metrics
+
+    engine.dispose(close=False)
+    # dispose() replaced the pool, so re-wrap it for checkout-wait timing
+    metrics.instrument_pool(engine.pool)
+
+
+def build_options() -> dict:
+    return {
+        "bind": f"0.0.0.0:{os.getenv('PORT', '8000')}",
+        "workers": int(os.getenv("WEB_CONCURRENCY", default_workers())),
+        "worker_class": "backend.server.CuraNetWorker",
+        "preload_app": True,
+        "max_requests": int(os.getenv("MAX_REQUESTS", "1000")),
+        "max_requests_jitter": int(os.getenv("MAX_REQUESTS_JITTER", "100")),
+        "graceful_timeout": int(os.getenv("GRACEFUL_TIMEOUT", "120")),
+        "timeout": int(os.getenv("WORKER_TIMEOUT", "120")),
+        "keepalive": int(os.getenv("KEEPALIVE", "75")),
+        "accesslog": "-",
+        "errorlog": "-",
+        "post_fork": post_fork,
+    }
+
+
+class CuraNetApplication(BaseApplication):
+    def __init__(self, options: dict = None):
+        self.options = options or build_options()
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key.lower(), value)
+
+    def load(self):
+        from .main import app
+
+        return app
+
+
+def main():
+    CuraNetApplication().run()
+
+
+if __name__ == "__main__":
+    main()
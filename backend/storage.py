@@ -0,0 +1,231 @@
+"""
+Where report files are kept. Every backend stores opaque keys (see crud/stored_objects.py) and
+offers the same operations; STORAGE_BACKEND picks one at startup:
+
+    s3      S3 bucket (s3_service.S3Service); downloads go straight to S3 via presigned URLs
+    local   a directory tree on this machine, for offline use, CI and small on-prem clinics
+    mock    kept in memory and lost on restart (tests and demos)
+
+Unset, S3 is used when boto3 is installed and local storage otherwise. Backends without
+presigned URLs serve downloads through /reports/{id}/content.
+
+Configuration (environment):
+    STORAGE_BACKEND         s3, local or mock
+    LOCAL_STORAGE_ROOT      directory of the local backend (default ./storage)
+    LOCAL_STORAGE_FSYNC     fsync each file and its directory before a write counts as done (default on)
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, Optional
+from urllib.parse import quote
+import hashlib
+import importlib.util
+import os
+import tempfile
+import threading
+import time
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "")
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "./storage")
+LOCAL_STORAGE_FSYNC = os.getenv("LOCAL_STORAGE_FSYNC", "on") != "off"
+
+# Bytes per chunk when streaming an object out of storage
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Half-written files older than this, left in the local temp directory by a crash, are removed at startup
+STALE_TEMP_SECONDS = 3600
+
+
+class StorageObjectNotFound(Exception):
+    pass
+
+
+def content_disposition(file_name, disposition='attachment'):
+    """Content-Disposition with an ASCII fallback name and the exact name in RFC 5987 form"""
+    fallback = file_name.encode('ascii', 'replace').decode('ascii').replace('"', '').replace('?', '_')
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(file_name, safe='')}"
+
+
+class StorageBackend(ABC):
+    """
+    Operations every backend provides. Keys are opaque strings chosen by the caller (report
+    files are content-addressed, see crud/stored_objects.py)
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def put_file(self, file_key, file_content, content_type, content_encoding=None):
+        """Store the bytes under the key, replacing any object already there"""
+
+    @abstractmethod
+    def get_object(self, file_key, start=None, end=None, chunk_size=STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Iterator over the stored bytes (from start to end inclusive, when given) in chunks.
+        A missing object raises StorageObjectNotFound here, before anything is streamed.
+        """
+
+    @abstractmethod
+    def object_size(self, file_key) -> int:
+        pass
+
+    @abstractmethod
+    def delete_file(self, file_key):
+        """Delete the object; deleting a missing one succeeds"""
+
+    def generate_presigned_url(self, file_key, expiration=3600, file_name=None) -> Optional[str]:
+        """Direct download URL, or None when downloads must go through the app"""
+        return None
+
+    def local_path(self, file_key) -> Optional[str]:
+        """Path of the object on this machine, for serving it with the file APIs; None if not local"""
+        return None
+
+    def warm_up(self):
+        pass
+
+
+class LocalStorage(StorageBackend):
+    """
+    Objects as files under root, at <aa>/<bb>/<sha256 of the key>: keys never become paths
+    (no traversal, no odd characters) and the two-level fan-out keeps directories small.
+    Writes go to a temporary file that is renamed into place, so readers see a whole file or none.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str = LOCAL_STORAGE_ROOT, fsync: bool = LOCAL_STORAGE_FSYNC):
+        self.root = os.path.abspath(root)
+        self.fsync = fsync
+        self._temp_dir = os.path.join(self.root, ".tmp")
+        os.makedirs(self._temp_dir, exist_ok=True)
+        self._remove_stale_temp_files()
+
+    def _remove_stale_temp_files(self):
+        cutoff = time.time() - STALE_TEMP_SECONDS
+        for entry in os.scandir(self._temp_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def path_for(self, file_key) -> str:
+        digest = hashlib.sha256(file_key.encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def _fsync_directory(self, directory):
+        descriptor = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def put_file(self, file_key, file_content, content_type, content_encoding=None):
+        path = self.path_for(file_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Same filesystem as the target, so the rename below is atomic
+        descriptor, temporary = tempfile.mkstemp(dir=self._temp_dir)
+        try:
+            with os.fdopen(descriptor, "wb") as handle:
+                handle.write(file_content)
+                if self.fsync:
+                    handle.flush()
+                    os.fsync(handle.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except FileNotFoundError:
+                pass
+            raise
+        if self.fsync:
+            self._fsync_directory(os.path.dirname(path))
+
+    def get_object(self, file_key, start=None, end=None, chunk_size=STREAM_CHUNK_SIZE):
+        try:
+            handle = open(self.path_for(file_key), "rb")
+        except FileNotFoundError:
+            raise StorageObjectNotFound(file_key)
+
+        def chunks():
+            with handle:
+                if start:
+                    handle.seek(start)
+                remaining = None if end is None else end - (start or 0) + 1
+                while remaining is None or remaining > 0:
+                    chunk = handle.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+
+        return chunks()
+
+    def object_size(self, file_key):
+        try:
+            return os.stat(self.path_for(file_key)).st_size
+        except FileNotFoundError:
+            raise StorageObjectNotFound(file_key)
+
+    def delete_file(self, file_key):
+        try:
+            os.remove(self.path_for(file_key))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def local_path(self, file_key):
+        path = self.path_for(file_key)
+        return path if os.path.exists(path) else None
+
+
+class MockStorage(StorageBackend):
+    """Objects in a dict, so uploads can be read back within the process"""
+
+    name = "mock"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.objects: Dict[str, bytes] = {}
+
+    def put_file(self, file_key, file_content, content_type, content_encoding=None):
+        with self._lock:
+            self.objects[file_key] = bytes(file_content)
+
+    def get_object(self, file_key, start=None, end=None, chunk_size=STREAM_CHUNK_SIZE):
+        content = self.objects.get(file_key)
+        if content is None:
+            raise StorageObjectNotFound(file_key)
+        stop = len(content) if end is None else end + 1
+        return (content[offset:min(offset + chunk_size, stop)] for offset in range(start or 0, stop, chunk_size))
+
+    def object_size(self, file_key):
+        if file_key not in self.objects:
+            raise StorageObjectNotFound(file_key)
+        return len(self.objects[file_key])
+
+    def delete_file(self, file_key):
+        with self._lock:
+            self.objects.pop(file_key, None)
+        return True
+
+
+def create_storage(backend: str = STORAGE_BACKEND) -> StorageBackend:
+    backend = (backend or "").lower()
+    if not backend:
+        backend = "s3" if importlib.util.find_spec("boto3") is not None else "local"
+    if backend == "s3":
+        from .s3_service import S3Service
+
+        storage = S3Service()
+        print("✅ S3 storage configured (client is created on first use)")
+    elif backend == "local":
+        storage = LocalStorage()
+        print(f"✅ Local file storage at {storage.root}")
+    elif backend == "mock":
+        storage = MockStorage()
+        print("⚠️  Mock storage: report files are kept in memory and lost on restart")
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected s3, local or mock)")
+    return storage
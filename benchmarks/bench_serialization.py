@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for the hot list endpoints.
+
+For each endpoint the payload the crud layer produces is encoded two ways:
+  before - what FastAPI did with response_model: validate, jsonable_encoder, stdlib json
+  after  - what the handler does now: orjson for trusted dicts, a precompiled TypeAdapter for ORM rows
+
+No database is needed; rows are synthetic.
+
+    python benchmarks/bench_serialization.py --rows 1000 --repeat 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+from typing import List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from backend import schemas
+from backend.serializers import trusted_json, doctor_list_json
+
+
+def fastapi_default(adapter, content):
+    """Approximates fastapi.routing.serialize_response + JSONResponse.render"""
+    value = adapter.validate_python(content, from_attributes=True)
+    value = adapter.dump_python(value, mode="json")
+    value = jsonable_encoder(value)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def appointment_rows(n):
+    return [
+        {
+            "id": i,
+            "appointment_id": f"A{str(i).zfill(6)}",
+            "appointment_time": "2025-03-14 09:30",
+            "patient_id": f"P{str(i % 500).zfill(6)}",
+            "patient_name": f"Patient {i % 500}",
+            "doctor_name": f"Doctor {i % 40}",
+            "status": "pending",
+        }
+        for i in range(n)
+    ]
+
+
+def dashboard_rows(n):
+    return {
+        "appointments": [
+            {
+                "appointment_id": f"A{i:05d}",
+                "date_time": "2025-03-14 09:30:00",
+                "patient_id": f"P{i % 500:05d}",
+                "patient_name": f"Patient {i % 500}",
+                "status": "confirmed",
+            }
+            for i in range(n)
+        ]
+    }
+
+
+def doctor_orm_rows(n):
+    return [
+        SimpleNamespace(
+            id=i,
+            name=f"Doctor {i}",
+            department="Cardiology",
+            description="Consultant with twenty years of clinical experience. " * 3,
+            image_url="https://placehold.co/300x200",
+        )
+        for i in range(n)
+    ]
+
+
+ENDPOINTS = [
+    (
+        "/admin/appointments-list",
+        TypeAdapter(List[schemas.AdminAppointmentResponse]),
+        appointment_rows,
+        lambda content: trusted_json(content).body,
+    ),
+    (
+        "/doctor/appointments/{username}",
+        TypeAdapter(schemas.DoctorDashboardResponse),
+        dashboard_rows,
+        lambda content: trusted_json(content).body,
+    ),
+    (
+        "/api/doctors",
+        TypeAdapter(List[schemas.DoctorResponse]),
+        doctor_orm_rows,
+        lambda content: doctor_list_json(content).body,
+    ),
+]
+
+
+def timed(fn, content, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<36}{'rows':>7}{'before ms':>12}{'after ms':>11}{'speedup':>9}")
+    for path, adapter, build, after in ENDPOINTS:
+        content = build(args.rows)
+        assert json.loads(after(content)) == json.loads(fastapi_default(adapter, content))
+        before_s = timed(lambda c: fastapi_default(adapter, c), content, args.repeat)
+        after_s = timed(after, content, args.repeat)
+        print(f"{path:<36}{args.rows:>7}{before_s * 1000:>12.3f}{after_s * 1000:>11.3f}{before_s / after_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Concurrent booking benchmark: hundreds of parallel POST /admin/appointment requests
+aimed at a handful of doctor/slot pairs.
+
+Checks that exactly one booking per slot succeeds, that every loser gets a 409
+with a nearest-free-slot suggestion, and that the database holds no double
+bookings afterwards. Reports throughput and latency percentiles.
+
+By default the app runs in-process on a fresh SQLite file (WAL); --database-url
+points it at another database and --url at a running server instead.
+
+    python benchmarks/booking_concurrency.py --requests 500 --concurrency 100 --slots 10
+    python benchmarks/booking_concurrency.py --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+SLOTS = ["09:00", "09:30", "10:00", "10:30", "11:00", "11:30", "14:00", "14:30", "15:00", "15:30", "16:00", "16:30", "17:00"]
+
+
+def seed_in_process(doctors: int, patients: int):
+    """Make sure the in-process database has enough doctors and patients"""
+    from backend import models
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        have_doctors = db.query(models.Doctor).count()
+        have_patients = db.query(models.Patient).count()
+        for i in range(have_doctors, doctors):
+            db.add(models.Doctor(
+                name=f"Bench Doctor {i}", phone=f"+9{i:011d}", email=f"bench.doctor{i}@curanet.example",
+                password="password", department="General Medicine", description="Benchmark doctor",
+            ))
+        for i in range(have_patients, patients):
+            db.add(models.Patient(
+                name=f"Bench Patient {i}", phone=f"+8{i:011d}", email=f"bench.patient{i}@curanet.example",
+                password="password", age=40, blood_group="O+", medical_history="None",
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_double_bookings_in_process() -> int:
+    from sqlalchemy import func
+    from backend import models
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        duplicates = db.query(models.Appointment.doctor_id, models.Appointment.appointment_time)\
+            .filter(models.Appointment.status != "cancelled")\
+            .group_by(models.Appointment.doctor_id, models.Appointment.appointment_time)\
+            .having(func.count(models.Appointment.id) > 1)\
+            .all()
+        return len(duplicates)
+    finally:
+        db.close()
+
+
+async def count_double_bookings_remote(client) -> int:
+    appointments = (await client.get("/admin/appointments-list")).json()
+    per_slot = Counter(
+        (a["doctor_name"], a["appointment_time"]) for a in appointments if a["status"] != "cancelled"
+    )
+    return sum(1 for count in per_slot.values() if count > 1)
+
+
+def pick_targets(doctor_ids, n_slots: int, rng, day: date):
+    """Free-looking (doctor, slot) pairs on one future weekday"""
+    pairs = [(doctor_id, f"{day.isoformat()} {slot}") for doctor_id in doctor_ids for slot in SLOTS]
+    rng.shuffle(pairs)
+    return pairs[:n_slots]
+
+
+async def book(client, semaphore, target, patient_id, results):
+    doctor_id, when = target
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            response = await client.post("/admin/appointment", json={
+                "patient_id": patient_id, "doctor_id": doctor_id, "appointment_time": when, "status": "pending",
+            })
+            status = response.status_code
+            body = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+        except httpx.HTTPError as e:
+            status, body = f"error:{type(e).__name__}", {}
+        results.append((target, status, body, time.perf_counter() - start))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run(args):
+    if args.url:
+        transport, base_url = None, args.url
+    else:
+        from backend.main import app  # creates the SQLite schema
+
+        seed_in_process(args.doctors, args.patients)
+
+        transport, base_url = httpx.ASGITransport(app=app), "http://curanet.local"
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=120) as client:
+        ids = (await client.get("/check-ids")).json()
+        doctor_ids = [d["id"] for d in ids["doctors"]]
+        patient_ids = [p["id"] for p in ids["patients"]]
+        if not doctor_ids or not patient_ids:
+            raise SystemExit("Need at least one doctor and one patient")
+
+        rng = random.Random(args.seed)
+        day = date.today() + timedelta(days=args.days_ahead)
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        targets = pick_targets(doctor_ids, args.slots, rng, day)
+
+        # Slots that were already taken before the run cannot be won by anyone
+        already_taken = set()
+        for doctor_id in {t[0] for t in targets}:
+            availability = (await client.get(f"/doctor/availability/{doctor_id}?date={day.isoformat()}")).json()
+            for slot in availability.get("booked_slots", []):
+                already_taken.add((doctor_id, f"{day.isoformat()} {slot}"))
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        results = []
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            book(client, semaphore, targets[i % len(targets)], rng.choice(patient_ids), results)
+            for i in range(args.requests)
+        ])
+        elapsed = time.perf_counter() - start
+
+        if args.url:
+            double_bookings = await count_double_bookings_remote(client)
+        else:
+            double_bookings = count_double_bookings_in_process()
+
+    statuses = Counter(status for _, status, _, _ in results)
+    wins = defaultdict(int)
+    for target, status, _, _ in results:
+        if status == 200:
+            wins[target] += 1
+    conflicts = [body for _, status, body, _ in results if status == 409]
+    with_suggestion = sum(1 for body in conflicts if body.get("detail", {}).get("nearest_free_slot"))
+    latencies = sorted(latency for _, _, _, latency in results)
+
+    print(f"\n{args.requests} bookings on {len(targets)} slots ({day.isoformat()}), concurrency {args.concurrency}")
+    print(f"  elapsed      {elapsed:.2f} s  ({args.requests / elapsed:.1f} req/s)")
+    print(f"  latency      p50 {percentile(latencies, 50) * 1000:.1f} ms   p95 {percentile(latencies, 95) * 1000:.1f} ms"
+          f"   p99 {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"  statuses     {dict(statuses)}")
+    print(f"  409s with a nearest-free-slot suggestion: {with_suggestion}/{len(conflicts)}")
+
+    failures = []
+    over_booked = [target for target, count in wins.items() if count > 1]
+    if over_booked:
+        failures.append(f"{len(over_booked)} slots accepted more than one booking")
+    unclaimed = [t for t in targets if t not in already_taken and wins.get(t, 0) != 1]
+    if unclaimed:
+        failures.append(f"{len(unclaimed)} free slots did not end with exactly one booking")
+    if double_bookings:
+        failures.append(f"{double_bookings} double-booked doctor/time pairs in the database")
+    unexpected = {status: count for status, count in statuses.items() if status not in (200, 409)}
+    if unexpected:
+        failures.append(f"unexpected responses {unexpected}")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        return 1
+    print("✅ zero double bookings")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--database-url", help="database for the in-process app (default: a fresh SQLite file)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--slots", type=int, default=10, help="distinct doctor/slot pairs competed for")
+    parser.add_argument("--doctors", type=int, default=5, help="doctors to seed in-process if missing")
+    parser.add_argument("--patients", type=int, default=50, help="patients to seed in-process if missing")
+    parser.add_argument("--days-ahead", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not args.url:
+        # Must be set before backend.database is imported
+        os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(
+            tempfile.mkdtemp(prefix="curanet-bench-"), "booking.db"
+        )
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic hospital dataset for benchmarks.
+
+Writes patients, doctors, admins, appointments, medical sessions with vitals,
+symptoms, prescriptions, diagnoses and treatment plans, and medical report rows
+through the tables in backend/models.py using batched Core executemany inserts
+with pre-assigned primary keys (no per-row ORM flush, no RETURNING round trips).
+
+Distributions:
+  - appointments land on the official half-hour slots (mornings busier), weekdays only,
+    with a few off-grid walk-ins; no doctor is double-booked
+  - visits per patient follow a Pareto distribution, so a long tail of heavy patients
+    has hundreds of appointments; doctor popularity is skewed the same way
+  - past appointments are mostly completed (each with a charted session), future ones
+    pending/confirmed
+
+Scale 1.0 is ~100k patients, 1k doctors and ~10M rows in total. The same --seed, --today and
+arguments always produce the same rows. Keys continue from the current maximum
+ids, so repeated loads append. Every user's password is "password"
+(benchmarks/load_test.py logs in with it).
+
+    python benchmarks/generate_dataset.py --scale 0.1 --create-tables
+    python benchmarks/generate_dataset.py --scale 1 --seed 7 --batch-size 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+from sqlalchemy import create_engine, func, select
+
+from backend import models
+
+PASSWORD = "password"
+
+SLOTS = [
+    "09:00", "09:30", "10:00", "10:30", "11:00", "11:30",
+    "14:00", "14:30", "15:00", "15:30", "16:00", "16:30", "17:00"
+]
+SLOT_MINUTES = [int(slot[:2]) * 60 + int(slot[3:]) for slot in SLOTS]
+SLOT_WEIGHTS = [9, 10, 10, 9, 8, 6, 7, 7, 6, 6, 5, 4, 3]
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Aarav", "Priya", "Wei", "Mei", "Omar", "Fatima", "Carlos", "Sofia", "Kenji", "Yuki",
+    "Ahmed", "Aisha", "Ivan", "Olga", "Lucas", "Emma", "Noah", "Olivia", "Liam", "Ava",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Patel", "Sharma", "Chen", "Wang", "Khan", "Ali", "Silva", "Santos", "Tanaka", "Sato",
+    "Kim", "Park", "Nguyen", "Ivanov", "Müller", "Schmidt", "Rossi", "Dubois", "O'Brien", "Cohen",
+]
+DEPARTMENTS = [
+    "Cardiology", "Dermatology", "Neurology", "Orthopedics", "Pediatrics", "General Medicine",
+    "Gynecology", "Psychiatry", "Ophthalmology", "ENT", "Oncology", "Urology",
+]
+BLOOD_GROUPS = ["O+", "A+", "B+", "AB+", "O-", "A-", "B-", "AB-"]
+BLOOD_GROUP_WEIGHTS = [37, 30, 9, 4, 7, 6, 2, 1]
+HISTORY_SNIPPETS = [
+    "None", "Hypertension", "Type 2 diabetes", "Asthma", "Seasonal allergies", "Migraine",
+    "Hypothyroidism", "High cholesterol", "Appendectomy (2015)", "Penicillin allergy",
+]
+SYMPTOMS = [
+    "Headache", "Fever", "Cough", "Fatigue", "Chest pain", "Shortness of breath", "Back pain",
+    "Nausea", "Dizziness", "Joint pain", "Sore throat", "Abdominal pain", "Rash", "Insomnia",
+]
+MEDICATIONS = [
+    ("Paracetamol", "500mg"), ("Ibuprofen", "400mg"), ("Amoxicillin", "500mg"), ("Metformin", "850mg"),
+    ("Lisinopril", "10mg"), ("Atorvastatin", "20mg"), ("Omeprazole", "20mg"), ("Cetirizine", "10mg"),
+    ("Salbutamol inhaler", "100mcg"), ("Levothyroxine", "50mcg"),
+]
+FREQUENCIES = ["Once daily", "Twice daily", "Three times daily", "As needed"]
+DURATIONS = ["3 days", "5 days", "7 days", "14 days", "30 days", "Ongoing"]
+DIAGNOSES = [
+    ("J06.9", "Acute upper respiratory infection"), ("I10", "Essential hypertension"),
+    ("E11.9", "Type 2 diabetes mellitus"), ("M54.5", "Low back pain"), ("R51", "Headache"),
+    ("J45.909", "Asthma, uncomplicated"), ("K21.9", "Gastro-esophageal reflux disease"),
+    ("L30.9", "Dermatitis"), ("F41.1", "Generalized anxiety disorder"), ("G43.909", "Migraine"),
+]
+REPORT_TYPES = [
+    ("blood_test.pdf", "application/pdf"), ("xray.png", "image/png"), ("mri_scan.jpg", "image/jpeg"),
+    ("ecg.pdf", "application/pdf"), ("discharge_summary.pdf", "application/pdf"),
+]
+
+# Parent tables first: buffers are flushed in this order inside one transaction
+TABLES = [
+    models.Doctor.__table__, models.Patient.__table__, models.Admin.__table__,
+    models.Appointment.__table__, models.MedicalSession.__table__,
+    models.VitalSign.__table__, models.Symptom.__table__, models.Prescription.__table__,
+    models.Diagnosis.__table__, models.TreatmentPlan.__table__, models.MedicalReport.__table__,
+]
+
+
+class BulkLoader:
+    """Buffers rows per table and flushes all buffers together, parents first"""
+
+    def __init__(self, engine, batch_size: int):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.buffers = {table.name: [] for table in TABLES}
+        self.totals = {table.name: 0 for table in TABLES}
+        self.pending = 0
+
+    def add(self, table, row: dict):
+        self.buffers[table.name].append(row)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.engine.begin() as conn:
+            for table in TABLES:
+                rows = self.buffers[table.name]
+                if rows:
+                    conn.execute(table.insert(), rows)
+                    self.totals[table.name] += len(rows)
+                    self.buffers[table.name] = []
+        self.pending = 0
+
+
+def next_ids(engine) -> dict:
+    """First free primary key per table, so generated rows can reference each other before insert"""
+    ids = {}
+    with engine.connect() as conn:
+        for table in TABLES:
+            pk = list(table.primary_key.columns)[0]
+            ids[table.name] = (conn.execute(select(func.max(pk))).scalar() or 0) + 1
+    return ids
+
+
+def person_name(rng) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def pareto_weights(rng, n: int, alpha: float):
+    return [rng.paretovariate(alpha) for _ in range(n)]
+
+
+def generate(engine, args):
+    rng = random.Random(args.seed)
+    n_doctors = max(int(1_000 * args.scale), 5)
+    n_patients = max(int(100_000 * args.scale), 10)
+    loader = BulkLoader(engine, args.batch_size)
+    ids = next_ids(engine)
+
+    if args.today:
+        today = datetime.strptime(args.today, "%Y-%m-%d")
+    else:
+        today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    first_day = today - timedelta(days=args.history_days)
+    workdays = [
+        first_day + timedelta(days=offset)
+        for offset in range(args.history_days + args.future_days + 1)
+        if (first_day + timedelta(days=offset)).weekday() < 5
+    ]
+
+    # Doctors
+    doctor_ids = []
+    for i in range(n_doctors):
+        doctor_id = ids["doctors"] + i
+        department = DEPARTMENTS[i % len(DEPARTMENTS)]
+        doctor_ids.append(doctor_id)
+        loader.add(models.Doctor.__table__, {
+            "id": doctor_id,
+            "name": person_name(rng),
+            "phone": f"+2{doctor_id:012d}",
+            "email": f"doctor{doctor_id}@curanet.example",
+            "password": PASSWORD,
+            "department": department,
+            "description": f"{department} specialist with {rng.randint(2, 35)} years of experience.",
+            "image_url": "https://placehold.co/300x200",
+        })
+    doctor_cum_weights = []
+    running = 0.0
+    for weight in pareto_weights(rng, n_doctors, 1.5):
+        running += weight
+        doctor_cum_weights.append(running)
+
+    for i in range(args.admins):
+        loader.add(models.Admin.__table__, {
+            "id": ids["admins"] + i,
+            "name": f"Admin {person_name(rng)}",
+            "phone": f"+3{ids['admins'] + i:012d}",
+            "email": f"admin{ids['admins'] + i}@curanet.example",
+            "password": PASSWORD,
+            "department": "Administration",
+        })
+
+    booked = set()  # (doctor, day, minute) packed into one int
+    appointment_id = ids["appointments"]
+    session_id = ids["medical_sessions"]
+    child_ids = {name: ids[name] for name in ("vital_signs", "symptoms", "prescriptions", "diagnoses", "treatment_plans", "medical_reports")}
+
+    def take(table_name: str) -> int:
+        value = child_ids[table_name]
+        child_ids[table_name] += 1
+        return value
+
+    started = time.perf_counter()
+    for i in range(n_patients):
+        patient_id = ids["patients"] + i
+        loader.add(models.Patient.__table__, {
+            "id": patient_id,
+            "name": person_name(rng),
+            "phone": f"+1{patient_id:012d}",
+            "email": f"patient{patient_id}@curanet.example",
+            "password": PASSWORD,
+            "age": rng.randint(1, 95),
+            "blood_group": rng.choices(BLOOD_GROUPS, BLOOD_GROUP_WEIGHTS)[0],
+            "medical_history": ", ".join(rng.sample(HISTORY_SNIPPETS, rng.randint(1, 3))),
+        })
+
+        visits = min(int(rng.paretovariate(args.heavy_tail_alpha) * args.visits_base), args.max_visits)
+        primary_doctors = rng.choices(doctor_ids, cum_weights=doctor_cum_weights, k=2)
+        for _ in range(visits):
+            if rng.random() < 0.7:
+                doctor_id = rng.choice(primary_doctors)
+            else:
+                doctor_id = rng.choices(doctor_ids, cum_weights=doctor_cum_weights)[0]
+
+            appointment_time = None
+            for _attempt in range(6):
+                day_index = rng.randrange(len(workdays))
+                if rng.random() < args.off_grid:
+                    minute = rng.randrange(8 * 60, 18 * 60, 5)
+                else:
+                    minute = rng.choices(SLOT_MINUTES, SLOT_WEIGHTS)[0]
+                key = (doctor_id * 100_000 + day_index) * 1440 + minute
+                if key not in booked:
+                    booked.add(key)
+                    appointment_time = workdays[day_index] + timedelta(minutes=minute)
+                    break
+            if appointment_time is None:
+                continue
+
+            past = appointment_time < today
+            if past:
+                status = rng.choices(["completed", "cancelled", "pending"], [82, 14, 4])[0]
+            else:
+                status = rng.choices(["pending", "confirmed", "cancelled"], [55, 38, 7])[0]
+            loader.add(models.Appointment.__table__, {
+                "id": appointment_id,
+                "patient_id": patient_id,
+                "doctor_id": doctor_id,
+                "appointment_time": appointment_time,
+                "status": status,
+                "booked_slot": None if status == "cancelled" else appointment_time,
+            })
+
+            if status == "completed":
+                add_session(loader, rng, session_id, appointment_id, patient_id, doctor_id, appointment_time, take)
+                session_id += 1
+            appointment_id += 1
+
+        if (i + 1) % 10_000 == 0:
+            loader.flush()
+            elapsed = time.perf_counter() - started
+            rows = sum(loader.totals.values())
+            print(f"  {i + 1:,}/{n_patients:,} patients, {rows:,} rows ({rows / elapsed:,.0f} rows/s)")
+
+    loader.flush()
+    return loader.totals, time.perf_counter() - started
+
+
+def add_session(loader, rng, session_id, appointment_id, patient_id, doctor_id, when, take):
+    complaint = rng.choice(SYMPTOMS)
+    loader.add(models.MedicalSession.__table__, {
+        "session_id": session_id,
+        "appointment_id": appointment_id,
+        "patient_id": patient_id,
+        "doctor_id": doctor_id,
+        "session_date": when,
+        "status": "completed",
+        "chief_complaint": complaint,
+        "session_notes": f"Patient presented with {complaint.lower()}.",
+        "created_at": when,
+        "updated_at": when + timedelta(minutes=25),
+    })
+    loader.add(models.VitalSign.__table__, {
+        "vital_id": take("vital_signs"),
+        "session_id": session_id,
+        "blood_pressure_systolic": rng.randint(100, 160),
+        "blood_pressure_diastolic": rng.randint(60, 100),
+        "heart_rate": rng.randint(55, 110),
+        "temperature": round(rng.gauss(36.9, 0.5), 1),
+        "respiratory_rate": rng.randint(12, 22),
+        "oxygen_saturation": rng.randint(92, 100),
+        "weight": round(rng.uniform(45, 120), 1),
+        "height": round(rng.uniform(150, 195), 1),
+        "recorded_at": when + timedelta(minutes=5),
+    })
+    for symptom in [complaint] + rng.sample(SYMPTOMS, rng.randint(0, 2)):
+        loader.add(models.Symptom.__table__, {
+            "symptom_id": take("symptoms"),
+            "session_id": session_id,
+            "symptom_description": symptom,
+            "severity": rng.choices(["mild", "moderate", "severe"], [5, 4, 1])[0],
+            "duration": f"{rng.randint(1, 14)} days",
+            "notes": None,
+            "recorded_at": when + timedelta(minutes=8),
+        })
+    for _ in range(rng.choices([0, 1, 2, 3], [2, 4, 3, 1])[0]):
+        medication, dosage = rng.choice(MEDICATIONS)
+        loader.add(models.Prescription.__table__, {
+            "prescription_id": take("prescriptions"),
+            "session_id": session_id,
+            "medication_name": medication,
+            "dosage": dosage,
+            "frequency": rng.choice(FREQUENCIES),
+            "duration": rng.choice(DURATIONS),
+            "instructions": "Take after meals" if rng.random() < 0.4 else None,
+            "prescribed_date": when + timedelta(minutes=20),
+        })
+    for index in range(rng.choices([1, 2], [7, 3])[0]):
+        code, description = rng.choice(DIAGNOSES)
+        loader.add(models.Diagnosis.__table__, {
+            "diagnosis_id": take("diagnoses"),
+            "session_id": session_id,
+            "diagnosis_code": code,
+            "diagnosis_description": description,
+            "diagnosis_type": "primary" if index == 0 else "secondary",
+            "confidence_level": rng.choice(["confirmed", "probable", "possible"]),
+            "notes": None,
+            "diagnosed_at": when + timedelta(minutes=15),
+        })
+    if rng.random() < 0.3:
+        loader.add(models.TreatmentPlan.__table__, {
+            "plan_id": take("treatment_plans"),
+            "session_id": session_id,
+            "treatment_description": "Follow-up and medication review",
+            "start_date": when,
+            "end_date": when + timedelta(days=rng.randint(7, 90)),
+            "status": "completed",
+            "follow_up_required": rng.random() < 0.5,
+            "follow_up_date": when + timedelta(days=rng.randint(7, 30)),
+            "notes": None,
+            "created_at": when + timedelta(minutes=22),
+        })
+    if rng.random() < 0.15:
+        report_name, content_type = rng.choice(REPORT_TYPES)
+        report_id = take("medical_reports")
+        loader.add(models.MedicalReport.__table__, {
+            "report_id": report_id,
+            "patient_id": patient_id,
+            "doctor_id": doctor_id,
+            "session_id": session_id,
+            "report_name": report_name,
+            "file_key": f"synthetic/patient_{patient_id}/doctor_{doctor_id}/{report_id}_{report_name}",
+            "file_size": int(rng.lognormvariate(12, 1.2)),
+            "content_type": content_type,
+            "uploaded_at": when + timedelta(hours=rng.randint(1, 72)),
+            "shared_with": None,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.01, help="1.0 = 100k patients, 1k doctors, ~10M rows")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10_000, help="rows buffered before each insert round")
+    parser.add_argument("--today", help="YYYY-MM-DD the history/future split is anchored on (default: today)")
+    parser.add_argument("--history-days", type=int, default=730)
+    parser.add_argument("--future-days", type=int, default=60)
+    parser.add_argument("--visits-base", type=float, default=4.0, help="Pareto scale of visits per patient")
+    parser.add_argument("--heavy-tail-alpha", type=float, default=1.3, help="smaller = heavier tail of frequent patients")
+    parser.add_argument("--max-visits", type=int, default=400)
+    parser.add_argument("--off-grid", type=float, default=0.02, help="share of walk-ins outside the official slots")
+    parser.add_argument("--admins", type=int, default=3)
+    parser.add_argument("--database-url", help="defaults to the application's database")
+    parser.add_argument("--create-tables", action="store_true", help="create missing tables first")
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from backend.database import engine
+    if args.create_tables:
+        models.Base.metadata.create_all(bind=engine)
+
+    print(f"Generating scale {args.scale} dataset (seed {args.seed}) into {engine.url.render_as_string(hide_password=True)}")
+    totals, elapsed = generate(engine, args)
+    print()
+    for table, count in totals.items():
+        print(f"  {table:<20}{count:>12,}")
+    total = sum(totals.values())
+    print(f"\n✅ {total:,} rows in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
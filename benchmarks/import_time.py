@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Import-time report for the API process.
+
+Runs `python -X importtime -c "import backend.main"` in a fresh interpreter and
+summarizes the raw trace: total time, the slowest top-level packages and the
+slowest individual modules. Exits non-zero when the total exceeds the budget or
+a module listed in --forbid is imported at startup, so CI can track cold start.
+
+    python benchmarks/import_time.py --budget-ms 1500 --forbid boto3,botocore
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+
+def run_importtime(module: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_root,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return result.stderr
+
+
+def parse_importtime(trace: str):
+    """Return (module, self_us, cumulative_us, depth) for every line of the trace"""
+    rows = []
+    for line in trace.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|", 2)
+        # Nesting is encoded as two extra spaces per level after the single separator space
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def summarize(rows, top: int) -> dict:
+    # Top-level imports (depth 0) carry the cumulative time of everything below them
+    total_us = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    slowest_modules = sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "modules_imported": len(rows),
+        "packages": [
+            {"package": package, "self_ms": round(us / 1000, 1)}
+            for package, us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+        "modules": [
+            {"module": name, "self_ms": round(self_us / 1000, 1), "cumulative_ms": round(cumulative_us / 1000, 1)}
+            for name, self_us, cumulative_us, _ in slowest_modules
+        ],
+        "imported": sorted({name for name, _, _, _ in rows}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "0")),
+                        help="fail when total import time exceeds this (0 disables)")
+    parser.add_argument("--forbid", default=os.getenv("IMPORT_FORBID", "boto3,botocore"),
+                        help="comma-separated top-level packages that must not be imported at startup")
+    parser.add_argument("--repeat", type=int, default=3, help="runs to take the fastest of")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summaries = [summarize(parse_importtime(run_importtime(args.module)), args.top) for _ in range(args.repeat)]
+    summary = min(summaries, key=lambda s: s["total_ms"])
+    imported_packages = {name.split(".")[0] for name in summary.pop("imported")}
+    forbidden = [name for name in args.forbid.split(",") if name and name in imported_packages]
+
+    if args.json:
+        print(json.dumps({**summary, "forbidden_imported": forbidden, "budget_ms": args.budget_ms}, indent=2))
+    else:
+        print(f"import {args.module}: {summary['total_ms']} ms, {summary['modules_imported']} modules")
+        print("\nSlowest packages (self time):")
+        for row in summary["packages"]:
+            print(f"  {row['package']:<30}{row['self_ms']:>9.1f} ms")
+        print("\nSlowest modules (self / cumulative):")
+        for row in summary["modules"]:
+            print(f"  {row['module']:<45}{row['self_ms']:>9.1f}{row['cumulative_ms']:>11.1f} ms")
+
+    failed = False
+    if forbidden:
+        print(f"\n❌ Imported at startup but should be lazy: {', '.join(forbidden)}")
+        failed = True
+    if args.budget_ms and summary["total_ms"] > args.budget_ms:
+        print(f"\n❌ Import time {summary['total_ms']} ms exceeds budget {args.budget_ms} ms")
+        failed = True
+    if not failed:
+        print("\n✅ Import-time budget met")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
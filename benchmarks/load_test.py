@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+HTTP load harness for the hot user journeys.
+
+Drives the app in-process through httpx's ASGI transport (default) or a running
+server (--url), with N concurrent virtual users looping over weighted journeys:
+
+  login             POST /login
+  patient           patient dashboard, profile, medical history
+  doctor            doctor dashboard header, upcoming and all appointments, patients, profile
+  admin             counters and the admin doctor/patient/appointment lists
+  availability      doctor availability lookups for the coming days
+  charting          start a session, record vitals/symptoms/prescription, read it back (writes!)
+
+Test users are --fixtures patients and doctors sampled across the whole id range via
+/check-ids?sample=N; logins use --password (the synthetic dataset generator gives every user
+"password").
+
+Reports throughput and p50/p95/p99 per route template and writes a JSON baseline
+that a later run can be compared against:
+
+    python benchmarks/load_test.py --users 20 --duration 30 --output baseline.json
+    python benchmarks/load_test.py --users 20 --duration 30 --compare baseline.json --fail-on-regression 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import httpx
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+JOURNEY_WEIGHTS = {
+    "login": 1,
+    "patient": 4,
+    "doctor": 4,
+    "admin": 1,
+    "availability": 3,
+    "charting": 1,
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route: str, seconds: float, ok: bool):
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+
+
+class Fixtures:
+    """Users and ids the journeys run against"""
+
+    def __init__(self, patients, doctors, password):
+        self.patients = patients  # [{"id", "name", "email"}]
+        self.doctors = doctors  # [{"id", "name"}]
+        self.password = password
+
+
+async def timed(client, recorder, route, method, url, ok_statuses=(200,), **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok = response.status_code in ok_statuses
+    except httpx.HTTPError:
+        response, ok = None, False
+    recorder.record(route, time.perf_counter() - start, ok)
+    return response
+
+
+async def journey_login(client, recorder, fx, rng):
+    patient = rng.choice(fx.patients)
+    await timed(client, recorder, "/login", "POST", "/login", json={
+        "identifier": patient["email"], "password": fx.password, "user_type": "patient",
+    })
+
+
+async def journey_patient(client, recorder, fx, rng):
+    name = rng.choice(fx.patients)["name"]
+    await timed(client, recorder, "/patient/dashboard-info/{username}", "GET", f"/patient/dashboard-info/{name}")
+    await timed(client, recorder, "/patient/profile/{username}", "GET", f"/patient/profile/{name}")
+    await timed(client, recorder, "/patient/medical-history/{username}", "GET", f"/patient/medical-history/{name}")
+
+
+async def journey_doctor(client, recorder, fx, rng):
+    name = rng.choice(fx.doctors)["name"]
+    await timed(client, recorder, "/doctor/dashboard-info/{username}", "GET", f"/doctor/dashboard-info/{name}")
+    await timed(client, recorder, "/doctor/appointments/{username}", "GET", f"/doctor/appointments/{name}")
+    await timed(client, recorder, "/doctor/profile/{username}", "GET", f"/doctor/profile/{name}")
+    await timed(client, recorder, "/doctor/all-appointments/{username}", "GET", f"/doctor/all-appointments/{name}")
+    await timed(client, recorder, "/doctor/patients/{username}", "GET", f"/doctor/patients/{name}")
+
+
+async def journey_admin(client, recorder, fx, rng):
+    await timed(client, recorder, "/admin/dashboard-counters", "GET", "/admin/dashboard-counters")
+    await timed(client, recorder, "/admin/doctors-list", "GET", "/admin/doctors-list")
+    await timed(client, recorder, "/admin/patients-list", "GET", "/admin/patients-list")
+    await timed(client, recorder, "/admin/appointments-list", "GET", "/admin/appointments-list")
+
+
+async def journey_availability(client, recorder, fx, rng):
+    doctor_id = rng.choice(fx.doctors)["id"]
+    for offset in range(3):
+        day = (date.today() + timedelta(days=offset + rng.randint(0, 14))).isoformat()
+        await timed(client, recorder, "/doctor/availability/{doctor_id}", "GET",
+                    f"/doctor/availability/{doctor_id}?date={day}")
+
+
+async def journey_charting(client, recorder, fx, rng):
+    name = rng.choice(fx.doctors)["name"]
+    response = await timed(client, recorder, "/doctor/all-appointments/{username}", "GET", f"/doctor/all-appointments/{name}")
+    if response is None or response.status_code != 200:
+        return
+    appointments = response.json().get("appointments", [])
+    if not appointments:
+        return
+    appointment_id = int(rng.choice(appointments)["appointment_id"].lstrip("A"))
+    response = await timed(client, recorder, "/appointments/{appointment_id}/start-session", "POST",
+                           f"/appointments/{appointment_id}/start-session")
+    if response is None or response.status_code != 200:
+        return
+    session_id = response.json()["session_id"]
+    await timed(client, recorder, "/medical-sessions/{session_id}/vital-signs", "POST",
+                f"/medical-sessions/{session_id}/vital-signs", json={
+                    "blood_pressure_systolic": rng.randint(100, 150), "blood_pressure_diastolic": rng.randint(60, 95),
+                    "heart_rate": rng.randint(55, 110), "temperature": round(rng.uniform(36.1, 38.5), 1),
+                })
+    await timed(client, recorder, "/medical-sessions/{session_id}/symptoms", "POST",
+                f"/medical-sessions/{session_id}/symptoms", json={
+                    "symptom_description": "Headache", "severity": rng.choice(["mild", "moderate", "severe"]),
+                })
+    await timed(client, recorder, "/medical-sessions/{session_id}/prescriptions", "POST",
+                f"/medical-sessions/{session_id}/prescriptions", json={
+                    "medication_name": "Paracetamol", "dosage": "500mg", "frequency": "Twice daily", "duration": "5 days",
+                })
+    await timed(client, recorder, "/medical-sessions/{session_id}", "GET", f"/medical-sessions/{session_id}")
+
+
+JOURNEYS = {
+    "login": journey_login,
+    "patient": journey_patient,
+    "doctor": journey_doctor,
+    "admin": journey_admin,
+    "availability": journey_availability,
+    "charting": journey_charting,
+}
+
+
+async def discover_fixtures(client, password: str, count: int, seed: int) -> Fixtures:
+    # Sampled across the whole id range, so a large dataset is not exercised through a few hot users
+    response = await client.get("/check-ids", params={"sample": count, "seed": seed})
+    response.raise_for_status()
+    ids = response.json()
+    if "error" in ids or not ids.get("patients") or not ids.get("doctors"):
+        raise SystemExit(f"No test users found via /check-ids: {ids}. Seed the database first.")
+    print(f"Fixtures: {len(ids['patients'])} of {ids['total_patients']:,} patients, "
+          f"{len(ids['doctors'])} of {ids['total_doctors']:,} doctors")
+    return Fixtures(ids["patients"], ids["doctors"], password)
+
+
+async def virtual_user(client, recorder, fx, journeys, deadline, iterations, seed):
+    rng = random.Random(seed)
+    names = list(journeys)
+    weights = [journeys[name] for name in names]
+    done = 0
+    while time.perf_counter() < deadline and (not iterations or done < iterations):
+        await JOURNEYS[rng.choices(names, weights)[0]](client, recorder, fx, rng)
+        done += 1
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    for route, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        routes[route] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(route, 0),
+            "rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "total_requests": total,
+        "total_errors": sum(route["errors"] for route in routes.values()),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "routes": routes,
+    }
+
+
+def print_report(summary: dict):
+    print(f"\n{summary['total_requests']} requests in {summary['elapsed_s']} s "
+          f"({summary['throughput_rps']} req/s, {summary['total_errors']} errors)\n")
+    print(f"{'route':<50}{'reqs':>7}{'err':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for route, row in summary["routes"].items():
+        print(f"{route:<50}{row['requests']:>7}{row['errors']:>5}{row['rps']:>8}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}")
+
+
+def compare(summary: dict, baseline: dict, fail_pct: float) -> bool:
+    """Print p95 deltas against a baseline; return True when any route regressed beyond fail_pct"""
+    print(f"\nCompared with baseline from {baseline.get('generated_at', 'unknown')}:")
+    print(f"{'route':<50}{'p95 before':>12}{'p95 now':>10}{'change':>9}")
+    regressed = False
+    for route, row in summary["routes"].items():
+        old = baseline.get("routes", {}).get(route)
+        if not old or not old["p95_ms"]:
+            continue
+        change = (row["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+        flag = ""
+        if fail_pct and change > fail_pct:
+            regressed = True
+            flag = "  ❌"
+        print(f"{route:<50}{old['p95_ms']:>12}{row['p95_ms']:>10}{change:>8.1f}%{flag}")
+    old_rps = baseline.get("throughput_rps")
+    if old_rps:
+        print(f"\nThroughput: {old_rps} -> {summary['throughput_rps']} req/s")
+    return regressed
+
+
+async def run(args):
+    journeys = {name: weight for name, weight in JOURNEY_WEIGHTS.items() if name in args.journeys}
+    if args.url:
+        transport = None
+        base_url = args.url
+    else:
+        from backend.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://curanet.local"
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60, limits=limits) as client:
+        fixtures = await discover_fixtures(client, args.password, args.fixtures, args.seed)
+        recorder = Recorder()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*[
+            virtual_user(client, recorder, fixtures, journeys, deadline, args.iterations, args.seed + user)
+            for user in range(args.users)
+        ])
+        return summarize(recorder, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="run against a server (e.g. http://localhost:8000) instead of in-process")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--iterations", type=int, default=0, help="journeys per user (0 = until --duration)")
+    parser.add_argument("--journeys", default=",".join(JOURNEY_WEIGHTS), help="comma-separated subset of journeys")
+    parser.add_argument("--password", default="password", help="password of the discovered patients")
+    parser.add_argument("--fixtures", type=int, default=200, help="patients and doctors sampled as test users")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON baseline here")
+    parser.add_argument("--compare", help="baseline JSON to diff against")
+    parser.add_argument("--fail-on-regression", type=float, default=0,
+                        help="exit 1 when any route's p95 grows by more than this percent")
+    args = parser.parse_args()
+    args.journeys = [name.strip() for name in args.journeys.split(",") if name.strip()]
+
+    summary = asyncio.run(run(args))
+    summary.update({
+        "generated_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "target": args.url or "in-process",
+        "users": args.users,
+        "journeys": args.journeys,
+        "python": platform.python_version(),
+    })
+    print_report(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nBaseline written to {args.output}")
+
+    regressed = False
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(summary, json.load(f), args.fail_on_regression)
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Throughput of the report storage backends (backend/storage.py), so a backend can be checked
+against the others before it is switched on.
+
+For each backend, objects of --size bytes are:
+
+  put       stored (for local: temp file, fsync, rename)
+  get       read back whole, chunk by chunk
+  range     read 64 KB at a random offset
+  serve     fetched whole through the streaming response used by /reports/{id}/content,
+            in-process over httpx's ASGI transport (local files take the direct-from-disk path)
+
+Reports MB/s, operations/s and p50/p95 per backend and operation and writes a JSON baseline
+that a later run can be compared against:
+
+    python benchmarks/storage_throughput.py --backends local,mock --output storage.json
+    python benchmarks/storage_throughput.py --backends local --compare storage.json --fail-on-regression 20
+
+The s3 backend talks to the configured bucket and leaves nothing behind (objects are deleted).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+RANGE_BYTES = 64 * 1024
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, bytes_each: int) -> dict:
+    values = sorted(latencies)
+    elapsed = sum(values)
+    return {
+        "ops": len(values),
+        "ops_per_s": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "mb_per_s": round(len(values) * bytes_each / elapsed / 1e6, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+    }
+
+
+def make_backend(name: str, root: str):
+    from backend import storage
+
+    if name == "local":
+        return storage.LocalStorage(root=root)
+    return storage.create_storage(name)
+
+
+def serving_app(backend, size: int):
+    from fastapi import FastAPI, Request
+    from backend import report_content
+
+    app = FastAPI()
+
+    @app.get("/objects/{file_key:path}")
+    def serve(file_key: str, request: Request):
+        return report_content.serve_stored(
+            request, backend, file_key,
+            size=size,
+            content_type="application/octet-stream",
+            etag=report_content.content_etag(file_key, None),
+            last_modified=datetime.utcnow(),
+            file_name="benchmark.bin"
+        )
+
+    return app
+
+
+async def measure_serving(backend, keys, size: int):
+    latencies = []
+    transport = httpx.ASGITransport(app=serving_app(backend, size))
+    async with httpx.AsyncClient(transport=transport, base_url="http://storage.local") as client:
+        for key in keys:
+            start = time.perf_counter()
+            response = await client.get(f"/objects/{key}")
+            if response.status_code != 200 or len(response.content) != size:
+                raise RuntimeError(f"Serving {key} failed with {response.status_code}")
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_backend(name: str, args, root: str) -> dict:
+    backend = make_backend(name, root)
+    rng = random.Random(args.seed)
+    content = os.urandom(args.size)
+    keys = [f"benchmark/{name}/{index}_{rng.getrandbits(32):08x}" for index in range(args.objects)]
+    results = {}
+
+    latencies = []
+    for key in keys:
+        start = time.perf_counter()
+        backend.put_file(key, content, "application/octet-stream")
+        latencies.append(time.perf_counter() - start)
+    results["put"] = summarize(latencies, args.size)
+
+    try:
+        latencies = []
+        for key in keys:
+            start = time.perf_counter()
+            read = sum(len(chunk) for chunk in backend.get_object(key))
+            latencies.append(time.perf_counter() - start)
+            if read != args.size:
+                raise RuntimeError(f"Read {read} of {args.size} bytes from {key}")
+        results["get"] = summarize(latencies, args.size)
+
+        span = min(RANGE_BYTES, args.size)
+        latencies = []
+        for _ in range(args.objects * 4):
+            key = rng.choice(keys)
+            first = rng.randrange(0, args.size - span + 1)
+            start = time.perf_counter()
+            for _chunk in backend.get_object(key, first, first + span - 1):
+                pass
+            latencies.append(time.perf_counter() - start)
+        results["range"] = summarize(latencies, span)
+
+        results["serve"] = summarize(asyncio.run(measure_serving(backend, keys, args.size)), args.size)
+    finally:
+        for key in keys:
+            backend.delete_file(key)
+    return results
+
+
+def print_report(summary: dict):
+    print(f"\n{summary['objects']} objects of {summary['size']} bytes per backend\n")
+    print(f"{'backend / operation':<24}{'ops':>6}{'ops/s':>10}{'MB/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for backend, operations in summary["backends"].items():
+        for operation, row in operations.items():
+            print(f"{backend + ' ' + operation:<24}{row['ops']:>6}{row['ops_per_s']:>10}"
+                  f"{row['mb_per_s']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}")
+
+
+def compare(summary: dict, baseline: dict, fail_pct: float) -> bool:
+    """Print MB/s deltas against a baseline; return True when any operation slowed beyond fail_pct"""
+    print(f"\nCompared with baseline from {baseline.get('generated_at', 'unknown')}:")
+    print(f"{'backend / operation':<24}{'MB/s before':>12}{'MB/s now':>10}{'change':>9}")
+    regressed = False
+    for backend, operations in summary["backends"].items():
+        for operation, row in operations.items():
+            old = baseline.get("backends", {}).get(backend, {}).get(operation)
+            if not old or not old["mb_per_s"]:
+                continue
+            change = (row["mb_per_s"] - old["mb_per_s"]) / old["mb_per_s"] * 100
+            flag = ""
+            if fail_pct and -change > fail_pct:
+                regressed = True
+                flag = "  ❌"
+            print(f"{backend + ' ' + operation:<24}{old['mb_per_s']:>12}{row['mb_per_s']:>10}{change:>8.1f}%{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="local,mock", help="comma-separated: local, mock, s3")
+    parser.add_argument("--objects", type=int, default=50, help="objects per backend")
+    parser.add_argument("--size", type=int, default=1024 * 1024, help="bytes per object")
+    parser.add_argument("--root", help="directory for the local backend (default: a temporary one)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON baseline here")
+    parser.add_argument("--compare", help="baseline JSON to diff against")
+    parser.add_argument("--fail-on-regression", type=float, default=0,
+                        help="exit 1 when any operation's MB/s drops by more than this percent")
+    args = parser.parse_args()
+    backends = [name.strip() for name in args.backends.split(",") if name.strip()]
+
+    with tempfile.TemporaryDirectory(prefix="storage-benchmark-") as scratch:
+        summary = {
+            "objects": args.objects,
+            "size": args.size,
+            "backends": {name: run_backend(name, args, args.root or scratch) for name in backends},
+        }
+    summary.update({
+        "generated_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+    })
+    print_report(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nBaseline written to {args.output}")
+
+    regressed = False
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(summary, json.load(f), args.fail_on_regression)
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()